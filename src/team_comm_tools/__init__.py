@@ -1 +1,2 @@
-from .feature_builder import FeatureBuilder
\ No newline at end of file
+from .feature_builder import FeatureBuilder
+from .streaming_feature_builder import StreamingFeatureBuilder
\ No newline at end of file
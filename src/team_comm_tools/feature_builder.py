@@ -18,6 +18,10 @@ from team_comm_tools.utils.calculate_user_level_features import UserLevelFeature
 from team_comm_tools.utils.calculate_conversation_level_features import ConversationLevelFeaturesCalculator
 from team_comm_tools.utils.preprocess import *
 from team_comm_tools.utils.check_embeddings import *
+from team_comm_tools.features.get_all_DD_features import conv_to_float_arr
+from team_comm_tools.utils.output_writers import get_output_writer, ParquetWriter
+from team_comm_tools.utils.feature_cache import get_feature_cache
+from team_comm_tools.utils.profiler import FeatureProfiler
 from team_comm_tools.feature_dict import feature_dict
 
 class FeatureBuilder:
@@ -35,13 +39,13 @@ class FeatureBuilder:
     :param output_file_base: Base name for the output files, which will be used to auto-generate filenames for each of the three levels. Defaults to "output."
     :type output_file_base: str
     
-    :param output_file_path_chat_level: Path where the chat (utterance)-level output csv file is to be generated. (This parameter will override the base name.)
+    :param output_file_path_chat_level: Path where the chat (utterance)-level output file is to be generated. (This parameter will override the base name.)
     :type output_file_path_chat_level: str
 
-    :param output_file_path_user_level: Path where the user (speaker)-level output csv file is to be generated. (This parameter will override the base name.)
+    :param output_file_path_user_level: Path where the user (speaker)-level output file is to be generated. (This parameter will override the base name.)
     :type output_file_path_user_level: str
 
-    :param output_file_path_conv_level: Path where the conversation-level output csv file is to be generated. (This parameter will override the base name.)
+    :param output_file_path_conv_level: Path where the conversation-level output file is to be generated. (This parameter will override the base name.)
     :type output_file_path_conv_level: str
 
     :param custom_features: A list of additional features outside of the default features that should be calculated.
@@ -80,7 +84,7 @@ class FeatureBuilder:
     :param within_task: If true, groups cumulatively in such a way that we only look at prior chats that are of the same "task" (Mid-level identifier). Defaults to False.
     :type within_task: bool, optional
     
-    :param ner_training_df: This is a pandas dataframe of training data for named entity recognition feature. Defaults to None, and will not generate named entity featuers if it does not exist.
+    :param ner_training_df: This is a pandas dataframe of training data for named entity recognition feature. Defaults to None, and will not generate named entity featuers if it does not exist. The model fine-tuned on this data is cached in the "ner/" subfolder of the `vector_directory` (keyed by a hash of the training data), and reused by later runs with the same training data.
     :type ner_training_df: pd.DataFrame
     
     :param ner_cutoff: This is the cutoff value for the confidence of prediction for each named entity. Defaults to 0.9.
@@ -92,7 +96,40 @@ class FeatureBuilder:
     :param compute_vectors_from_preprocessed: If true, computes vectors using preprocessed text (that is, with capitalization and punctuation removed). This was the default behavior for v.0.1.3 and earlier, but we now default to computing metrics on the unpreprocessed text (which INCLUDES capitalization and punctuation). Defaults to False.
     :type compute_vectors_from_preprocessed: bool, optional
 
-    :return: The FeatureBuilder doesn't return anything; instead, it writes the generated features to files in the specified paths. It will also print out its progress, so you should see "All Done!" in the terminal, which will indicate that the features have been generated.
+    :param compact_user_network: If true, the list of other users in each conversation is kept as a compact UserNetwork (integer speaker codes with CSR offsets), available as `user_network` after featurizing, instead of as a 'user_list' column of numpy arrays in the user-level output. This is useful for large datasets with many multi-party conversations. Defaults to False.
+    :type compact_user_network: bool, optional
+
+    :param global_statistics: Statistics of the entire dataset, for when `input_df` holds only part of it (e.g., one chunk of a dataset that is featurized in chunks by the StreamingFeatureBuilder).
+        Maps "info_exchange_wordcount" and "positive_bert" to their (mean, standard deviation) across all chats, and "content_words" to the frequency of each content word; these are used for the z-scores across all chats and for Content Word Accommodation.
+        Defaults to None, in which case the statistics are computed from `input_df`.
+    :type global_statistics: dict, optional
+
+    :param output_writer: The format of the output files: "csv", "parquet" (which requires pyarrow, and stores features with compact types and list-valued columns as native lists; see `ParquetWriter`), or a custom writer object with the same interface as the `CSVWriter`.
+        If None, the FeatureBuilder runs in memory: nothing is written to disk (the output paths are ignored, with a warning if any are given), and `featurize()` returns the features instead. The cached vectors and sentiments are still named after `output_file_base`, so in-memory runs with the same base share (and add to) the same caches; they are matched to the messages by their text, so this is safe, but you should give each dataset its own `output_file_base` to keep its caches apart. Defaults to "csv".
+    :type output_writer: str or object, optional
+
+    :param return_arrow_tables: In memory (when `output_writer` is None), if true, `featurize()` returns the features as Arrow tables with compact types (as they would be stored by the `ParquetWriter`), rather than as DataFrames. Requires pyarrow. Defaults to False.
+    :type return_arrow_tables: bool, optional
+
+    :param memory_optimized: If true, reduces the memory used by the chat-level features, which is useful for large datasets: each feature is stored in a compact type as soon as it is computed (counts as the smallest integer type that fits, scores as float32, and classifications as categoricals), and the derived "message_lower_with_punc" column is dropped once the last feature that reads it has run (so it does not appear in the output). Features are then computed in single (rather than double) precision, so they may differ from the defaults in the last few decimal places. Defaults to False.
+    :type memory_optimized: bool, optional
+
+    :param num_workers: The number of worker processes used by the chat-level features that can run in parallel (currently, the TextBlob sentiment, named entity recognition, and ConvoKit politeness strategies, which are computed once per distinct message). Defaults to 1, which computes all features in the current process.
+    :type num_workers: int, optional
+
+    :param feature_cache: A persistent cache of the chat-level features that depend only on the text of each message (such as the word counts, lexical features, TextBlob sentiment, readability, politeness, certainty, and online discussion tags), so that featurizing overlapping data again only computes these features for new messages. Pass either the path of a SQLite database file (which is created if needed), or a FeatureCache (e.g., `FeatureCache(path, max_size=...)`, to bound the size of the cache). Defaults to None, in which case nothing is cached.
+    :type feature_cache: str or FeatureCache, optional
+
+    :param profile: If true, records the wall time, CPU time, number of rows, and peak memory (as traced by `tracemalloc`) of each step of the featurization: preprocessing, loading the models and generating the SBERT vectors and RoBERTa sentiments, and each chat-, user-, and conversation-level feature method. The user- and conversation-level steps, which run once for each percentage in `analyze_first_pct`, are tagged with a "percentage" column. After featurizing, the report is available as `profile_report` (a DataFrame), and is also saved as a CSV in the "profile/" subfolder of the output folder (unless `output_writer` is None). Tracing memory slows featurization down, so this defaults to False.
+    :type profile: bool, optional
+
+    :param sentiment_inference: How to run the RoBERTa sentiment model on CPUs: "fp32" (full precision), "int8" (with its Linear layers dynamically quantized to 8-bit integers by PyTorch), "onnx" (with ONNX Runtime), or "onnx_int8" (with ONNX Runtime and 8-bit weights). The faster modes give slightly different sentiment scores; see `compare_sentiment_inference` (in `utils.check_embeddings`) to measure the difference on your data. The ONNX modes require `onnx` and `onnxruntime`. Defaults to "fp32".
+    :type sentiment_inference: str, optional
+
+    :param sentiment_max_length: The number of tokens of each message that the RoBERTa sentiment model reads; longer messages are truncated. Lower values (e.g., 128) are faster on long messages. Must be between 1 and 512. Defaults to 512.
+    :type sentiment_max_length: int, optional
+
+    :return: The FeatureBuilder doesn't return anything; instead, it writes the generated features to files in the specified paths (unless `output_writer` is None; see `featurize()`). It will also print out its progress, so you should see "All Done!" in the terminal, which will indicate that the features have been generated.
     :rtype: None
 
     """
@@ -117,7 +154,17 @@ class FeatureBuilder:
             ner_training_df: pd.DataFrame = None,
             ner_cutoff: int = 0.9,
             regenerate_vectors: bool = False,
-            compute_vectors_from_preprocessed: bool = False
+            compute_vectors_from_preprocessed: bool = False,
+            compact_user_network: bool = False,
+            global_statistics: dict = None,
+            output_writer = "csv",
+            return_arrow_tables: bool = False,
+            memory_optimized: bool = False,
+            num_workers: int = 1,
+            feature_cache = None,
+            profile: bool = False,
+            sentiment_inference: str = "fp32",
+            sentiment_max_length: int = 512
         ) -> None:
 
         # Defining input and output paths.
@@ -125,6 +172,11 @@ class FeatureBuilder:
         self.orig_data = input_df.copy()
         self.ner_training = ner_training_df
         self.vector_directory = vector_directory
+        self.ner_model_directory = vector_directory + "ner/"
+        self.output_writer = get_output_writer(output_writer) if output_writer is not None else None
+        self.return_arrow_tables = return_arrow_tables
+        if self.return_arrow_tables and self.output_writer is not None:
+            raise ValueError("Arrow tables can only be returned in memory; please set `output_writer` to None.")
 
         print("Initializing Featurization...")
 
@@ -188,11 +240,14 @@ class FeatureBuilder:
         # deduplicate functions and append them into a list for calculation
         self.feature_methods_chat = []
         self.feature_methods_conv = []
+        self.conversation_context_methods_chat = [] # chat-level functions whose output depends on other chats, not only the message
         for feature in self.feature_names:
             level, func = self.feature_dict[feature]["level"], self.feature_dict[feature]['function']
             if level == 'Chat':
                 if func not in self.feature_methods_chat:
                     self.feature_methods_chat.append(func)
+                if self.feature_dict[feature]["conversation_context"] and func not in self.conversation_context_methods_chat:
+                    self.conversation_context_methods_chat.append(func)
             elif level == 'Conversation':
                 if func not in self.feature_methods_conv:
                     self.feature_methods_conv.append(func)
@@ -224,6 +279,26 @@ class FeatureBuilder:
         self.within_task = within_task
         self.ner_cutoff = ner_cutoff
         self.regenerate_vectors = regenerate_vectors
+        self.compact_user_network = compact_user_network
+        self.user_network = None
+        self.cumulative_rows = None # (cumulative conversation, source row) pairs; set only when cumulative rows are not materialized up front
+        self.global_statistics = global_statistics
+        self.memory_optimized = memory_optimized
+        self.deduplication_summary = None # the number of distinct messages on which each text-pure chat-level feature ran
+        if num_workers < 1:
+            raise ValueError("The `num_workers` must be a positive number of worker processes.")
+        self.num_workers = num_workers
+        self.feature_cache = get_feature_cache(feature_cache) if feature_cache is not None else None
+        self.profiler = FeatureProfiler(enabled = profile)
+        self.profile_report = None # the time and memory of each step; set by featurize() if `profile` is true
+        if sentiment_inference not in sentiment_inference_modes:
+            raise ValueError("Unsupported `sentiment_inference`: " + str(sentiment_inference) + ". Please use one of: " + ", ".join(sentiment_inference_modes) + ".")
+        if not 1 <= sentiment_max_length <= 512:
+            raise ValueError("The `sentiment_max_length` must be between 1 and 512 tokens.")
+        self.sentiment_inference = sentiment_inference
+        self.sentiment_max_length = sentiment_max_length
+        self.close_output_writer = True # if false, the output files are left open for later writes (used when featurizing a dataset in chunks)
+        self.write_profile = True # if false, the profile report is only stored in `profile_report` (used when the reports of several chunks are combined)
 
         if(compute_vectors_from_preprocessed == True):
             self.vector_colname = self.message_col # because the message col will eventually get preprocessed
@@ -248,7 +323,8 @@ class FeatureBuilder:
             warnings.warn("WARNING: When grouping by the unique combination of a list of keys (`grouping_keys`), the conversation identifier must be auto-generated (`conversation_num`) rather than a user-provided column. Resetting conversation_id.")
             self.conversation_id_col = "conversation_num"
         
-        self.preprocess_chat_data()
+        with self.profiler.profile("preprocessing", "preprocess_chat_data", len(self.chat_data)):
+            self.preprocess_chat_data()
 
         # set new identifier column for cumulative grouping.
         if self.cumulative_grouping and len(grouping_keys) == 3:
@@ -256,7 +332,10 @@ class FeatureBuilder:
             self.conversation_id_col = "conversation_num"
 
         # Input columns are the columns that come in the raw chat data
-        self.input_columns = self.chat_data.columns
+        if self.cumulative_rows is not None:
+            self.input_columns = pd.Index(self.cumulative_input_columns)
+        else:
+            self.input_columns = self.chat_data.columns
 
         # Set all paths for vector retrieval (contingent on turns)
         df_type = "turns" if self.turns else "chats"
@@ -274,7 +353,7 @@ class FeatureBuilder:
             - turn/ for turn-level data
             - conv/ for convesation-level data
             - user/ for user-level data
-        - We always output files as a csv (and add '.csv' if not present)
+        - We always output files in the format of the output writer (and add its extension, e.g., '.csv', if not present)
         - We consider the "base file name" to be the file name of the chat-level data, and we use this to name the file
             containing the vector encodings
         - The inputted file name must be a valid, non-empty string
@@ -292,74 +371,88 @@ class FeatureBuilder:
             output_file_base = re.sub('[^A-Za-z0-9_]', '', output_file_base)
             warnings.warn("WARNING: Special characters detected in output_file_base. These characters have been automatically removed.")
 
-        if self.output_file_path_chat_level is None:
-            self.output_file_path_chat_level = "./" + output_file_base + "_chat_level.csv"
-        if self.output_file_path_conv_level is None:
-            self.output_file_path_conv_level = "./" + output_file_base + "_conv_level.csv"
-        if self.output_file_path_user_level is None:
-            self.output_file_path_user_level = "./" + output_file_base + "_user_level.csv"
-
-        # Basic error detetection
-        if not bool(self.output_file_path_conv_level) or not bool(re.sub('[^A-Za-z0-9_]', '', self.output_file_path_conv_level)):
-            raise ValueError("ERROR: Improper conversation-level output file name detected.")
-        if not bool(self.output_file_path_user_level) or not bool(re.sub('[^A-Za-z0-9_]', '', self.output_file_path_user_level)):
-            raise ValueError("ERROR: Improper user (speaker)-level output file name detected.")
-
-        # We assume that the base file name is the last item in the output path; we will use this to name the stored vectors.
-        if ('/' not in self.output_file_path_chat_level or 
-            '/' not in self.output_file_path_conv_level or 
-            '/' not in self.output_file_path_user_level):
-            raise ValueError(
-                "We expect you to pass a path in for your output files "
-                "(output_file_path_chat_level, output_file_path_user_level, and "
-                "output_file_path_conv_level). If you would like the output to be "
-                "the current directory, please append './' to the beginning of your "
-                "filename(s). Your filename should be in the format: "
-                "path/to/output_name.csv or ./output_name.csv for the current working directory."
-            )
-
-        try:
-            base_file_name = self.output_file_path_chat_level.split("/")[-1]
-        except:
-            raise ValueError("ERROR: Improper chat-level output file name detected.") 
-
-        if not bool(base_file_name) or not bool(re.sub('[^A-Za-z0-9_]', '', base_file_name)): # user didn't specify a file name, or specified one with only nonalphanumeric chars
-            raise ValueError("ERROR: Improper chat-level output file name detected.")
-
-        try:
-            folder_type_name = self.output_file_path_chat_level.split("/")[-2]
-        except IndexError: # user didn't specify a folder, so we will have to append it for them
-            folder_type_name = "turn" if self.turns else "chat"
-            self.output_file_path_chat_level = '/'.join(self.output_file_path_chat_level.split("/")[:-1]) + '/' + folder_type_name + '/' + base_file_name
-
-        # We check whether the second to last item is a "folder type": either chat or turn.
-        if folder_type_name not in ["chat", "turn"]: # user didn't specify the folder type, so we will append it for them
-            folder_type_name = "turn" if self.turns else "chat"
-            self.output_file_path_chat_level = '/'.join(self.output_file_path_chat_level.split("/")[:-1]) + '/' + folder_type_name + '/' + base_file_name
-
-        # Set file paths, ensuring correct subfolder type is added.
-        self.output_file_path_chat_level = re.sub(r'chat', r'turn', self.output_file_path_chat_level) if self.turns else self.output_file_path_chat_level
-        if self.output_file_path_chat_level.split(".")[-1] != "csv": 
-            self.output_file_path_chat_level = self.output_file_path_chat_level + ".csv"
-        if not re.match(r"(.*\/|^)conv\/", self.output_file_path_conv_level):
-            self.output_file_path_conv_level = "/".join(self.output_file_path_conv_level.split("/")[:-1]) + "/conv/" + self.output_file_path_conv_level.split("/")[-1]
-        if self.output_file_path_conv_level.split(".")[-1] != "csv": 
-            self.output_file_path_conv_level = self.output_file_path_conv_level + ".csv"
-        if not re.match(r"(.*\/|^)user\/", self.output_file_path_user_level):
-            self.output_file_path_user_level = "/".join(self.output_file_path_user_level.split("/")[:-1]) + "/user/" + self.output_file_path_user_level.split("/")[-1]
-        if self.output_file_path_user_level.split(".")[-1] != "csv": 
-            self.output_file_path_user_level = self.output_file_path_user_level + ".csv"
-
-        # Ensure output/ is added before the subfolder.
-        if not re.match(r"(.*\/|^)output\/", self.output_file_path_chat_level):
-            self.output_file_path_chat_level = re.sub(r'/' + folder_type_name + r'/', r'/output/' + folder_type_name + r'/', self.output_file_path_chat_level)
-        if not re.match(r"(.*\/|^)output\/", self.output_file_path_conv_level):
-            self.output_file_path_conv_level = re.sub(r'/conv/', r'/output/conv/', self.output_file_path_conv_level)
-        if not re.match(r"(.*\/|^)output\/", self.output_file_path_user_level):
-            self.output_file_path_user_level = re.sub(r'/user/', r'/output/user/', self.output_file_path_user_level)
+        if self.output_writer is not None:
+            if self.output_file_path_chat_level is None:
+                self.output_file_path_chat_level = "./" + output_file_base + "_chat_level.csv"
+            if self.output_file_path_conv_level is None:
+                self.output_file_path_conv_level = "./" + output_file_base + "_conv_level.csv"
+            if self.output_file_path_user_level is None:
+                self.output_file_path_user_level = "./" + output_file_base + "_user_level.csv"
+
+            # Basic error detetection
+            if not bool(self.output_file_path_conv_level) or not bool(re.sub('[^A-Za-z0-9_]', '', self.output_file_path_conv_level)):
+                raise ValueError("ERROR: Improper conversation-level output file name detected.")
+            if not bool(self.output_file_path_user_level) or not bool(re.sub('[^A-Za-z0-9_]', '', self.output_file_path_user_level)):
+                raise ValueError("ERROR: Improper user (speaker)-level output file name detected.")
+
+            # We assume that the base file name is the last item in the output path; we will use this to name the stored vectors.
+            if ('/' not in self.output_file_path_chat_level or 
+                '/' not in self.output_file_path_conv_level or 
+                '/' not in self.output_file_path_user_level):
+                raise ValueError(
+                    "We expect you to pass a path in for your output files "
+                    "(output_file_path_chat_level, output_file_path_user_level, and "
+                    "output_file_path_conv_level). If you would like the output to be "
+                    "the current directory, please append './' to the beginning of your "
+                    "filename(s). Your filename should be in the format: "
+                    "path/to/output_name.csv or ./output_name.csv for the current working directory."
+                )
+
+            try:
+                base_file_name = self.output_file_path_chat_level.split("/")[-1]
+            except:
+                raise ValueError("ERROR: Improper chat-level output file name detected.") 
+
+            if not bool(base_file_name) or not bool(re.sub('[^A-Za-z0-9_]', '', base_file_name)): # user didn't specify a file name, or specified one with only nonalphanumeric chars
+                raise ValueError("ERROR: Improper chat-level output file name detected.")
+
+            try:
+                folder_type_name = self.output_file_path_chat_level.split("/")[-2]
+            except IndexError: # user didn't specify a folder, so we will have to append it for them
+                folder_type_name = "turn" if self.turns else "chat"
+                self.output_file_path_chat_level = '/'.join(self.output_file_path_chat_level.split("/")[:-1]) + '/' + folder_type_name + '/' + base_file_name
+
+            # We check whether the second to last item is a "folder type": either chat or turn.
+            if folder_type_name not in ["chat", "turn"]: # user didn't specify the folder type, so we will append it for them
+                folder_type_name = "turn" if self.turns else "chat"
+                self.output_file_path_chat_level = '/'.join(self.output_file_path_chat_level.split("/")[:-1]) + '/' + folder_type_name + '/' + base_file_name
+
+            # Set file paths, ensuring correct subfolder type is added.
+            self.output_file_path_chat_level = re.sub(r'chat', r'turn', self.output_file_path_chat_level) if self.turns else self.output_file_path_chat_level
+            if self.output_file_path_chat_level.split(".")[-1] != self.output_writer.extension: 
+                self.output_file_path_chat_level = self.output_file_path_chat_level + "." + self.output_writer.extension
+            if not re.match(r"(.*\/|^)conv\/", self.output_file_path_conv_level):
+                self.output_file_path_conv_level = "/".join(self.output_file_path_conv_level.split("/")[:-1]) + "/conv/" + self.output_file_path_conv_level.split("/")[-1]
+            if self.output_file_path_conv_level.split(".")[-1] != self.output_writer.extension: 
+                self.output_file_path_conv_level = self.output_file_path_conv_level + "." + self.output_writer.extension
+            if not re.match(r"(.*\/|^)user\/", self.output_file_path_user_level):
+                self.output_file_path_user_level = "/".join(self.output_file_path_user_level.split("/")[:-1]) + "/user/" + self.output_file_path_user_level.split("/")[-1]
+            if self.output_file_path_user_level.split(".")[-1] != self.output_writer.extension: 
+                self.output_file_path_user_level = self.output_file_path_user_level + "." + self.output_writer.extension
+
+            # Ensure output/ is added before the subfolder.
+            if not re.match(r"(.*\/|^)output\/", self.output_file_path_chat_level):
+                self.output_file_path_chat_level = re.sub(r'/' + folder_type_name + r'/', r'/output/' + folder_type_name + r'/', self.output_file_path_chat_level)
+            if not re.match(r"(.*\/|^)output\/", self.output_file_path_conv_level):
+                self.output_file_path_conv_level = re.sub(r'/conv/', r'/output/conv/', self.output_file_path_conv_level)
+            if not re.match(r"(.*\/|^)output\/", self.output_file_path_user_level):
+                self.output_file_path_user_level = re.sub(r'/user/', r'/output/user/', self.output_file_path_user_level)
+        else: # in-memory mode: nothing is written to disk, so we only need a base file name for the stored vectors
+            if any(path is not None for path in [self.output_file_path_chat_level, self.output_file_path_user_level, self.output_file_path_conv_level]):
+                warnings.warn("WARNING: `output_writer` is None, so nothing is written to disk, and the output file paths are ignored.")
+            self.output_file_path_chat_level = None
+            self.output_file_path_conv_level = None
+            self.output_file_path_user_level = None
+            base_file_name = output_file_base + "_chat_level.csv"
 
         self.vect_path = vector_directory + "sentence/" + ("turns" if self.turns else "chats") + "/" + base_file_name
-        self.bert_path = vector_directory + "sentiment/" + ("turns" if self.turns else "chats") + "/" + base_file_name
+        # sentiments from the faster inference settings are stored apart from the default ones, so that they are never mixed
+        sentiment_folder = "sentiment"
+        if self.sentiment_inference != "fp32":
+            sentiment_folder += "_" + self.sentiment_inference
+        if self.sentiment_max_length != 512:
+            sentiment_folder += "_len" + str(self.sentiment_max_length)
+        self.bert_path = vector_directory + sentiment_folder + "/" + ("turns" if self.turns else "chats") + "/" + base_file_name
 
         # Check + generate embeddings
         need_sentence = False
@@ -375,20 +468,32 @@ class FeatureBuilder:
             if(not need_sentiment and feature_dict[feature]["bert_sentiment_data"]):
                 need_sentiment = True
 
-        check_embeddings(self.chat_data, self.vect_path, self.bert_path, need_sentence, need_sentiment, self.regenerate_vectors, message_col = self.vector_colname)
+        for step, wall_time in model_load_times.items(): # the models are loaded once, when check_embeddings is imported
+            self.profiler.record("embeddings", step, wall_time)
+        check_embeddings(self.chat_data, self.vect_path, self.bert_path, need_sentence, need_sentiment, self.regenerate_vectors, message_col = self.vector_colname, profiler = self.profiler,
+                         sentiment_inference = self.sentiment_inference, sentiment_max_length = self.sentiment_max_length)
 
-        if(need_sentence):
-            self.vect_data = pd.read_csv(self.vect_path, encoding='mac_roman')
-        else:
-            self.vect_data = None
+        with self.profiler.profile("embeddings", "load_embeddings", len(self.chat_data)):
+            # The cached vectors and sentiments are keyed by message; look up those of each chat
+            message_keys = get_message_keys(self.chat_data[self.vector_colname]) if (need_sentence or need_sentiment) else None
 
-        if(need_sentiment):
-            self.bert_sentiment_data = pd.read_csv(self.bert_path, encoding='mac_roman')
-        else:
-            self.bert_sentiment_data = None
+            if(need_sentence):
+                self.vect_data = conv_to_float_arr(align_embeddings(pd.read_csv(self.vect_path, encoding='mac_roman'), message_keys)) # parse the embeddings once, for all features that use them
+                if self.cumulative_rows is not None: # the vectors were generated once per source message; align them with the cumulative rows
+                    self.vect_data = self.vect_data.iloc[self.cumulative_rows['row_position']].reset_index(drop=True)
+            else:
+                self.vect_data = None
+
+            if(need_sentiment):
+                self.bert_sentiment_data = align_embeddings(pd.read_csv(self.bert_path, encoding='mac_roman'), message_keys)
+            else:
+                self.bert_sentiment_data = None
 
         # Deriving the base conversation level dataframe.
-        self.conv_data = self.chat_data[[self.conversation_id_col]].drop_duplicates()
+        if self.cumulative_rows is not None:
+            self.conv_data = self.cumulative_rows[[self.conversation_id_col]].drop_duplicates()
+        else:
+            self.conv_data = self.chat_data[[self.conversation_id_col]].drop_duplicates()
 
     def set_self_conv_data(self) -> None:
         """
@@ -419,6 +524,8 @@ class FeatureBuilder:
         if(self.conversation_id_col == "conversation_num" and "conversation_num" not in self.orig_data.columns):
             # This indicates that the user asked us to generate a conversation_num, as it wasn't in the original
             orig_conv_data = self.preprocessed_data # we therefore use the preprocessed data instead of the original
+            if self.cumulative_rows is not None: # the preprocessed data has one row per source message; get the first row of each cumulative conversation
+                orig_conv_data = expand_cumulative_rows(orig_conv_data, self.cumulative_rows.drop_duplicates(subset=["conversation_num"]))
         else:
             orig_conv_data = self.orig_data
 
@@ -438,7 +545,7 @@ class FeatureBuilder:
         if {'index'}.issubset(self.conv_data.columns):
             self.conv_data = self.conv_data.drop(columns=['index'])
 
-    def featurize(self) -> None:
+    def featurize(self):
         """
         Main driver function for feature generation.
 
@@ -447,65 +554,89 @@ class FeatureBuilder:
         conversation-level features. Finally, the features are saved into the 
         designated output files.
 
-        :return: None
-        :rtype: None
+        In memory (when `output_writer` is None), the features are returned rather than saved: as a tuple of the
+        (chat, user, conversation)-level features, or, if more than one percentage is given in `analyze_first_pct`,
+        as a dictionary mapping each percentage to such a tuple.
+
+        :return: None, or the features (when `output_writer` is None)
+        :rtype: None, tuple, or dict
         """
 
-        # Step 1. Create chat level features.
-        print("Chat Level Features ...")
-        self.chat_level_features()
-
-        # Things to store before we loop through truncations
-        self.chat_data_complete = self.chat_data # store complete chat data
-        self.output_file_path_user_level_original = self.output_file_path_user_level
-        self.output_file_path_chat_level_original = self.output_file_path_chat_level
-        self.output_file_path_conv_level_original = self.output_file_path_conv_level
-
-        # Step 2.
-        # Run the chat-level features once, then produce different summaries based on 
-        # user specification.
-        for percentage in self.first_pct: 
-            # Reset chat, conv, and user objects
-            self.chat_data = self.chat_data_complete
-            self.user_data = self.chat_data[[self.conversation_id_col, self.speaker_id_col]].drop_duplicates()
-            self.set_self_conv_data()
-
-            print("Generating features for the first " + str(percentage*100) + "% of messages...")
-            self.get_first_pct_of_chat(percentage)
+        try:
+            # Step 1. Create chat level features.
+            print("Chat Level Features ...")
+            self.chat_level_features()
+
+            # Things to store before we loop through truncations
+            self.chat_data_complete = self.chat_data # store complete chat data
+            self.output_file_path_user_level_original = self.output_file_path_user_level
+            self.output_file_path_chat_level_original = self.output_file_path_chat_level
+            self.output_file_path_conv_level_original = self.output_file_path_conv_level
+
+            # Step 2.
+            # Run the chat-level features once, then produce different summaries based on 
+            # user specification.
+            features_in_memory = {}
+            for percentage in self.first_pct: 
+                # Reset chat, conv, and user objects
+                self.chat_data = self.chat_data_complete
+                self.user_data = self.chat_data[[self.conversation_id_col, self.speaker_id_col]].drop_duplicates()
+                self.set_self_conv_data()
+
+                print("Generating features for the first " + str(percentage*100) + "% of messages...")
+                self.profiler.set_context(percentage = percentage)
+                self.get_first_pct_of_chat(percentage)
             
-            # update output paths based on truncation percentage to save in a designated folder
-            if percentage != 1: # special folders for when the percentage is partial
-                self.output_file_path_user_level = re.sub('/output/', '/output/first_' + str(int(percentage*100)) + "/", self.output_file_path_user_level_original)
-                self.output_file_path_chat_level = re.sub('/output/', '/output/first_' + str(int(percentage*100)) + "/", self.output_file_path_chat_level_original)
-                self.output_file_path_conv_level = re.sub('/output/', '/output/first_' + str(int(percentage*100)) + "/", self.output_file_path_conv_level_original)
-            else:
-                self.output_file_path_user_level = self.output_file_path_user_level_original
-                self.output_file_path_chat_level = self.output_file_path_chat_level_original
-                self.output_file_path_conv_level = self.output_file_path_conv_level_original
+                # update output paths based on truncation percentage to save in a designated folder
+                if percentage != 1 and self.output_writer is not None: # special folders for when the percentage is partial (there are no paths in memory)
+                    self.output_file_path_user_level = re.sub('/output/', '/output/first_' + str(int(percentage*100)) + "/", self.output_file_path_user_level_original)
+                    self.output_file_path_chat_level = re.sub('/output/', '/output/first_' + str(int(percentage*100)) + "/", self.output_file_path_chat_level_original)
+                    self.output_file_path_conv_level = re.sub('/output/', '/output/first_' + str(int(percentage*100)) + "/", self.output_file_path_conv_level_original)
+                else:
+                    self.output_file_path_user_level = self.output_file_path_user_level_original
+                    self.output_file_path_chat_level = self.output_file_path_chat_level_original
+                    self.output_file_path_conv_level = self.output_file_path_conv_level_original
             
-            # Make it possible to create folders if they don't exist
-            Path(self.output_file_path_user_level).parent.mkdir(parents=True, exist_ok=True)
-            Path(self.output_file_path_chat_level).parent.mkdir(parents=True, exist_ok=True)
-            Path(self.output_file_path_conv_level).parent.mkdir(parents=True, exist_ok=True)
-
-            # Step 3a. Create user level features.
-            print("Generating User Level Features ...")
-            self.user_level_features()
-
-            # Step 3b. Create conversation level features.
-            print("Generating Conversation Level Features ...")
-            self.conv_level_features()
-            self.merge_conv_data_with_original()
+                # Make it possible to create folders if they don't exist
+                if self.output_writer is not None:
+                    Path(self.output_file_path_user_level).parent.mkdir(parents=True, exist_ok=True)
+                    Path(self.output_file_path_chat_level).parent.mkdir(parents=True, exist_ok=True)
+                    Path(self.output_file_path_conv_level).parent.mkdir(parents=True, exist_ok=True)
+
+                # Step 3a. Create user level features.
+                print("Generating User Level Features ...")
+                self.user_level_features()
+
+                # Step 3b. Create conversation level features.
+                print("Generating Conversation Level Features ...")
+                self.conv_level_features()
+                self.merge_conv_data_with_original()
             
-            # Step 4. Write the feartures into the files defined in the output paths.
-            print("All Done!")
+                # Step 4. Write the feartures into the files defined in the output paths.
+                print("All Done!")
             
-            # Store column names of what we generated, so that the user can easily access them
-            self.chat_features = list(itertools.chain(*[feature_dict[feature]["columns"] for feature in self.feature_names if feature_dict[feature]["level"] == "Chat"]))
-            self.conv_features_base = list(itertools.chain(*[feature_dict[feature]["columns"] for feature in self.feature_names if feature_dict[feature]["level"] == "Conversation"]))
-            self.conv_features_all =  [col for col in self.conv_data if col not in self.orig_data and col != 'conversation_num']
+                # Store column names of what we generated, so that the user can easily access them
+                self.chat_features = list(itertools.chain(*[feature_dict[feature]["columns"] for feature in self.feature_names if feature_dict[feature]["level"] == "Chat"]))
+                self.conv_features_base = list(itertools.chain(*[feature_dict[feature]["columns"] for feature in self.feature_names if feature_dict[feature]["level"] == "Conversation"]))
+                self.conv_features_all =  [col for col in self.conv_data if col not in self.orig_data and col != 'conversation_num']
             
-            self.save_features()
+                if self.output_writer is None:
+                    features_in_memory[percentage] = self.get_features_in_memory()
+                else:
+                    with self.profiler.profile("output", "save_features", len(self.chat_data)):
+                        self.save_features()
+        finally:
+            # stop tracing memory even if a step fails, rather than leaving it running (and slowing down) the caller's process
+            self.profiler.set_context(percentage = None)
+            self.profiler.stop()
+
+        if self.profiler.enabled:
+            self.save_profile_report()
+
+        if self.output_writer is None:
+            return features_in_memory[self.first_pct[0]] if len(self.first_pct) == 1 else features_in_memory
+        if self.close_output_writer:
+            self.output_writer.close()
 
     def preprocess_chat_data(self) -> None:
         """
@@ -513,6 +644,10 @@ class FeatureBuilder:
 
         This function groups the chat data as specified, verifies column presence, creates original and lowercased columns, preprocesses text, and optionally processes chat turns.
 
+        For cumulative grouping (when turns are not requested), the rows of earlier stages are not copied into later stages here.
+        Instead, the chat data keeps one row per source message, and `self.cumulative_rows` maps each cumulative conversation onto
+        the source rows it contains; the rows are only expanded once the features of each message have been computed.
+
         :param turns: Whether to preprocess naive turns, defaults to False
         :type turns: bool, optional
         :param col: Columns to preprocess, including conversation_id, speaker_id and message, defaults to None
@@ -525,9 +660,18 @@ class FeatureBuilder:
         """
 
         # create the appropriate grouping variables and assert the columns are present
-        self.chat_data = preprocess_conversation_columns(self.chat_data, self.conversation_id_col, self.timestamp_col, self.grouping_keys, self.cumulative_grouping, self.within_task)
+        if self.cumulative_grouping and not self.turns: # turns are compressed within each cumulative conversation, so they need the expanded rows
+            self.chat_data, self.cumulative_rows = preprocess_cumulative_conversation_columns(self.chat_data, self.conversation_id_col, self.timestamp_col, self.grouping_keys, self.within_task)
+        else:
+            self.chat_data = preprocess_conversation_columns(self.chat_data, self.conversation_id_col, self.timestamp_col, self.grouping_keys, self.cumulative_grouping, self.within_task)
         assert_key_columns_present(self.chat_data, self.column_names)
 
+        if self.cumulative_rows is not None: # the columns of the chat data, once expanded into cumulative rows
+            self.cumulative_input_columns = self.chat_data.columns.tolist()
+            for column in ["conversation_num", self.message_col + "_original", "message_lower_with_punc"]:
+                if column not in self.cumulative_input_columns:
+                    self.cumulative_input_columns.append(column)
+
         # save original column with no preprocessing
         self.chat_data[self.message_col + "_original"] = self.chat_data[self.message_col]
 
@@ -564,10 +708,36 @@ class FeatureBuilder:
             ner_cutoff = self.ner_cutoff,
             conversation_id_col = self.conversation_id_col,
             message_col = self.message_col,
-            timestamp_col = self.timestamp_col
+            timestamp_col = self.timestamp_col,
+            global_statistics = self.global_statistics,
+            memory_optimized = self.memory_optimized,
+            num_workers = self.num_workers,
+            ner_model_directory = self.ner_model_directory,
+            feature_cache = self.feature_cache,
+            profiler = self.profiler
         )
         # Calling the driver inside this class to create the features.
-        self.chat_data = chat_feature_builder.calculate_chat_level_features(self.feature_methods_chat)
+        if self.cumulative_rows is None:
+            self.chat_data = chat_feature_builder.calculate_chat_level_features(self.feature_methods_chat)
+        else:
+            # Compute the features of each source message once, then copy them into every cumulative conversation that contains it;
+            # only features that depend on the rest of the conversation are computed over the cumulative rows.
+            message_methods = [method for method in self.feature_methods_chat if method not in self.conversation_context_methods_chat]
+            context_methods = [method for method in self.feature_methods_chat if method in self.conversation_context_methods_chat]
+
+            chat_feature_builder.calculate_chat_level_features(message_methods)
+            chat_feature_builder.chat_data = expand_cumulative_rows(chat_feature_builder.chat_data, self.cumulative_rows)
+            self.chat_data = chat_feature_builder.calculate_chat_level_features(context_methods)
+
+            # Restore the column order that we would get by computing every feature over the cumulative rows
+            feature_columns = itertools.chain(*[chat_feature_builder.feature_columns[method] for method in self.feature_methods_chat])
+            self.chat_data = self.chat_data[[column for column in itertools.chain(self.cumulative_input_columns, feature_columns) if column in self.chat_data.columns]]
+
+        # Text-pure features run once per distinct message; report how much work this saved
+        self.deduplication_summary = chat_feature_builder.get_deduplication_summary()
+        if len(self.deduplication_summary) > 0:
+            print("Computed text-pure features on " + str(self.deduplication_summary["unique_messages"].max()) + " distinct messages (of " + str(self.deduplication_summary["rows"].max()) + " rows).")
+
         # Remove special characters in column names
         self.chat_data.columns = ["".join(c for c in col if c.isalnum() or c == '_') for col in self.chat_data.columns]
 
@@ -607,9 +777,12 @@ class FeatureBuilder:
             vect_data= self.vect_data,
             conversation_id_col = self.conversation_id_col,
             speaker_id_col = self.speaker_id_col,
-            input_columns = self.input_columns
+            input_columns = self.input_columns,
+            compact_user_network = self.compact_user_network,
+            profiler = self.profiler
         )
         self.user_data = user_feature_builder.calculate_user_level_features()
+        self.user_network = user_feature_builder.user_network
         # Remove special characters in column names
         self.user_data.columns = ["".join(c for c in col if c.isalnum() or c == '_') for col in self.user_data.columns]
 
@@ -633,21 +806,74 @@ class FeatureBuilder:
             speaker_id_col = self.speaker_id_col,
             message_col = self.message_col,
             timestamp_col = self.timestamp_col,
-            input_columns = self.input_columns
+            input_columns = self.input_columns,
+            profiler = self.profiler
         )
         # Calling the driver inside this class to create the features.
         self.conv_data = conv_feature_builder.calculate_conversation_level_features(self.feature_methods_conv)
 
+    def save_profile_report(self) -> None:
+        """
+        Store the profile of the featurization (see the `profile` parameter) in `profile_report`, and save it as a CSV.
+
+        The report is saved with `write_profile_report`; nothing is saved in memory (when `output_writer` is None), or if
+        `write_profile` is False.
+
+        :return: None
+        :rtype: None
+        """
+        self.profiler.stop()
+        self.profile_report = self.profiler.get_report()
+        if self.output_writer is None or not self.write_profile:
+            return
+        self.write_profile_report(self.profile_report)
+
+    def write_profile_report(self, profile_report: pd.DataFrame) -> None:
+        """
+        Save a profile report as a CSV in the "profile/" subfolder of the output folder, under the base file name of the
+        chat-level output (as are the cached vectors).
+
+        :param profile_report: The profile report (see `FeatureProfiler.get_report`).
+        :type profile_report: pd.DataFrame
+        :return: None
+        :rtype: None
+        """
+        output_file_path_profile = re.sub(r'/(chat|turn)/([^/]*)$', r'/profile/\2', self.output_file_path_chat_level_original)
+        output_file_path_profile = Path(output_file_path_profile).with_suffix(".csv")
+        output_file_path_profile.parent.mkdir(parents=True, exist_ok=True)
+        profile_report.to_csv(output_file_path_profile, index=False)
+
+    def get_features_in_memory(self) -> tuple:
+        """
+        Get the feature dataframes, to be returned in memory rather than saved.
+
+        If `return_arrow_tables` is set, the dataframes are converted to Arrow tables with compact types (see
+        `ParquetWriter`); as when saving, columns from the input data keep their original types.
+
+        :return: The chat-, user-, and conversation-level features.
+        :rtype: tuple
+        """
+        if not self.return_arrow_tables:
+            return self.chat_data, self.user_data, self.conv_data
+
+        arrow_converter = ParquetWriter()
+        preserve_columns = list(self.input_columns) + list(self.orig_data.columns)
+        return tuple(arrow_converter.to_table(data, preserve_columns) for data in [self.chat_data, self.user_data, self.conv_data])
+
     def save_features(self) -> None:
         """
         Save the feature dataframes to their respective output file paths.
 
         This function saves the `chat_data`, `user_data`, and `conv_data` dataframes 
-        to the respective CSV files specified in the output file paths provided during initialization.
+        to the respective files specified in the output file paths provided during initialization,
+        using the output writer. Columns from the input data keep their original types.
+
+        If the output writer has already written to a path (as it has for all but the first chunk of a
+        StreamingFeatureBuilder), the rows are appended to that file instead.
 
         :return: None
         :rtype: None
         """
-        self.chat_data.to_csv(self.output_file_path_chat_level, index=False)
-        self.user_data.to_csv(self.output_file_path_user_level, index=False)
-        self.conv_data.to_csv(self.output_file_path_conv_level, index=False)
\ No newline at end of file
+        preserve_columns = list(self.input_columns) + list(self.orig_data.columns)
+        for data, path in [(self.chat_data, self.output_file_path_chat_level), (self.user_data, self.output_file_path_user_level), (self.conv_data, self.output_file_path_conv_level)]:
+            self.output_writer.write(data, path, preserve_columns = preserve_columns)
\ No newline at end of file
@@ -27,7 +27,8 @@ feature_dict = { # TODO: customize preprocess methods
     "dependencies": [],
     "preprocess": [],
     "vect_data": False,
-    "bert_sentiment_data": False
+    "bert_sentiment_data": False,
+    "conversation_context": False
   },
   "Sentiment (RoBERTa)": {
     "columns": ["positive_bert", "negative_bert", "neutral_bert"],
@@ -41,7 +42,8 @@ feature_dict = { # TODO: customize preprocess methods
     "dependencies": [],
     "preprocess": [],
     "vect_data": False,
-    "bert_sentiment_data": True
+    "bert_sentiment_data": True,
+    "conversation_context": False
   },
   "Message Length": {
     "columns": ["num_words", "num_chars"],
@@ -55,7 +57,8 @@ feature_dict = { # TODO: customize preprocess methods
     "dependencies": [],
     "preprocess": [],
     "vect_data": False,
-    "bert_sentiment_data": False
+    "bert_sentiment_data": False,
+    "conversation_context": False
   },
   "Message Quantity": {
     "columns": ["num_messages"],
@@ -69,7 +72,8 @@ feature_dict = { # TODO: customize preprocess methods
     "dependencies": [],
     "preprocess": [],
     "vect_data": False,
-    "bert_sentiment_data": False
+    "bert_sentiment_data": False,
+    "conversation_context": False
   },
   "Information Exchange": {
     "columns": [
@@ -86,7 +90,8 @@ feature_dict = { # TODO: customize preprocess methods
     "dependencies": [ChatLevelFeaturesCalculator.text_based_features],
     "preprocess": [],
     "vect_data": False,
-    "bert_sentiment_data": False
+    "bert_sentiment_data": False,
+    "conversation_context": True
   },
   "LIWC and Other Lexicons": {
     "columns": [
@@ -156,7 +161,8 @@ feature_dict = { # TODO: customize preprocess methods
     "dependencies": [ChatLevelFeaturesCalculator.text_based_features],
     "preprocess": [],
     "vect_data": False,
-    "bert_sentiment_data": False
+    "bert_sentiment_data": False,
+    "conversation_context": False
   },
   "Questions": {
     "columns": ["num_question_naive"],
@@ -170,7 +176,8 @@ feature_dict = { # TODO: customize preprocess methods
     "dependencies": [ChatLevelFeaturesCalculator.text_based_features, ChatLevelFeaturesCalculator.lexical_features],
     "preprocess": [preprocess_text_lowercase_but_retain_punctuation], # "message_lower_with_punc"
     "vect_data": False,
-    "bert_sentiment_data": False
+    "bert_sentiment_data": False,
+    "conversation_context": False
   },
   "Conversational Repair": {
     "columns": ["NTRI"],
@@ -184,7 +191,8 @@ feature_dict = { # TODO: customize preprocess methods
     "dependencies": [ChatLevelFeaturesCalculator.text_based_features, ChatLevelFeaturesCalculator.lexical_features],
     "preprocess": [preprocess_text_lowercase_but_retain_punctuation], # "message_lower_with_punc"
     "vect_data": False,
-    "bert_sentiment_data": False
+    "bert_sentiment_data": False,
+    "conversation_context": False
   },
   "Word Type-Token Ratio": {
     "columns": ["word_TTR"],
@@ -198,7 +206,8 @@ feature_dict = { # TODO: customize preprocess methods
     "dependencies": [ChatLevelFeaturesCalculator.text_based_features, ChatLevelFeaturesCalculator.lexical_features],
     "preprocess": [preprocess_text_lowercase_but_retain_punctuation], # "message_lower_with_punc"
     "vect_data": False,
-    "bert_sentiment_data": False
+    "bert_sentiment_data": False,
+    "conversation_context": False
   },
   "Proportion of First-Person Pronouns": {
     "columns": ["first_pronouns_proportion"],
@@ -212,7 +221,8 @@ feature_dict = { # TODO: customize preprocess methods
     "dependencies": [ChatLevelFeaturesCalculator.text_based_features, ChatLevelFeaturesCalculator.lexical_features],
     "preprocess": [preprocess_text_lowercase_but_retain_punctuation], # "message_lower_with_punc"
     "vect_data": False,
-    "bert_sentiment_data": False
+    "bert_sentiment_data": False,
+    "conversation_context": False
   },
   "Function Word Accommodation": {
     "columns": ["function_word_accommodation"],
@@ -226,7 +236,8 @@ feature_dict = { # TODO: customize preprocess methods
     "dependencies": [],
     "preprocess": [],
     "vect_data": False,
-    "bert_sentiment_data": False
+    "bert_sentiment_data": False,
+    "conversation_context": True
   },
   "Content Word Accommodation": {
     "columns": ["content_word_accommodation"],
@@ -240,7 +251,8 @@ feature_dict = { # TODO: customize preprocess methods
     "dependencies": [],
     "preprocess": [],
     "vect_data": False,
-    "bert_sentiment_data": False
+    "bert_sentiment_data": False,
+    "conversation_context": True
   },
   "(BERT) Mimicry": {
     "columns": ["mimicry_bert"],
@@ -254,7 +266,8 @@ feature_dict = { # TODO: customize preprocess methods
     "dependencies": [],
     "preprocess": [],
     "vect_data": True,
-    "bert_sentiment_data": False
+    "bert_sentiment_data": False,
+    "conversation_context": True
   },
   "Moving Mimicry": {
     "columns": ["moving_mimicry"],
@@ -268,7 +281,8 @@ feature_dict = { # TODO: customize preprocess methods
     "dependencies": [],
     "preprocess": [],
     "vect_data": True,
-    "bert_sentiment_data": False
+    "bert_sentiment_data": False,
+    "conversation_context": True
   },
   "Hedge": {
     "columns": ["hedge_naive"],
@@ -282,7 +296,8 @@ feature_dict = { # TODO: customize preprocess methods
     "dependencies": [ChatLevelFeaturesCalculator.text_based_features, ChatLevelFeaturesCalculator.lexical_features],
     "preprocess": [],
     "vect_data": False,
-    "bert_sentiment_data": False
+    "bert_sentiment_data": False,
+    "conversation_context": False
   },
   "TextBlob Subjectivity": {
     "columns": ["textblob_subjectivity"],
@@ -296,7 +311,8 @@ feature_dict = { # TODO: customize preprocess methods
     "dependencies": [],
     "preprocess": [],
     "vect_data": False,
-    "bert_sentiment_data": False
+    "bert_sentiment_data": False,
+    "conversation_context": False
   },
   "TextBlob Polarity": {
     "columns": ["textblob_polarity"],
@@ -310,7 +326,8 @@ feature_dict = { # TODO: customize preprocess methods
     "dependencies": [],
     "preprocess": [],
     "vect_data": False,
-    "bert_sentiment_data": False
+    "bert_sentiment_data": False,
+    "conversation_context": False
   },
   "Positivity Z-Score": {
     "columns": ["positivity_zscore_chats", "positivity_zscore_conversation"],
@@ -324,7 +341,8 @@ feature_dict = { # TODO: customize preprocess methods
     "dependencies": [ChatLevelFeaturesCalculator.concat_bert_features],
     "preprocess": [],
     "vect_data": False,
-    "bert_sentiment_data": True
+    "bert_sentiment_data": True,
+    "conversation_context": True
   },
   "Dale-Chall Score": {
     "columns": ["dale_chall_score", "dale_chall_classification"],
@@ -338,7 +356,8 @@ feature_dict = { # TODO: customize preprocess methods
     "dependencies": [],
     "preprocess": [],
     "vect_data": False,
-    "bert_sentiment_data": False
+    "bert_sentiment_data": False,
+    "conversation_context": False
   },
   "Time Difference": {
     "columns": ["time_diff"],
@@ -352,7 +371,8 @@ feature_dict = { # TODO: customize preprocess methods
     "dependencies": [],
     "preprocess": [],
     "vect_data": False,
-    "bert_sentiment_data": False
+    "bert_sentiment_data": False,
+    "conversation_context": True
   },
   "Politeness Strategies": {
     "columns": [
@@ -388,7 +408,8 @@ feature_dict = { # TODO: customize preprocess methods
     "dependencies": [],
     "preprocess": [preprocess_text_lowercase_but_retain_punctuation], # "message_lower_with_punc"
     "vect_data": False,
-    "bert_sentiment_data": False
+    "bert_sentiment_data": False,
+    "conversation_context": False
   },
   "Politeness / Receptiveness Markers": {
     "columns": [
@@ -442,7 +463,8 @@ feature_dict = { # TODO: customize preprocess methods
     "dependencies": [],
     "preprocess": [preprocess_text_lowercase_but_retain_punctuation], # "message_lower_with_punc"
     "vect_data": False,
-    "bert_sentiment_data": False
+    "bert_sentiment_data": False,
+    "conversation_context": False
   },
   "Forward Flow": {
     "columns": ["forward_flow"],
@@ -456,7 +478,8 @@ feature_dict = { # TODO: customize preprocess methods
     "dependencies": [],
     "preprocess": [],
     "vect_data": True,
-    "bert_sentiment_data": False
+    "bert_sentiment_data": False,
+    "conversation_context": True
   },
   "Certainty": {
     "columns": ["certainty_rocklage"],
@@ -470,7 +493,8 @@ feature_dict = { # TODO: customize preprocess methods
     "dependencies": [],
     "preprocess": [preprocess_text_lowercase_but_retain_punctuation], # "message_lower_with_punc"
     "vect_data": False,
-    "bert_sentiment_data": False
+    "bert_sentiment_data": False,
+    "conversation_context": False
   },
   "Online Discussion Tags": {
     "columns": [
@@ -496,9 +520,12 @@ feature_dict = { # TODO: customize preprocess methods
     "dependencies": [],
     "preprocess": [preprocess_text_lowercase_but_retain_punctuation], # "message_lower_with_punc"
     "vect_data": False,
-    "bert_sentiment_data": False
+    "bert_sentiment_data": False,
+    "conversation_context": False
   },
   ### Conversation Level
+  # (conversation_context only applies to chat-level features: whether a feature depends on the other chats of its conversation,
+  # rather than only on the message. Conversation-level features are always computed on whole conversations.)
   "Turn-Taking Index": {
     "columns": ["turn_taking_index"],
     "file": "./features/turn_taking_features.py",
@@ -511,7 +538,8 @@ feature_dict = { # TODO: customize preprocess methods
     "dependencies": [],
     "preprocess": [],
     "vect_data": False,
-    "bert_sentiment_data": False
+    "bert_sentiment_data": False,
+    "conversation_context": False
   },
   "Equal Participation": {
     "columns": [
@@ -529,7 +557,8 @@ feature_dict = { # TODO: customize preprocess methods
     "dependencies": [ChatLevelFeaturesCalculator.text_based_features],
     "preprocess": [],
     "vect_data": False,
-    "bert_sentiment_data": False
+    "bert_sentiment_data": False,
+    "conversation_context": False
   },
   "Conversation Level Aggregates": {
     "columns": [], 
@@ -543,7 +572,8 @@ feature_dict = { # TODO: customize preprocess methods
     "dependencies": [],
     "preprocess": [],
     "vect_data": False,
-    "bert_sentiment_data": False
+    "bert_sentiment_data": False,
+    "conversation_context": False
   },
   "User Level Aggregates": {
     "columns": [], 
@@ -557,7 +587,8 @@ feature_dict = { # TODO: customize preprocess methods
     "dependencies": [],
     "preprocess": [],
     "vect_data": False,
-    "bert_sentiment_data": False
+    "bert_sentiment_data": False,
+    "conversation_context": False
   },
   "Discursive Diversity": {
     "columns": [
@@ -576,7 +607,8 @@ feature_dict = { # TODO: customize preprocess methods
     "dependencies": [],
     "preprocess": [],
     "vect_data": True,
-    "bert_sentiment_data": False
+    "bert_sentiment_data": False,
+    "conversation_context": False
   },
   "Team Burstiness": {
     "columns": ["team_burstiness"],
@@ -590,7 +622,8 @@ feature_dict = { # TODO: customize preprocess methods
     "dependencies": [],
     "preprocess": [],
     "vect_data": False,
-    "bert_sentiment_data": False
+    "bert_sentiment_data": False,
+    "conversation_context": False
   },
   "Information Diversity": {
     "columns": ["info_diversity"],
@@ -604,7 +637,8 @@ feature_dict = { # TODO: customize preprocess methods
     "dependencies": [],
     "preprocess": [],
     "vect_data": False,
-    "bert_sentiment_data": False
+    "bert_sentiment_data": False,
+    "conversation_context": False
   }
 }
 
@@ -2,16 +2,19 @@ import numpy as np
 
 # Defines simple text features on a text or conversation.
 
-def count_words(text):
+def count_words(text, words=None):
 	""" Returns the number of words in a message.
 
 	Args:
 		text (str): The message (utterance) for which we are counting words.
+		words (list, optional): The words of the message (split at whitespace), if they have already been tokenized (e.g., by the TokenStore).
 
 	Returns:
 		int: number of words
 	"""
-	return len(text.split())
+	if words is None:
+		words = text.split()
+	return len(words)
 
 def count_characters(text):
 	""" Counts the number of characters in a message.
@@ -3,6 +3,26 @@ import numpy as np
 
 from .temporal_features import coerce_to_date_or_number
 
+def get_wait_times_in_seconds(time_diffs):
+    """ Converts a column of time differences into a float column of seconds.
+
+    The time differences computed by the temporal features are usually floats (seconds elapsed), but they can
+    also be timedeltas (e.g., when the start and end timestamps are datetimes); both are supported without
+    converting values one at a time.
+
+    Args:
+        time_diffs (pd.Series): The time differences between messages, as floats or timedeltas.
+
+    Returns:
+        pd.Series: The time differences between messages, in seconds (as floats).
+    """
+    if pd.api.types.is_timedelta64_dtype(time_diffs):
+        return time_diffs.dt.total_seconds()
+    try:
+        return time_diffs.astype(float)
+    except (TypeError, ValueError): # an object column holding timedelta objects
+        return pd.to_timedelta(time_diffs).dt.total_seconds()
+
 def burstiness(df, timediff):
     """ Computes the level of "burstiness" in a conversation, or the extent to which messages in a 
     conversation occur periodically (e.g., every X seconds), versus in a "bursty" pattern 
@@ -45,6 +65,9 @@ def get_team_burstiness(df, timediff, conversation_id_col):
     The Burstiness feature takes advantage of the fact that we already compute the time difference between messages
     as one of the utterance (chat)-level features.
 
+    Rather than applying `burstiness` to each conversation, the mean and standard deviation of the wait times are computed
+    for all conversations in one grouped reduction (dropping the first message of each conversation, as `burstiness` does).
+
     Args:
         df (pd.DataFrame): The utterance (chat)-level dataframe.
         timediff (str): The column name associated with the time differences between messages in a conversation (computed by the utterance-level feature, get_temporal_features.) 
@@ -57,6 +80,27 @@ def get_team_burstiness(df, timediff, conversation_id_col):
         print(f"Temporal Features are nonexistent for this dataset.")
         return None
     
-    # Applies burstiness function to overall dataframe and then groups coefficient by conversation number
-    burstiness_coeff = df.groupby(conversation_id_col).apply(lambda x : burstiness(x, timediff)).reset_index().rename(columns={0: "team_burstiness"})
+    conversation_ids = df[conversation_id_col]
+    is_timedelta = pd.api.types.is_timedelta64_dtype(df[timediff])
+    wait_times = get_wait_times_in_seconds(df[timediff])
+
+    # If there are no time differences (at most one non-NA value), the burstiness is 0
+    num_time_diffs = df[timediff].groupby(conversation_ids).count()
+
+    # The first message in a conversation has no wait time
+    is_first_message = conversation_ids.groupby(conversation_ids).cumcount() == 0
+    wait_times = wait_times[~is_first_message]
+    grouped_wait_times = wait_times.groupby(conversation_ids[~is_first_message])
+
+    # Compute coefficient of variation measure B (Goh & Barabasi 2008)
+    standard_deviation = grouped_wait_times.std(ddof=0)
+    mean = grouped_wait_times.mean()
+    B = (standard_deviation - mean) / (standard_deviation + mean)
+    if not is_timedelta: # missing float wait times make the coefficient undefined, whereas missing timedeltas are skipped
+        B = B.where(~wait_times.isna().groupby(conversation_ids[~is_first_message]).any())
+
+    B = B.reindex(num_time_diffs.index)
+    B[num_time_diffs <= 1] = 0
+
+    burstiness_coeff = B.rename("team_burstiness").reset_index()
     return burstiness_coeff
@@ -19,15 +19,14 @@ def get_forward_flow(chat_data, vect_data, conversation_id_col):
         List: List of cosine similarities representing forward flow for each chat in the conversation.
     """
     
-    chat_df = chat_data.copy()
-    chat_df['message_embedding'] = conv_to_float_arr(vect_data['message_embedding'].to_frame())
+    chat_df = get_embedding_view(chat_data, vect_data, conversation_id_col)
 
     forward_flow = []
 
     for num, conv in chat_df.groupby(conversation_id_col,  sort=False):
 
         forward_flow.append(0)
-        embedding_running_sum = conv.iloc[0]["message_embedding"]
+        embedding_running_sum = conv.iloc[0]["message_embedding"].copy() # copied, as the running sum is updated in place
         chat_count = 1
         avg_embedding = embedding_running_sum / chat_count
 
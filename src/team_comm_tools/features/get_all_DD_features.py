@@ -11,6 +11,9 @@ def conv_to_float_arr(df):
     """
     Converts message embeddings in pd.DataFrame from string format to float arrays.
 
+    Each embedding is parsed exactly once; when all embeddings have the same length, they are stacked into a single
+    matrix, and each row of the 'message_embedding' column is a view of its row in that matrix.
+
     Args:
         df (pd.DataFrame): pd.DataFrame containing 'message_embedding' column with string-encoded embeddings.
 
@@ -18,12 +21,35 @@ def conv_to_float_arr(df):
         pd.DataFrame: pd.DataFrame with 'message_embedding' column containing float arrays.
     """
 
-    if isinstance(df['message_embedding'][0], str):
-            df['message_embedding'] = [val[1:-1] for val in df['message_embedding']]
-            df['message_embedding'] = [[float(e) for e in embedding.split(',')] for embedding in df['message_embedding']]
-            df['message_embedding'] = [np.array(e) for e in df['message_embedding']]
+    if len(df) > 0 and isinstance(df['message_embedding'].iloc[0], str):
+            embeddings = [np.array(val[1:-1].split(','), dtype=float) for val in df['message_embedding']]
+            if len({len(embedding) for embedding in embeddings}) == 1:
+                embeddings = list(np.vstack(embeddings))
+            df['message_embedding'] = embeddings
     return df
 
+def get_embedding_view(chat_data, vect_data, conversation_id_col, speaker_id_col = None):
+    """
+    Builds the slim view of the chat data that the embedding-based features work on: the conversation identifier
+    (and, optionally, the speaker identifier) of each chat, alongside its message embedding.
+
+    This avoids copying the entire chat-level dataframe (with all of its features) for each embedding-based feature.
+    If the embeddings in `vect_data` have already been parsed (see `conv_to_float_arr`), the view shares them.
+
+    Args:
+        chat_data (pd.DataFrame): pd.DataFrame containing chat data.
+        vect_data (pd.DataFrame): pd.DataFrame containing vectorized data.
+        conversation_id_col (str): Column name for conversation identifiers.
+        speaker_id_col (str, optional): Column name for speaker identifiers. Defaults to None, in which case it is left out.
+
+    Returns:
+        pd.DataFrame: pd.DataFrame with the identifier column(s) and a 'message_embedding' column containing float arrays.
+    """
+    id_columns = [conversation_id_col] if speaker_id_col is None else [conversation_id_col, speaker_id_col]
+    embedding_view = chat_data[id_columns].copy()
+    embedding_view['message_embedding'] = conv_to_float_arr(vect_data['message_embedding'].to_frame())
+    return embedding_view
+
 def get_DD_features(chat_data, vect_data, conversation_id_col, speaker_id_col, timestamp_col):
     """
     This is an "umbrella" feature called at the conversation level.
@@ -40,10 +66,8 @@ def get_DD_features(chat_data, vect_data, conversation_id_col, speaker_id_col, t
         pd.DataFrame:pd.DataFrame containing merged discursive metrics for each conversation.
     """
     
-    chats = chat_data.copy()
-
     # Format data
-    chats['message_embedding'] = conv_to_float_arr(vect_data['message_embedding'].to_frame())
+    chats = get_embedding_view(chat_data, vect_data, conversation_id_col, speaker_id_col)
 
     # Get discursive diversity
     disc_div = get_DD(chats, conversation_id_col, speaker_id_col)
@@ -1,32 +1,105 @@
 import pandas as pd
 import numpy as np
 
-def remove_active_user(df, speaker_id_col):
+class UserNetwork:
     """
-    Removes the active user from their own 'user_list' in each row of the DataFrame.
+    A compact representation of the "user_list" of every user in every conversation.
+
+    Instead of storing a separate array of the other users for each row, speakers are stored as integer codes,
+    and the members of all conversations are stored in one flat array. Offsets in the style of a CSR
+    ("compressed sparse row") matrix mark where each conversation's members begin and end, so the memory needed
+    grows with the number of users, rather than with the square of the conversation size.
+
+    Args:
+        speakers (np.ndarray): The unique speaker identifiers; a speaker code is a position in this array.
+        speaker_codes (np.ndarray): The speaker code of each row of the user-level data.
+        row_conversations (np.ndarray): The conversation code of each row of the user-level data.
+        conversation_offsets (np.ndarray): The start of each conversation in `conversation_members` (with a final entry marking the end).
+        conversation_members (np.ndarray): The speaker codes of the members of each conversation, stored contiguously by conversation.
+    """
+    def __init__(self, speakers, speaker_codes, row_conversations, conversation_offsets, conversation_members):
+        self.speakers = speakers
+        self.speaker_codes = speaker_codes
+        self.row_conversations = row_conversations
+        self.conversation_offsets = conversation_offsets
+        self.conversation_members = conversation_members
+
+    def __len__(self):
+        return len(self.speaker_codes)
+
+    def get_user_list(self, row):
+        """
+        Returns the other users in the conversation of a single row of the user-level data.
+
+        Args:
+            row (int): The position of the row in the user-level data.
+
+        Returns:
+            np.ndarray: The identifiers of the other users participating in the row's conversation.
+        """
+        conversation = self.row_conversations[row]
+        members = self.conversation_members[self.conversation_offsets[conversation]:self.conversation_offsets[conversation + 1]]
+        return self.speakers[members[members != self.speaker_codes[row]]]
+
+    def to_user_lists(self):
+        """
+        Expands the compact representation into one array of other users per row, with the active user removed in bulk.
+
+        Returns:
+            list: A list (aligned with the user-level data) of arrays containing the other users in each row's conversation.
+        """
+        conversation_sizes = np.diff(self.conversation_offsets)[self.row_conversations]
+
+        # repeat each conversation's members once for every user in that conversation
+        repeated_rows = np.repeat(np.arange(len(self)), conversation_sizes)
+        positions = np.arange(conversation_sizes.sum()) - np.repeat(np.cumsum(conversation_sizes) - conversation_sizes, conversation_sizes)
+        member_codes = self.conversation_members[self.conversation_offsets[self.row_conversations][repeated_rows] + positions]
+
+        # remove the active user from their own list
+        is_other_user = member_codes != self.speaker_codes[repeated_rows]
+        other_users = self.speakers[member_codes[is_other_user]]
+        num_other_users = np.bincount(repeated_rows[is_other_user], minlength=len(self))
+
+        return np.split(other_users, np.cumsum(num_other_users)[:-1])
+
+def get_compact_user_network(user_df, conversation_id_col, speaker_id_col):
+    """
+    Takes in data at the user level, and generates a compact UserNetwork, from which the "user_list" of each user in each
+    conversation can be retrieved.
 
     Args:
-        df (pd.DataFrame): Contains 'speaker_nickname' and 'user_list' columns.
+        user_df (pd.DataFrame): The dataset for which we are generating a "user_list" per user per conversation.
+        conversation_id_col (str): The name of the column containing conversation identifiers.
         speaker_id_col (str): The name of the column containing the speaker's unique identifier.
 
     Returns:
-        pd.DataFrame: Modified pd.DataFrame with 'user_list' updated to remove the active user.
+        UserNetwork: The users of each conversation, as integer speaker codes with CSR offsets.
     """
+    speaker_codes, _ = pd.factorize(user_df[speaker_id_col])
+    row_conversations, conversations = pd.factorize(user_df[conversation_id_col], sort=True)
+    speaker_values = user_df[speaker_id_col].to_numpy()
+
+    # group the rows by conversation (keeping their original order within each conversation)
+    rows_by_conversation = np.argsort(row_conversations, kind="stable")
+    conversation_offsets = np.concatenate([[0], np.cumsum(np.bincount(row_conversations, minlength=len(conversations)))])
 
-    counter = 0
-    for index, row in df.iterrows():
-        user = row[speaker_id_col]
-        user_list = row['user_list']
-        i = np.argwhere(user_list==user)
-        df.at[index,'user_list'] = np.delete(row['user_list'],i)
-        df.iloc
-    return df
+    # keep the original values (and dtype) of the speaker identifiers, indexed by speaker code
+    speakers = np.empty(speaker_codes.max() + 1 if len(speaker_codes) else 0, dtype=speaker_values.dtype)
+    speakers[speaker_codes] = speaker_values
+
+    return UserNetwork(
+        speakers = speakers,
+        speaker_codes = speaker_codes,
+        row_conversations = row_conversations,
+        conversation_offsets = conversation_offsets,
+        conversation_members = speaker_codes[rows_by_conversation]
+    )
 
 def get_user_network(user_df, conversation_id_col, speaker_id_col):
     """
-    Takes in data at the user level, and generates a "user_list" per user per conversation. This "user_list" contains the other participating in this conversation. 
+    Takes in data at the user level, and generates a "user_list" per user per conversation. This "user_list" contains the other participating in this conversation.
     This is a user level feature.
-    
+
     Args:
         user_df (pd.DataFrame): The dataset for which we are generating a "user_list" per user per conversation.
         conversation_id_col (str): The name of the column containing conversation identifiers.
@@ -35,17 +108,8 @@ def get_user_network(user_df, conversation_id_col, speaker_id_col):
     Returns:
         pd.DataFrame: Updated user_df with a 'user_list' column
     """
-    
-    user_lists = user_df.groupby(conversation_id_col, group_keys=True).apply(lambda df : np.asarray(df[speaker_id_col]))
-
-    user_list_df = pd.merge(
-        left=user_df,
-        right=user_lists.rename("user_list"),
-        on=[conversation_id_col],
-        how="inner"
-    )
-    
-    user_list_df_final = user_list_df.groupby(conversation_id_col, group_keys=True).apply(
-        lambda df : remove_active_user(df, speaker_id_col)).reset_index(drop=True)
-    
-    return user_list_df_final[[conversation_id_col, speaker_id_col, 'user_list']]
\ No newline at end of file
+
+    user_list_df_final = user_df[[conversation_id_col, speaker_id_col]].copy()
+    user_list_df_final['user_list'] = get_compact_user_network(user_df, conversation_id_col, speaker_id_col).to_user_lists()
+
+    return user_list_df_final
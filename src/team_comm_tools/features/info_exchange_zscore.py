@@ -2,12 +2,27 @@ import numpy as np
 import pandas as pd
 import re
 
+def count_first_person_words(df, first_person, message_col):
+  '''
+  This function counts the first person singular pronouns in each message.
+
+  Args:
+    df (pd.DataFrame):  This is a pandas dataframe of the chat level features.
+    first_person (list): A list of first person words. This comes from get_first_person_words() under the Utilities.
+    message_col (str): This is a string with the name of the column containing the message / text.
+
+  Returns:
+    pd.Series: A column containing the raw number of first-person singular pronouns in each message.
+  '''
+  first_person_regex = " | ".join(first_person)
+  return df[message_col].apply(lambda chat: len(re.findall(first_person_regex, chat)))
+
 def get_info_exchange_wordcount(df, first_person, message_col):
   '''
   This functinon computes the total word count in a message minus first person singular pronouns.
 
-  Note that the function assumes that lexical features and basic features have already been run, and have generated a raw count of
-  first-person pronouns (stored in "first_person_raw") and a total number of words (stored in "num_words").
+  Note that the function assumes that basic features have already been run, and have generated a total number of words (stored in "num_words").
+  The first-person pronouns are counted with `count_first_person_words`.
 
   This value then serves as an input into a Z-score (calculated using a function in Utilities); the idea
   is to compute the extent to which a team exchanges more or fewer "content words" outside of first-person pronouns,
@@ -28,6 +43,4 @@ def get_info_exchange_wordcount(df, first_person, message_col):
     pd.Series: A column containing the difference in total words and first-person singular pronouns.
 
   '''
-  first_person_regex = " | ".join(first_person)
-  df['first_person_raw'] = df[message_col].apply(lambda chat: len(re.findall(first_person_regex, chat)))
-  return (df["num_words"] - df["first_person_raw"])
\ No newline at end of file
+  return (df["num_words"] - count_first_person_words(df, first_person, message_col))
\ No newline at end of file
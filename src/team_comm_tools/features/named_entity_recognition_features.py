@@ -1,4 +1,8 @@
 import numpy as np
+import os
+import shutil
+import tempfile
+import hashlib
 import string
 import spacy
 from spacy.training import Example
@@ -11,48 +15,36 @@ from team_comm_tools.utils.preprocess import *
 #Detects whether a user is talking about (or to) someone else in a conversation.
 
 nlp = spacy.load("en_core_web_sm")
-named_entities_list=[]
 
-def num_named_entity(text, cutoff):
+def num_named_entity(text, cutoff, model=None):
     """ Returns the number of named entities in a message.
 
     Args:
         text (str): The message (utterance) for which we are counting named entities.
         cutoff (int): The confidence threshold for each named entity.
+        model (spacy.Language, optional): The (fine-tuned) spaCy model; defaults to the module's en_core_web_sm model.
 
     Returns: 
         int: Number of named entities in a message
 
     """
+    return len(calculate_named_entities(text, cutoff, model))
 
-    if (len(named_entities_list) > 0):
-        named_entities_list.clear()
-
-    calculate_named_entities(text, cutoff)
-
-    # number of named entities
-    return (len(named_entities_list))
-
-def named_entities(text, cutoff):
+def named_entities(text, cutoff, model=None):
     """ Returns a tuple of all (named-entities, confidence score) in a message
     
     Args:
         text (str): The message (utterance) for which we are counting named entities.
         cutoff (int): The confidence threshold for each named entity.
+        model (spacy.Language, optional): The (fine-tuned) spaCy model; defaults to the module's en_core_web_sm model.
 
     Returns:
         tuple: A tuple of tuples that contains the (named entity, confidence score)
 
     """ 
-    if (len(named_entities_list) > 0):
-        named_entities_list.clear()
-
-    calculate_named_entities(text, cutoff)
-
-    # number of named entities
-    return(tuple(named_entities_list))
+    return tuple(calculate_named_entities(text, cutoff, model))
   
-def calculate_named_entities(text, cutoff):
+def calculate_named_entities(text, cutoff, model=None):
     """ Counts the number of named entities in a message in which their confidence scores 
     exceed the cutoff.
 
@@ -61,31 +53,129 @@ def calculate_named_entities(text, cutoff):
     Args:
         text (str): The message (utterance) for which we are counting named entities.
         cutoff (int): The confidence threshold for each named entity.
+        model (spacy.Language, optional): The (fine-tuned) spaCy model; defaults to the module's en_core_web_sm model.
 
     Returns:
         List: The list of all named entities in a message and their confidence scores
     """  
-    docs = list(nlp.pipe([text], disable=['ner']))
+    if model is None:
+        model = nlp
+    docs = list(model.pipe([text], disable=['ner']))
 
     # beam search parsing for ner
-    beams = nlp.get_pipe('ner').beam_parse(docs, beam_width=16, beam_density=0.0001)
+    beams = model.get_pipe('ner').beam_parse(docs, beam_width=16, beam_density=0.0001)
+    return get_confident_entities(docs[0], beams[0], model.get_pipe('ner'), cutoff)
+
+def get_confident_entities(doc, beam, ner, cutoff):
+    """ Returns the PERSON entities of a parsed message whose confidence scores exceed the cutoff.
+
+    Args:
+        doc (spacy.tokens.Doc): The parsed message.
+        beam: The beam search parse of the message by the named entity recognizer.
+        ner: The named entity recognizer (the 'ner' pipe of the spaCy model).
+        cutoff (int): The confidence threshold for each named entity.
+
+    Returns:
+        List: The list of all named entities in the message and their confidence scores
+    """
     entity_scores = defaultdict(float)
-    
+
     # calculating confidence in each named entity prediction
-    for doc, beam in zip(docs, beams):
-        for score, ents in nlp.get_pipe('ner').moves.get_beam_parses(beam):
-            for start, end, label in ents:
-                # sum scores for each named entity
-                entity_scores[(start, end, label)] += score
+    for score, ents in ner.moves.get_beam_parses(beam):
+        for start, end, label in ents:
+            # sum scores for each named entity
+            entity_scores[(start, end, label)] += score
 
+    confident_entities = []
     for key in entity_scores:
         start, end, label = key
         score = entity_scores[key]
 
         # checks if confidence is above the cutoff and if named entity is a PERSON
         if score > cutoff and label == "PERSON":
-            named_entities_list.append((doc[start:end], score))
-   
+            confident_entities.append((doc[start:end], score))
+    return confident_entities
+
+def get_named_entities(texts, model, cutoff, batch_size=256, num_workers=1):
+    """ Returns the named entities (and their confidence scores) of every message in a column.
+
+    Each distinct message is parsed once: the messages are streamed through `model.pipe`, and beam-parsed by the named
+    entity recognizer one batch at a time.
+
+    Args:
+        texts (pd.Series): The messages (utterances) for which we are finding named entities.
+        model (spacy.Language): The (fine-tuned) spaCy model.
+        cutoff (int): The confidence threshold for each named entity.
+        batch_size (int, optional): The number of messages to parse at a time. Defaults to 256.
+        num_workers (int, optional): The number of worker processes for `model.pipe`. Defaults to 1.
+
+    Returns:
+        pd.Series: A tuple of (named entity, confidence score) tuples for each message, with the same index as `texts`.
+    """
+    message_codes, unique_messages = pd.factorize(texts, use_na_sentinel=False)
+    ner = model.get_pipe('ner')
+
+    unique_entities = []
+    docs = model.pipe(unique_messages, disable=['ner'], batch_size=batch_size, n_process=num_workers)
+    for batch in spacy.util.minibatch(docs, size=batch_size):
+        beams = ner.beam_parse(batch, beam_width=16, beam_density=0.0001)
+        for doc, beam in zip(batch, beams):
+            unique_entities.append(tuple(get_confident_entities(doc, beam, ner, cutoff)))
+
+    return pd.Series([unique_entities[code] for code in message_codes], index=texts.index, dtype=object)
+
+def get_training_key(training):
+    """ Returns a key that identifies the NER training data (and the spaCy version), used to cache the fine-tuned model.
+
+    Args:
+        training (pd.DataFrame): The user inputted training dataframe
+
+    Returns:
+        str: A hash of the sentences and names to train on.
+    """
+    training_hash = hashlib.sha1(spacy.__version__.encode("utf-8"))
+    for column in ["sentence_to_train", "name_to_train"]:
+        training_hash.update(pd.util.hash_pandas_object(training[column].astype(str), index=False).to_numpy().tobytes())
+    return training_hash.hexdigest()
+
+def get_ner_model(training, model_directory=None):
+    """ Returns a spaCy model fine-tuned on the NER training data.
+
+    Fine-tuned models are saved in `model_directory`, under a key computed from the training data (see `get_training_key`),
+    and later runs with the same training data load the saved model instead of training it again. Each model is fine-tuned
+    from a freshly loaded en_core_web_sm model, so training never modifies a model that is in use elsewhere. The model is
+    written to a temporary directory and then moved into place, so a run that is interrupted (or that runs at the same time
+    as another) never leaves a partially written model behind.
+
+    Args:
+        training (pd.DataFrame): The user inputted training dataframe
+        model_directory (str, optional): The directory in which to save (and look for) fine-tuned models. Defaults to None, in which case the model is trained without being saved.
+
+    Returns:
+        spacy.Language: The fine-tuned model.
+    """
+    model_path = None
+    if model_directory is not None:
+        model_path = os.path.join(model_directory, get_training_key(training))
+        if os.path.isdir(model_path):
+            return spacy.load(model_path)
+
+    model = train_spacy_ner(training.copy(), spacy.load("en_core_web_sm"))
+
+    if model_path is not None:
+        os.makedirs(model_directory, exist_ok=True)
+        temporary_path = tempfile.mkdtemp(dir=model_directory, prefix=".tmp_")
+        try:
+            model.to_disk(temporary_path)
+            os.replace(temporary_path, model_path)
+        except OSError:
+            # another run saved the same model first; keep theirs
+            if not os.path.isdir(model_path):
+                raise
+        finally:
+            shutil.rmtree(temporary_path, ignore_errors=True)
+    return model
+
 def built_spacy_ner(text, target, type):
     """ Returns a tuple of sentences, the named entity and its position in the sentence, and its label for training
 
@@ -105,16 +195,21 @@ def built_spacy_ner(text, target, type):
 
     return (text, {"entities": [(start, end, type)]})
  
-def train_spacy_ner(training):
+def train_spacy_ner(training, model=None):
     """ Trains model based on user inputted dataframe that provides example sentences and the named entity that appears in each sentence.
 
     Inspired by https://dataknowsall.com/blog/ner.html
 
     Args:
         training (pd.DataFrame): The user inputted training dataframe 
+        model (spacy.Language, optional): The spaCy model to fine-tune (in place); defaults to the module's en_core_web_sm model.
 
     Returns:
+        spacy.Language: The fine-tuned model.
     """  
+    if model is None:
+        model = nlp
+
     # takes training data from user inputted file
     training["sentence_to_train"] = training["sentence_to_train"].astype(str).apply(preprocess_text)
     training["name_to_train"] = training["name_to_train"].astype(str).apply(preprocess_text)
@@ -127,7 +222,7 @@ def train_spacy_ner(training):
         )
 
     # add a named entity label
-    ner = nlp.get_pipe('ner')
+    ner = model.get_pipe('ner')
 
     # iterate through training data and add new entity labels
     for _, annotations in TRAIN_DATA:
@@ -135,10 +230,10 @@ def train_spacy_ner(training):
             ner.add_label(ent[2])
 
     # creating an optimizer and selecting a list of pipes NOT to train
-    optimizer = nlp.create_optimizer()
-    other_pipes = [pipe for pipe in nlp.pipe_names if pipe != 'ner']
+    optimizer = model.create_optimizer()
+    other_pipes = [pipe for pipe in model.pipe_names if pipe != 'ner']
 
-    with nlp.disable_pipes(*other_pipes):
+    with model.disable_pipes(*other_pipes):
         for itn in range(10):
             random.shuffle(TRAIN_DATA)
             losses = {}
@@ -146,6 +241,8 @@ def train_spacy_ner(training):
             # batch the examples and iterate over them
             for batch in spacy.util.minibatch(TRAIN_DATA, size=2):
                 for text, annotations in batch:
-                    doc = nlp.make_doc(text)
+                    doc = model.make_doc(text)
                     example = Example.from_dict(doc, annotations)
-                    nlp.update([example], drop=0.35, sgd=optimizer, losses=losses)
\ No newline at end of file
+                    model.update([example], drop=0.35, sgd=optimizer, losses=losses)
+
+    return model
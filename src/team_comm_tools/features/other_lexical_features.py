@@ -21,7 +21,7 @@ def classify_NTRI(text):
   return 1 if re.match(NTRI_regex, text) else 0
   
 ## Calculate the word type-to-token ratio
-def get_word_TTR(text):
+def get_word_TTR(text, words=None):
   """
   Get the word type-token ratio, calculated as follows:
 
@@ -31,27 +31,29 @@ def get_word_TTR(text):
 
   Args:
     text (str): The message (utterance) being analyzed.
+    words (list, optional): The words of the message with punctuation removed, if they have already been tokenized (e.g., by the TokenStore).
   
   Returns:
     float: The word type-token ratio.
 
   """
   # remove punctuations
-  new_text = re.sub(r"[^a-zA-Z0-9 ]+", '',text)
+  if words is None:
+    words = re.sub(r"[^a-zA-Z0-9 ]+", '',text).split()
   # calculate the number of unique words
-  num_unique_words = len(set(new_text.split()))
+  num_unique_words = len(set(words))
   # calculate the word type-to-token ratio
-  if count_words(new_text) == 0:
+  if len(words) == 0:
     return 0
   else:
-    return num_unique_words/count_words(new_text)   
+    return num_unique_words/len(words)
 
 def get_proportion_first_pronouns(df):
   """
   Get the proportion of first person pronouns: the total number of first person words divided by the total number of words.
 
-  Note that the function assumes that lexical features and basic features have already been run, and have generated a raw count of
-  first-person pronouns (stored in "first_person_raw") and a total number of words (stored in "num_words").
+  Note that the function assumes that a raw count of first-person pronouns (stored in "first_person_raw", using `count_first_person_words`)
+  and a total number of words (stored in "num_words", by the basic features) have already been generated.
 
   Args:
     df (pd.DataFrame):  This is a pandas dataframe of the chat level features.
@@ -1,5 +1,6 @@
 import convokit
 import spacy
+import numpy as np
 import pandas as pd
 import re
 
@@ -15,6 +16,10 @@ ps = PolitenessStrategies()
 
 spacy_nlp = spacy.load("en_core_web_sm", disable=["ner"])
 
+# The politeness strategies, in the (fixed) order in which ConvoKit reports them, and the names of their output columns
+politeness_strategy_names = list(ps.transform_utterance("", spacy_nlp=spacy_nlp).meta["politeness_strategies"])
+politeness_column_names = [re.sub('^feature_politeness_==()', '', name)[:-2].lower() + "_politeness_convokit" for name in politeness_strategy_names]
+
 def get_politeness_strategies(text):
     """
     Using the ConvoKit politeness package, obtains politeness annotations of each message, with some fields 
@@ -35,4 +40,33 @@ def get_politeness_strategies(text):
     utt = ps.transform_utterance(
         text, spacy_nlp=spacy_nlp
     )
-    return(utt.meta["politeness_strategies"])
\ No newline at end of file
+    return(utt.meta["politeness_strategies"])
+
+def get_politeness_strategies_batch(texts, batch_size=256, num_workers=1):
+    """
+    Using the ConvoKit politeness package, obtains the politeness strategies of every message in a column.
+
+    The messages are parsed together with `spacy_nlp.pipe`, and each parse is then annotated by ConvoKit (which is handed
+    the parse, rather than parsing the message again). The annotations are collected directly into an integer array with
+    one column per strategy (in the order of `politeness_strategy_names`).
+
+    Args:
+        texts (pd.Series): The texts of the utterances to be analyzed.
+        batch_size (int, optional): The number of messages to parse at a time. Defaults to 256.
+        num_workers (int, optional): The number of worker processes for `spacy_nlp.pipe`. Defaults to 1.
+
+    Returns:
+        pd.DataFrame: The politeness strategies of each message, with the columns `politeness_column_names` and the same index as `texts`.
+    """
+    messages = texts.fillna("")
+    docs = spacy_nlp.pipe((message.strip() for message in messages), batch_size=batch_size, n_process=num_workers)
+
+    strategies = np.empty((len(messages), len(politeness_strategy_names)), dtype=np.int64)
+    for position, (message, doc) in enumerate(zip(messages, docs)):
+        # hand ConvoKit the parse that we already have, rather than parsing the message again
+        utt = ps.transform_utterance(message, spacy_nlp=lambda text, doc=doc: doc)
+        message_strategies = utt.meta["politeness_strategies"]
+        strategies[position] = [message_strategies[name] for name in politeness_strategy_names]
+
+    return pd.DataFrame(strategies, columns=politeness_column_names, index=texts.index)
+
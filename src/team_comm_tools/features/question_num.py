@@ -6,7 +6,7 @@ from nltk.tokenize import word_tokenize
 import re
 
 
-def calculate_num_question_naive(text, question_words):
+def calculate_num_question_naive(text, question_words, sentences=None, sentence_first_words=None):
     """
     Get the number of sentences that either end with a question mark or start with a 
     question word (e.g., "who," "what," "when," "where," "why").
@@ -17,17 +17,22 @@ def calculate_num_question_naive(text, question_words):
     Args:
         text (str): The message (utterance) being analyzed.
         question_words (list): The list of question words.
+        sentences (list, optional): The sentences of the message, if they have already been tokenized (e.g., by the TokenStore).
+        sentence_first_words (list, optional): The first word of each of the sentences, if they have already been tokenized.
 
     Returns: 
         int: The number of questions (Sentences ending with question marks or starting with question words) in the text.
     """
     # step 1: tokenize sentence
-    sentences = sent_tokenize(text)
+    if sentences is None:
+        sentences = sent_tokenize(text)
+    if sentence_first_words is None:
+        sentence_first_words = [None] * len(sentences)
     num_q = 0
-    for sentence in sentences:
+    for sentence, first_word in zip(sentences, sentence_first_words):
         # Only proceed if the sentence contains letters or numbers
         if re.match("^[a-zA-Z0-9 ]+", sentence):
             # Is a question if the sentence ends with "?" or starts with a word that is in the question_words list
-            if sentence.endswith("?") or word_tokenize(sentence)[0] in question_words:
+            if sentence.endswith("?") or (first_word if first_word is not None else word_tokenize(sentence)[0]) in question_words:
                 num_q += 1
     return num_q
\ No newline at end of file
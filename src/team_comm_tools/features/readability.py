@@ -1,14 +1,23 @@
+import numpy as np
 import pandas as pd
 import re
 import nltk
 import pyphen
+from functools import lru_cache
 
 from .basic_features import count_words
 
+# A single hyphenation dictionary, shared by all calls to count_syllables
+hyphenator = pyphen.Pyphen(lang='en')
+sentence_boundary_regex = re.compile(r'[.?!]\s*')
+
 # Define the function to calculate the Dale-Chall score
+@lru_cache(maxsize=2**17)
 def count_syllables(word):
     """
     Count the number of syllables in a word.
+
+    The counts are cached by word (in a least-recently-used cache), as the same words recur across many messages.
     
     Args:
         word(str): The input word.
@@ -16,18 +25,18 @@ def count_syllables(word):
     Returns:
         int: The number of syllables in the word.
     """
-    dic = pyphen.Pyphen(lang='en')
-    pyphen_result = dic.inserted(word)
-    return len(re.findall(r"-", pyphen_result))
+    pyphen_result = hyphenator.inserted(word)
+    return pyphen_result.count("-")
 
-def count_difficult_words(text, easy_words):
+def count_difficult_words(text, easy_words, words=None):
     """
     Count the number of difficult words in a text. The difficult words are those that are not in
     an "easy words" list (passed in from the ChatLevelFeaturesCalculator, and originating in the get_dale_chall_easy_words() in Utilities).
 
     Args:
         text(str): The message (utterance) being analyzed.
-        easy_words(list): A list of "easy" words according to Dale-Chall. This comes from the Utilities.
+        easy_words(set): The set of "easy" words according to Dale-Chall. This comes from the Utilities.
+        words(list, optional): The words of the text with punctuation removed, if they have already been tokenized (e.g., by the TokenStore).
 
     Returns:
         The number of difficult words.
@@ -35,9 +44,10 @@ def count_difficult_words(text, easy_words):
     
     difficult_words = 0
     # recall that words are already pre-processed; substitute punctuation here for words only
-    words = re.sub(r"[^a-zA-Z0-9 ]+", '',text).split()
+    if words is None:
+        words = re.sub(r"[^a-zA-Z0-9 ]+", '',text).split()
 
-    remaining_words = [i for i in words if not i in easy_words]
+    remaining_words = [i for i in words if i not in easy_words]
 
     for word in remaining_words:
         # words with more than 3 syllables are difficult
@@ -46,7 +56,7 @@ def count_difficult_words(text, easy_words):
     
     return difficult_words
 
-def dale_chall_helper(text, **easy_words):
+def dale_chall_helper(text, words=None, alphanumeric_words=None, *, easy_words=frozenset()):
     """
      Calculate the Dale-Chall readability score of a text. The Dale-Chall score are defined as:
 
@@ -64,17 +74,19 @@ def dale_chall_helper(text, **easy_words):
 
      Args:
         text(str): The message (utterance) being analyzed.
-        easy_words(list): A list of "easy" words according to Dale-Chall. This comes from the Utilities.
+        words(list, optional): The words of the text (split at whitespace), if they have already been tokenized (e.g., by the TokenStore).
+        alphanumeric_words(list, optional): The words of the text with punctuation removed, if they have already been tokenized.
+        easy_words(set, keyword-only): The set of "easy" words according to Dale-Chall. This comes from the Utilities.
 
      Returns:
         float: The Dale-Chall Readability Score.
 
     """
 
-    num_words = count_words(text)
-    num_sentences = len(re.split(r'[.?!]\s*', text)) 
+    num_words = count_words(text, words)
+    num_sentences = len(sentence_boundary_regex.split(text))
     avg_sentence_length = num_words/num_sentences
-    num_difficult_words = count_difficult_words(text, easy_words)
+    num_difficult_words = count_difficult_words(text, easy_words, alphanumeric_words)
 
     #get the percentage of difficult words(odw)
     if num_words == 0:
@@ -108,3 +120,31 @@ def classify_text_dalechall(score):
         return "medium"
     else:
         return "difficult"
+
+
+def get_dale_chall_scores(texts, easy_words, words=None, alphanumeric_words=None):
+    """
+    Calculates the Dale-Chall score and classification of every message in a column, in a single pass over the messages.
+
+    Args:
+        texts (pd.Series): The messages (utterances) being analyzed.
+        easy_words(set): The set of "easy" words according to Dale-Chall. This comes from the Utilities.
+        words(list, optional): The words of each message (split at whitespace), if they have already been tokenized (e.g., by the TokenStore).
+        alphanumeric_words(list, optional): The words of each message with punctuation removed, if they have already been tokenized.
+
+    Returns:
+        pd.DataFrame: The "dale_chall_score" and "dale_chall_classification" of each message, with the same index as `texts`.
+    """
+    if words is None:
+        words = [None] * len(texts)
+    if alphanumeric_words is None:
+        alphanumeric_words = [None] * len(texts)
+
+    scores = np.array([
+        dale_chall_helper(text, text_words, text_alphanumeric_words, easy_words = easy_words)
+        for text, text_words, text_alphanumeric_words in zip(texts, words, alphanumeric_words)
+    ], dtype=float)
+
+    # the same thresholds as classify_text_dalechall; NaN scores are classified as "difficult"
+    classifications = np.select([scores <= 4.9, scores <= 5.9], ["easy", "medium"], default="difficult")
+    return pd.DataFrame({"dale_chall_score": scores, "dale_chall_classification": classifications}, index=texts.index)
@@ -1,19 +1,41 @@
 import numpy as np
+import pandas as pd
 import string
 import re
 
-
-def count_all_caps(text):
+# Patterns of the tags, compiled once
+link_regex = re.compile(r'http[s]?://[^\s]+|\b\S+?\.(com|org|net|edu|gov|io)\b')
+user_reference_regex = re.compile(r'\bu/[^\s]+')
+emphasis_regex = re.compile(r'\*{1,3}(.*?)\*{1,3}')
+bullet_point_regex = re.compile(r'^[\*\-] .+', flags=re.MULTILINE)
+numbering_regex = re.compile(r'^\d+\. .+', flags=re.MULTILINE)
+line_break_regex = re.compile(r'\n+')
+double_quote_regex = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"')
+single_quote_regex = re.compile(r"'[^'\\]*(?:\\.[^'\\]*)*'")
+block_quote_regex = re.compile(r'^>.*', flags=re.MULTILINE)
+ellipses_regex = re.compile(r'\.{3,}')
+parenthesis_regex = re.compile(r'[()]')
+emoji_regex = re.compile(r'[:;]-?\)+')
+
+# The columns generated by get_reddit_tag_counts, in order
+reddit_tag_columns = [
+    "num_all_caps", "num_links", "num_reddit_users", "num_emphasis", "num_bullet_points", "num_numbered_points",
+    "num_line_breaks", "num_quotes", "num_block_quote_responses", "num_ellipses", "num_parentheses", "num_emoji"
+]
+
+def count_all_caps(text, words=None):
     """
     The number of all-caps words in the input text.
 
     Args:
         text (str): The input text to be analyzed.
+        words (list, optional): The words of the text (split at whitespace), if they have already been tokenized (e.g., by the TokenStore).
 
     Returns:
         int: The number of all-caps words in the input text.
     """
-    words = text.split()
+    if words is None:
+        words = text.split()
     # Check if the word is all uppercase, is alphabetical, and has more than one letter. Differentiating all caps vs acronyms?
     all_caps_count = sum(
         1 for word in words 
@@ -35,8 +57,7 @@ def count_links(text):
     Returns:
         int: The number of links in the input text.
     """
-    link_pattern = r'http[s]?://[^\s]+|\b\S+?\.(com|org|net|edu|gov|io)\b'
-    links = re.findall(link_pattern, text)
+    links = link_regex.findall(text)
     return len(links)
 
 
@@ -52,7 +73,7 @@ def count_user_references(text):
         int: The number of user references in the input text.
     """
 
-    user_refs = re.findall(r'\bu/[^\s]+', text)
+    user_refs = user_reference_regex.findall(text)
     return len(user_refs)
 
 def count_emphasis(text):
@@ -65,7 +86,7 @@ def count_emphasis(text):
     Returns:
         int: The number of emphasized words in the input text.
     """
-    formatted_texts = re.findall(r'\*{1,3}(.*?)\*{1,3}', text)
+    formatted_texts = emphasis_regex.findall(text)
     return len(formatted_texts)
 
 def count_bullet_points(text):
@@ -79,7 +100,7 @@ def count_bullet_points(text):
         int: The number of bullet points in the input text.
     """
     normalized_text = text.replace('\\n', '\n')
-    bullet_points = re.findall(r'^[\*\-] .+', normalized_text, flags=re.MULTILINE)
+    bullet_points = bullet_point_regex.findall(normalized_text)
     return len(bullet_points)
 
 
@@ -94,7 +115,7 @@ def count_numbering(text):
         int: The number of numbered lists in the input text.
     """
     normalized_text = text.replace('\\n', '\n')
-    numberings = re.findall(r'^\d+\. .+', normalized_text, flags=re.MULTILINE)
+    numberings = numbering_regex.findall(normalized_text)
     return len(numberings)
 
 
@@ -109,7 +130,7 @@ def count_line_breaks(text):
         int: The number of line breaks in the input text.
     """
     normalized_text = text.replace('\\n', '\n').replace('\\r', '\n').replace('\r\n', '\n').replace('\r', '\n')
-    text_single_breaks = re.sub(r'\n+', '\n', normalized_text)
+    text_single_breaks = line_break_regex.sub('\n', normalized_text)
     line_break_count = text_single_breaks.count('\n') + 1  
     return line_break_count
 
@@ -124,8 +145,8 @@ def count_quotes(text):
     Returns:
         int: The number of quoted texts in the input text.
     """
-    double_quoted_texts = re.findall(r'"[^"\\]*(?:\\.[^"\\]*)*"', text)
-    single_quoted_texts = re.findall(r"'[^'\\]*(?:\\.[^'\\]*)*'", text)    
+    double_quoted_texts = double_quote_regex.findall(text)
+    single_quoted_texts = single_quote_regex.findall(text)
     return len(double_quoted_texts) + len(single_quoted_texts)
 
 
@@ -140,8 +161,7 @@ def count_responding_to_someone(text):
         int: The number of block quote responses in the input text.
     """
     normalized_text = text.replace('&gt;', '>')
-    pattern = r'^>.*'
-    responses = re.findall(pattern, normalized_text, re.M)
+    responses = block_quote_regex.findall(normalized_text)
     return len(responses)
 
 
@@ -155,7 +175,7 @@ def count_ellipses(text):
     Returns:
         int: The number of ellipses in the input text.
     """
-    ellipses = re.findall(r'\.{3,}', text)
+    ellipses = ellipses_regex.findall(text)
     return len(ellipses)
 
 
@@ -170,13 +190,14 @@ def count_parentheses(text):
         int: The number of parenthetical texts in the input text.
     """
     count = 0
-    stack = []
+    depth = 0
 
-    for char in text:
+    # only the parentheses themselves matter; a closing parenthesis counts if it closes an open one
+    for char in parenthesis_regex.findall(text):
         if char == '(':
-            stack.append(char)
-        elif char == ')' and stack:
-            stack.pop()
+            depth += 1
+        elif depth > 0:
+            depth -= 1
             count += 1
 
     return count
@@ -192,6 +213,58 @@ def count_emojis(text):
     Returns:
         int: The number of emojis in the input text.
     """
-    emoji_pattern = r'[:;]-?\)+'
-    emojis = re.findall(emoji_pattern, text)
+    emojis = emoji_regex.findall(text)
     return len(emojis)
+
+def count_reddit_tags(text):
+    """
+    Returns the counts of all tags other than all-caps words in a message (see the individual functions above for the
+    definition of each tag). Each tag is still counted by its own scan of the message, as the tags can overlap (e.g., an
+    emphasis within a quote), so they cannot share a single regex; this only saves the overhead of the separate calls.
+
+    Args:
+        text (str): The input text to be analyzed.
+
+    Returns:
+        tuple: The number of links, user references, emphases, bullet points, numberings, line breaks, quotes, block quote
+        responses, ellipses, parentheses, and emojis in the input text.
+    """
+    newline_text = text.replace('\\n', '\n')
+    line_break_text = newline_text.replace('\\r', '\n').replace('\r\n', '\n').replace('\r', '\n')
+    return (
+        len(link_regex.findall(text)),
+        len(user_reference_regex.findall(text)),
+        len(emphasis_regex.findall(text)),
+        len(bullet_point_regex.findall(newline_text)),
+        len(numbering_regex.findall(newline_text)),
+        len(line_break_regex.findall(line_break_text)) + 1,
+        len(double_quote_regex.findall(text)) + len(single_quote_regex.findall(text)),
+        len(block_quote_regex.findall(text.replace('&gt;', '>'))),
+        len(ellipses_regex.findall(text)),
+        count_parentheses(text) if '(' in text else 0,
+        len(emoji_regex.findall(text))
+    )
+
+def get_reddit_tag_counts(texts, original_texts, original_words=None):
+    """
+    Returns the counts of all tags for every message in a column.
+
+    The counts of each message are written into a preallocated integer array. (The ChatLevelFeaturesCalculator passes only
+    the distinct messages; see `text_pure_methods`.)
+
+    Args:
+        texts (pd.Series): The messages (lowercased, with punctuation retained) in which to count all tags other than all-caps words.
+        original_texts (pd.Series): The original messages, in which to count all-caps words.
+        original_words (list, optional): The words of each original message (split at whitespace), if they have already been tokenized (e.g., by the TokenStore).
+
+    Returns:
+        pd.DataFrame: The count of each tag (in the columns `reddit_tag_columns`) for each message, with the same index as `texts`.
+    """
+    if original_words is None:
+        original_words = [None] * len(original_texts)
+
+    counts = np.empty((len(texts), len(reddit_tag_columns)), dtype=np.int64)
+    counts[:, 0] = [count_all_caps(text, words) for text, words in zip(original_texts, original_words)]
+    for position, message in enumerate(texts):
+        counts[position, 1:] = count_reddit_tags(message)
+    return pd.DataFrame(counts, columns=reddit_tag_columns, index=texts.index)
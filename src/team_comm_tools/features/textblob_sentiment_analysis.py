@@ -1,6 +1,8 @@
+import numpy as np
 import pandas as pd
 from textblob import TextBlob
 import statistics as stat
+from concurrent.futures import ProcessPoolExecutor
 
 def get_subjectivity_score(string):
     """
@@ -37,4 +39,43 @@ def get_polarity_score(string):
         float: The polarity score, in the range [-1.0, 1.0]
 
     """
-    return TextBlob(string).sentiment.polarity
\ No newline at end of file
+    return TextBlob(string).sentiment.polarity
+
+def get_sentiment_scores(string):
+    """
+    Uses the TextBlob package to obtain both the "subjectivity" and the "polarity" score of a text, analyzing the text once.
+
+    Args:
+        string(str): The message (utterance) being analyzed.
+
+    Returns:
+        tuple: The subjectivity score, in the range [0.0, 1.0], and the polarity score, in the range [-1.0, 1.0].
+
+    """
+    sentiment = TextBlob(string).sentiment
+    return sentiment.subjectivity, sentiment.polarity
+
+def get_textblob_sentiment(texts, num_workers=1):
+    """
+    Obtains the TextBlob subjectivity and polarity scores of every message in a column.
+
+    The ChatLevelFeaturesCalculator passes only the distinct messages (see `text_pure_methods`). If `num_workers` is greater
+    than 1, the messages are analyzed in parallel by a pool of that many worker processes.
+
+    Args:
+        texts (pd.Series): The messages (utterances) being analyzed.
+        num_workers (int, optional): The number of worker processes. Defaults to 1 (analyze the messages in this process).
+
+    Returns:
+        pd.DataFrame: The "textblob_subjectivity" and "textblob_polarity" of each message, with the same index as `texts`.
+
+    """
+    if num_workers > 1 and len(texts) > 1:
+        with ProcessPoolExecutor(max_workers=num_workers) as pool:
+            chunksize = max(1, len(texts) // (num_workers * 4))
+            scores = list(pool.map(get_sentiment_scores, texts, chunksize=chunksize))
+    else:
+        scores = [get_sentiment_scores(text) for text in texts]
+
+    scores = np.array(scores, dtype=float).reshape(-1, 2)
+    return pd.DataFrame(scores, columns=["textblob_subjectivity", "textblob_polarity"], index=texts.index)
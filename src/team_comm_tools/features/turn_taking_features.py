@@ -15,40 +15,48 @@ input_data (pd.DataFrame): a dataframe of conversations, in which each row is on
 speaker_id_col (str): the name of the column containing the speaker's unique identifier
 """
 
-def count_turns(input_data, speaker_id_col):
+def get_turn_starts(input_data, conversation_id_col, speaker_id_col):
     """
-    Returns the total number of turns for each speaker.
+    Flags the chats that begin a new turn (i.e., the speaker differs from the previous chat in the same conversation).
+
+    The speaker column is encoded once as a compact categorical, and the comparison against the previous
+    chat is done with a single grouped shift, so that all conversations are handled in one vectorized pass.
 
     Args:
         input_data (pd.DataFrame): A dataframe of conversations, in which each row is one chat.
+        conversation_id_col (str): The name of the column containing the conversation's unique identifier.
         speaker_id_col (str): The name of the column containing the speaker's unique identifier.
 
     Returns:
-        pd.DataFrame: A dataframe with columns for the speaker's unique identifier and their turn count.
+        pd.Series: A boolean Series (aligned with input_data) that is True for the first chat of every turn.
     """
 
-    temp_turn_count = 1
-    consolidated_actions = []
+    speaker_codes = pd.Series(input_data[speaker_id_col].astype("category").cat.codes, index=input_data.index)
+    previous_speaker = speaker_codes.groupby(input_data[conversation_id_col], sort=False).shift()
+
+    # the first chat of each conversation has no previous speaker (NaN), so it always starts a turn
+    return speaker_codes != previous_speaker
+
+def count_turns(input_data, speaker_id_col):
+    """
+    Returns the total number of turns for each speaker.
 
-    start_index = input_data.index[0] + 1
-    end_index = len(input_data) + input_data.index[0]
+    Args:
+        input_data (pd.DataFrame): A dataframe of conversations, in which each row is one chat.
+        speaker_id_col (str): The name of the column containing the speaker's unique identifier.
 
-    prev_row = input_data.iloc[0]
-    for i, row in input_data.iloc[1:, :].iterrows():
-        cur_row = row
-        if cur_row[speaker_id_col] == prev_row[speaker_id_col]:
-            temp_turn_count += 1
-        else:
-            consolidated_actions.append((prev_row[speaker_id_col], temp_turn_count))
-            temp_turn_count = 1
+    Returns:
+        pd.DataFrame: A dataframe with columns for the speaker's unique identifier and their turn count.
+    """
 
-        prev_row = cur_row
+    speakers = input_data[speaker_id_col]
+    turn_ids = (speakers != speakers.shift()).cumsum()
 
-    consolidated_actions.append((cur_row[speaker_id_col], temp_turn_count))
-    assert sum(x[1] for x in consolidated_actions) == len(input_data)
+    df_consolidated_actions = speakers.groupby(turn_ids, sort=False).agg(["first", "size"])
+    df_consolidated_actions.columns = [speaker_id_col, "turn_count"]
+    assert df_consolidated_actions["turn_count"].sum() == len(input_data)
 
-    df_consolidated_actions = pd.DataFrame(columns=[speaker_id_col, "turn_count"], data=consolidated_actions)
-    return df_consolidated_actions
+    return df_consolidated_actions.reset_index(drop=True)
 
 def count_turn_taking_index(input_data, speaker_id_col):
     """
@@ -67,10 +75,33 @@ def count_turn_taking_index(input_data, speaker_id_col):
     else:
         return (len(count_turns(input_data, speaker_id_col)) - 1) / (len(input_data) - 1)
 
+def get_turn_counts(input_data, conversation_id_col, speaker_id_col):
+    """
+    Returns the number of turns taken by each speaker in each conversation.
+
+    This is a cheap by-product of the turn-taking index: it sums the same turn-start indicator,
+    but groups by speaker as well as by conversation.
+
+    Args:
+        input_data (pd.DataFrame): A dataframe of conversations, in which each row is one chat.
+        conversation_id_col (str): The name of the column containing the conversation's unique identifier.
+        speaker_id_col (str): The name of the column containing the speaker's unique identifier.
+
+    Returns:
+        pd.DataFrame: A dataframe with columns for the conversation's unique identifier, the speaker's unique identifier, and the speaker's turn count.
+    """
+
+    turn_starts = get_turn_starts(input_data, conversation_id_col, speaker_id_col)
+    turn_counts = turn_starts.groupby([input_data[conversation_id_col], input_data[speaker_id_col]]).sum()
+    return turn_counts.rename("turn_count").reset_index()
+
 def get_turn(input_data, conversation_id_col, speaker_id_col):
     """
     Returns the turn-taking index for each conversation.
 
+    The turn-taking index is (number of turns - 1) / (number of chats - 1), where a new turn begins
+    every time the speaker changes. Conversations with only a single chat have an index of 0.
+
     Args:
         input_data (pd.DataFrame): A dataframe of conversations, in which each row is one chat.
         conversation_id_col (str): The name of the column containing the conversation's unique identifier.
@@ -79,6 +110,14 @@ def get_turn(input_data, conversation_id_col, speaker_id_col):
     Returns:
         pd.DataFrame: A dataframe with columns for the conversation's unique identifier and the turn-taking index.
     """
-    
-    turn_calculated_2 = input_data.groupby(conversation_id_col).apply(lambda x : count_turn_taking_index(x, speaker_id_col)).reset_index().rename(columns={0: "turn_taking_index"})
-    return turn_calculated_2
\ No newline at end of file
+
+    turn_starts = get_turn_starts(input_data, conversation_id_col, speaker_id_col)
+    grouped_turn_starts = turn_starts.groupby(input_data[conversation_id_col])
+    num_turns = grouped_turn_starts.sum()
+    num_chats = grouped_turn_starts.size()
+
+    # a conversation with only 1 chat has 1 turn; catch a divide by zero error
+    turn_taking_index = ((num_turns - 1) / (num_chats - 1).replace(0, np.nan)).fillna(0)
+
+    turn_calculated_2 = turn_taking_index.rename("turn_taking_index").reset_index()
+    return turn_calculated_2
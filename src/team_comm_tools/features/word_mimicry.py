@@ -2,6 +2,8 @@ import numpy as np
 import pandas as pd
 from string import punctuation
 import re
+import itertools
+from collections import Counter
 from sklearn.metrics.pairwise import cosine_similarity
 
 from team_comm_tools.features.get_all_DD_features import *
@@ -10,21 +12,23 @@ from team_comm_tools.features.get_all_DD_features import *
 #     To compute word mimicry, we use the dataset that removed all the punctuations
 #     This is a *chat-level* feature in which order matters.
 # '''
-def get_function_words_in_message(text, function_word_reference):
+def get_function_words_in_message(text, function_word_reference, words=None):
   """
   Extract the function words & non-functions words from a message
 
   Args:
       text (str): The input text to be analyzed.
       function_word_reference (list): A list of function words to reference against.
+      words (list, optional): The words of the message (split at whitespace), if they have already been tokenized (e.g., by the TokenStore).
 
   Returns:
       list: A list of function words found in the input text.
   """
+  if words is None:
+    words = text.split()
+  return [x for x in words if x in function_word_reference]
 
-  return [x for x in text.split() if x in function_word_reference]
-
-def get_content_words_in_message(text, function_word_reference):
+def get_content_words_in_message(text, function_word_reference, words=None):
 
   """
   Extract the non-function words in a given message.
@@ -32,11 +36,14 @@ def get_content_words_in_message(text, function_word_reference):
   Args:
       text (str): The input text to be analyzed.
       function_word_reference (list): A list of function words to reference against.
+      words (list, optional): The words of the message (split at whitespace), if they have already been tokenized (e.g., by the TokenStore).
 
   Returns:
       list: A list of content words found in the input text.
   """
-  return [x for x in text.split() if x not in function_word_reference]
+  if words is None:
+    words = text.split()
+  return [x for x in words if x not in function_word_reference]
 
 
 def mimic_words(df, on_column, conversation_id):
@@ -75,14 +82,33 @@ def compute_frequency(df, on_column):
   """
   Compute the frequency of each content word across the whole dataset.
 
+  The frequencies are counted into a Counter, which is a mergeable frequency table: the tables of separate shards or
+  streaming chunks of a dataset can be combined with `merge_frequencies` (or `Counter.update`) to get the frequencies
+  across the whole dataset.
+
   Args:
       df (DataFrame): The input dataframe.
       on_column (str): The column with which we calculate content word frequency.
 
   Returns:
-      dict: A dictionary with content words as keys and their frequencies as values.
+      Counter: A dictionary with content words as keys and their frequencies as values.
+  """
+  return Counter(itertools.chain.from_iterable(df[on_column]))
+
+def merge_frequencies(frequency_tables):
+  """
+  Combine the content word frequencies of several parts of a dataset into the frequencies across the whole dataset.
+
+  Args:
+      frequency_tables (list): The frequency tables (as returned by `compute_frequency`) of each part of the dataset.
+
+  Returns:
+      Counter: A dictionary with content words as keys and their frequencies across all parts as values.
   """
-  return(dict(pd.Series(np.concatenate(df[on_column])).value_counts()))
+  merged_frequencies = Counter()
+  for frequency_table in frequency_tables:
+    merged_frequencies.update(frequency_table)
+  return merged_frequencies
 
 
 def computeTF(column_mimc, frequency_dict):
@@ -103,7 +129,7 @@ def computeTF(column_mimc, frequency_dict):
   return sum(tfdict.values())
 
 
-def Content_mimicry_score(df, column_count_frequency, column_count_mimic):
+def Content_mimicry_score(df, column_count_frequency, column_count_mimic, frequency_dict = None):
   """
   Combine the steps to compute the content word mimicry score.
 
@@ -111,13 +137,15 @@ def Content_mimicry_score(df, column_count_frequency, column_count_mimic):
       df (DataFrame): The input dataframe.
       column_count_frequency (str): The column with content words to calculate frequency.
       column_count_mimic (str): The column with content word mimicry.
+      frequency_dict (dict, optional): The frequency of each content word across the whole dataset, if `df` holds only part of it
+        (e.g., when the dataset is processed in chunks). Defaults to None, in which case it is computed from `df`.
 
   Returns:
       Series: A series with content word accommodation scores.
   
   """
   # Compute the frequency of each content word across the whole dataset
-  ContWordFreq = compute_frequency(df, column_count_frequency)
+  ContWordFreq = compute_frequency(df, column_count_frequency) if frequency_dict is None else frequency_dict
   # Compute the content_mimicry_score
   return df[column_count_mimic].apply(lambda x:computeTF(x, ContWordFreq))
 
@@ -134,8 +162,7 @@ def get_mimicry_bert(chat_data, vect_data, conversation_id):
     list: A list of cosine similarity scores between each message and the previous message.
   """
   
-  chat_df = chat_data.copy()
-  chat_df['message_embedding'] = conv_to_float_arr(vect_data['message_embedding'].to_frame())
+  chat_df = get_embedding_view(chat_data, vect_data, conversation_id)
 
   mimicry = []
 
@@ -172,8 +199,7 @@ def get_moving_mimicry(chat_data, vect_data, conversation_id):
       list: A list of moving average mimicry scores for each message in the conversation.
   """
 
-  chat_df = chat_data.copy()
-  chat_df['message_embedding'] = conv_to_float_arr(vect_data['message_embedding'].to_frame())
+  chat_df = get_embedding_view(chat_data, vect_data, conversation_id)
 
   moving_mimicry = []
 
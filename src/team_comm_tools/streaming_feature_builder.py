@@ -0,0 +1,262 @@
+# streaming_feature_builder.py
+
+# 3rd Party Imports
+import pandas as pd
+import numpy as np
+
+# Imports from feature files and classes
+from team_comm_tools.feature_builder import FeatureBuilder
+from team_comm_tools.utils.calculate_chat_level_features import ChatLevelFeaturesCalculator
+from team_comm_tools.features.basic_features import count_words
+from team_comm_tools.features.info_exchange_zscore import get_info_exchange_wordcount
+from team_comm_tools.features.word_mimicry import get_content_words_in_message, compute_frequency, merge_frequencies
+from team_comm_tools.utils.preload_word_lists import get_function_words, get_first_person_words
+from team_comm_tools.utils.zscore_chats_and_conversation import RunningMeanVariance
+from team_comm_tools.utils.output_writers import get_output_writer
+
+class StreamingFeatureBuilder:
+    """The StreamingFeatureBuilder generates the same conversational features as the FeatureBuilder, for datasets that are
+    too large to fit in memory. Rather than taking in a DataFrame, it reads the data from a CSV or Parquet file in chunks,
+    each of which contains whole conversations, and featurizes each chunk with a FeatureBuilder; the outputs of each chunk
+    are appended to the output files as soon as they are ready.
+
+    Almost all features only depend on a single conversation, and are therefore unaffected by chunking. The exceptions
+    are features that are computed relative to the entire dataset (the z-scores across all chats, and the dataset-wide
+    frequency of content words used by Content Word Accommodation). These are handled in two passes: the first pass
+    collects the statistics of every chunk into mergeable accumulators (generating and caching the RoBERTa and SBERT
+    outputs along the way), and the second pass featurizes each chunk using the statistics of the entire dataset.
+
+    NOTE: The input must list the messages of each conversation contiguously (e.g., sorted by conversation), and the
+    conversation must be identified by a single column (`conversation_id_col`); `grouping_keys` are not supported.
+
+    :param input_path: Path to a CSV or Parquet (".parquet" or ".pq") file containing the conversation data that you wish to featurize.
+    :type input_path: str
+
+    :param chunk_size: The (approximate) number of rows to read and featurize at a time; chunks are extended so that no conversation is split across two chunks. Defaults to 100000.
+    :type chunk_size: int, optional
+
+    :param conversation_id_col: A string representing the column name that should be selected as the conversation ID. Defaults to "conversation_num".
+    :type conversation_id_col: str, optional
+
+    :param vector_directory: Directory path where the vectors are to be cached; the vectors of each chunk are cached in a separate subfolder. Defaults to "./vector_data/"
+    :type vector_directory: str, optional
+
+    :param regenerate_vectors: If true, will regenerate vector data (in the first pass) even if it already exists. Defaults to False.
+    :type regenerate_vectors: bool, optional
+
+    :param output_writer: The format of the output files: "csv", "parquet", or a custom writer object (see the FeatureBuilder). A single writer is shared by all chunks, and the output files are completed once the last chunk is written. Defaults to "csv".
+    :type output_writer: str or object, optional
+
+    :param feature_builder_kwargs: Any other parameters of the FeatureBuilder (e.g., output paths, column names, or custom features), which are passed on to the FeatureBuilder of each chunk.
+        If `profile` is true, the profiles of all chunks are combined into a single report (with "pass" and "chunk" columns), which is available as `profile_report` and saved once, after the last chunk.
+
+    :return: The StreamingFeatureBuilder doesn't return anything; instead, it writes the generated features to files in the specified paths, as the FeatureBuilder does.
+    :rtype: None
+    """
+    def __init__(
+            self,
+            input_path: str,
+            chunk_size: int = 100000,
+            conversation_id_col: str = "conversation_num",
+            vector_directory: str = "./vector_data/",
+            regenerate_vectors: bool = False,
+            output_writer = "csv",
+            **feature_builder_kwargs
+        ) -> None:
+
+        if "input_df" in feature_builder_kwargs:
+            raise ValueError("The StreamingFeatureBuilder reads its input from `input_path`; do not pass in an `input_df`.")
+        if feature_builder_kwargs.get("grouping_keys"):
+            raise ValueError("Streaming featurization requires a single conversation identifier (`conversation_id_col`); `grouping_keys` are not supported.")
+        if feature_builder_kwargs.get("global_statistics") is not None:
+            raise ValueError("The StreamingFeatureBuilder computes the `global_statistics` of the dataset itself.")
+        if output_writer is None:
+            raise ValueError("The StreamingFeatureBuilder writes its outputs to files; please specify an `output_writer`.")
+        if chunk_size < 1:
+            raise ValueError("The `chunk_size` must be a positive number of rows.")
+
+        self.input_path = input_path
+        self.chunk_size = chunk_size
+        self.conversation_id_col = conversation_id_col
+        self.vector_directory = vector_directory
+        self.regenerate_vectors = regenerate_vectors
+        self.output_writer = get_output_writer(output_writer)
+        self.feature_builder_kwargs = feature_builder_kwargs
+        self.global_statistics = None
+        self.num_chunks = 0
+        self.profile_reports = [] # the profile report of each chunk in each pass, if `profile` is true
+        self.profile_report = None
+
+    def read_chunks(self):
+        """
+        Read the input file in chunks of whole conversations.
+
+        Rows are read `chunk_size` at a time; the rows of the last conversation in each batch are held back and prepended to the
+        next batch, as that conversation may continue there.
+
+        :raises ValueError: If a conversation does not appear contiguously in the input.
+        :return: A generator of DataFrames, each containing one or more whole conversations.
+        :rtype: generator
+        """
+        if self.input_path.split(".")[-1] in ["parquet", "pq"]:
+            try:
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise ImportError("Reading Parquet input requires pyarrow. Please install it with `pip install pyarrow`.")
+            batches = (batch.to_pandas() for batch in pq.ParquetFile(self.input_path).iter_batches(batch_size=self.chunk_size))
+        else:
+            batches = pd.read_csv(self.input_path, chunksize=self.chunk_size)
+
+        seen_conversations = set()
+        held_back = None
+        for batch in batches:
+            if held_back is not None:
+                batch = pd.concat([held_back, batch], ignore_index=True)
+            conversation_ids = batch[self.conversation_id_col].fillna(0) # as in the FeatureBuilder, missing identifiers are treated as 0
+
+            # the last conversation in the batch may continue in the next batch
+            is_last_conversation = (conversation_ids == conversation_ids.iloc[-1]).to_numpy()
+            num_complete_rows = len(batch) - np.argmin(is_last_conversation[::-1]) if not is_last_conversation.all() else 0
+            held_back = batch.iloc[num_complete_rows:]
+            if num_complete_rows > 0:
+                chunk = batch.iloc[:num_complete_rows].reset_index(drop=True)
+                self.check_contiguous(chunk[self.conversation_id_col].fillna(0), seen_conversations)
+                yield chunk
+
+        if held_back is not None and len(held_back) > 0:
+            chunk = held_back.reset_index(drop=True)
+            self.check_contiguous(chunk[self.conversation_id_col].fillna(0), seen_conversations)
+            yield chunk
+
+    def check_contiguous(self, conversation_ids, seen_conversations) -> None:
+        """
+        Check that the conversations in a chunk have not appeared in an earlier chunk, and record them as seen.
+
+        :param conversation_ids: The conversation identifiers of the rows in the chunk.
+        :type conversation_ids: pd.Series
+        :param seen_conversations: The conversation identifiers of all earlier chunks (updated in place).
+        :type seen_conversations: set
+        :raises ValueError: If a conversation in the chunk already appeared in an earlier chunk.
+        :return: None
+        :rtype: None
+        """
+        chunk_conversations = set(conversation_ids.unique())
+        if not seen_conversations.isdisjoint(chunk_conversations):
+            raise ValueError("The messages of each conversation must appear contiguously in the input (e.g., sort the input by `" + self.conversation_id_col + "`).")
+        seen_conversations.update(chunk_conversations)
+
+    def get_chunk_feature_builder(self, chunk, chunk_num, global_statistics = None, regenerate_vectors = False) -> FeatureBuilder:
+        """
+        Instantiate the FeatureBuilder for a single chunk, caching its vectors in a subfolder of the vector directory.
+
+        :param chunk: The rows of the chunk.
+        :type chunk: pd.DataFrame
+        :param chunk_num: The position of the chunk in the input.
+        :type chunk_num: int
+        :param global_statistics: The statistics of the entire dataset; defaults to None (i.e., the statistics of the chunk).
+        :type global_statistics: dict, optional
+        :param regenerate_vectors: If true, will regenerate the vector data of the chunk even if it already exists. Defaults to False.
+        :type regenerate_vectors: bool, optional
+        :return: The FeatureBuilder for the chunk.
+        :rtype: FeatureBuilder
+        """
+        feature_builder = FeatureBuilder(
+            input_df = chunk,
+            conversation_id_col = self.conversation_id_col,
+            vector_directory = self.vector_directory + "chunk_" + str(chunk_num) + "/",
+            regenerate_vectors = regenerate_vectors,
+            global_statistics = global_statistics,
+            output_writer = self.output_writer,
+            **self.feature_builder_kwargs
+        )
+        feature_builder.ner_model_directory = self.vector_directory + "ner/" # all chunks share the same fine-tuned NER model
+        return feature_builder
+
+    def collect_global_statistics(self) -> None:
+        """
+        First pass: collect the statistics of the entire dataset that the chat-level features are computed relative to.
+
+        For each chunk, this function preprocesses the chats (and generates or loads the cached RoBERTa and SBERT outputs),
+        and accumulates the mean and variance of the information exchange word count and of the positive RoBERTa sentiment
+        (see `RunningMeanVariance`), as well as the frequency of each content word. These are then combined into the
+        `global_statistics` that are passed to the FeatureBuilder of each chunk in the second pass.
+
+        :return: None
+        :rtype: None
+        """
+        accumulators = {column: RunningMeanVariance() for column in ["info_exchange_wordcount", "positive_bert"]}
+        content_word_frequencies = []
+        function_words = get_function_words()
+        first_person = get_first_person_words()
+
+        self.num_chunks = 0
+        for chunk_num, chunk in enumerate(self.read_chunks()):
+            feature_builder = self.get_chunk_feature_builder(chunk, chunk_num, regenerate_vectors = self.regenerate_vectors)
+            if feature_builder.profiler.enabled:
+                feature_builder.profiler.stop()
+                self.add_profile_report(feature_builder.profiler.get_report(), "statistics", chunk_num)
+            messages = feature_builder.chat_data[[feature_builder.message_col]].copy()
+            message_col = feature_builder.message_col
+
+            if ChatLevelFeaturesCalculator.info_exchange in feature_builder.feature_methods_chat:
+                messages["num_words"] = messages[message_col].apply(count_words)
+                accumulators["info_exchange_wordcount"].update(get_info_exchange_wordcount(messages, first_person, message_col))
+            if ChatLevelFeaturesCalculator.positivity_zscore in feature_builder.feature_methods_chat and feature_builder.bert_sentiment_data is not None:
+                accumulators["positive_bert"].update(feature_builder.bert_sentiment_data["positive_bert"])
+            if ChatLevelFeaturesCalculator.calculate_word_mimicry in feature_builder.feature_methods_chat:
+                messages["content_words"] = messages[message_col].apply(lambda x: get_content_words_in_message(x, function_word_reference = function_words))
+                content_word_frequencies.append(compute_frequency(messages, "content_words"))
+
+            self.num_chunks += 1
+
+        self.global_statistics = {"content_words": merge_frequencies(content_word_frequencies)}
+        for column, accumulator in accumulators.items():
+            if accumulator.count > 0 or accumulator.has_nan:
+                self.global_statistics[column] = accumulator.get_statistics()
+
+    def featurize(self) -> None:
+        """
+        Main driver function for streaming feature generation.
+
+        This function collects the statistics of the entire dataset (the first pass), and then featurizes each chunk with those
+        statistics (the second pass), appending the chat-, user- and conversation-level features of each chunk to the output files.
+        The output files are completed (closed) after the last chunk.
+
+        :return: None
+        :rtype: None
+        """
+        print("Collecting dataset-wide statistics ...")
+        self.profile_reports = []
+        self.collect_global_statistics()
+
+        for chunk_num, chunk in enumerate(self.read_chunks()):
+            print("Featurizing chunk " + str(chunk_num + 1) + " of " + str(self.num_chunks) + " ...")
+            feature_builder = self.get_chunk_feature_builder(chunk, chunk_num, global_statistics = self.global_statistics)
+            feature_builder.close_output_writer = False
+            feature_builder.write_profile = False
+            feature_builder.featurize()
+            if feature_builder.profile_report is not None:
+                self.add_profile_report(feature_builder.profile_report, "features", chunk_num)
+
+        self.output_writer.close()
+        if self.profile_reports:
+            self.profile_report = pd.concat(self.profile_reports, ignore_index=True)
+            feature_builder.write_profile_report(self.profile_report)
+
+    def add_profile_report(self, profile_report, featurization_pass, chunk_num) -> None:
+        """
+        Tag the profile report of a chunk with its pass and chunk number, and add it to the reports of the run.
+
+        :param profile_report: The profile report of the chunk (see `FeatureProfiler.get_report`).
+        :type profile_report: pd.DataFrame
+        :param featurization_pass: The pass in which the chunk was profiled: "statistics" (the first pass) or "features" (the second pass).
+        :type featurization_pass: str
+        :param chunk_num: The position of the chunk in the input.
+        :type chunk_num: int
+        :return: None
+        :rtype: None
+        """
+        profile_report = profile_report.copy()
+        profile_report.insert(0, "chunk", chunk_num)
+        profile_report.insert(0, "pass", featurization_pass)
+        self.profile_reports.append(profile_report)
@@ -18,6 +18,9 @@ from team_comm_tools.features.named_entity_recognition_features import*
 
 # Importing utils
 from .preload_word_lists import *
+from .token_store import TokenStore
+from .feature_cache import get_message_hashes
+from .profiler import FeatureProfiler
 from .zscore_chats_and_conversation import get_zscore_across_all_chats, get_zscore_across_all_conversations
 
 # Loading bar
@@ -40,7 +43,53 @@ class ChatLevelFeaturesCalculator:
     :type ner_training_df: pd.DataFrame
     :param ner_cutoff: This is the cutoff value for the confidence of prediction for each named entity
     :type ner_cutoff: int
+    :param global_statistics: Statistics of the entire dataset, for when `chat_data` holds only part of it (see the StreamingFeatureBuilder).
+        Maps a column name ("info_exchange_wordcount" or "positive_bert") to its (mean, standard deviation), and "content_words" to the frequency of each content word.
+        Defaults to None, in which case the statistics are computed from `chat_data`.
+    :type global_statistics: dict, optional
+    :param memory_optimized: If true, stores each feature in a compact type as soon as it is computed (counts as the smallest integer type
+        that fits, scores as float32, and classifications as categoricals), and drops derived text columns once the last feature that
+        reads them has run. Defaults to False.
+    :type memory_optimized: bool, optional
+    :param num_workers: The number of worker processes for features that can be computed in parallel (currently, the TextBlob sentiment, named entity recognition, and ConvoKit politeness strategies). Defaults to 1.
+    :type num_workers: int, optional
+    :param ner_model_directory: Directory where fine-tuned named entity recognition models are cached, keyed by their training data. Defaults to None, in which case the models are not cached.
+    :type ner_model_directory: str, optional
+    :param feature_cache: A persistent cache of the outputs of the text-pure feature methods (see `text_pure_methods`), which is
+        consulted before computing them. Defaults to None, in which case all features are computed.
+    :type feature_cache: FeatureCache, optional
+    :param profiler: A FeatureProfiler, which records the time and memory of each feature method. Defaults to None, in which case nothing is recorded.
+    :type profiler: FeatureProfiler, optional
     """
+    # The feature methods that read each derived text column (in memory-optimized mode, the column is dropped once none of them remain)
+    derived_text_column_consumers = {
+        "message_lower_with_punc": ["other_lexical_features", "calculate_politeness_sentiment", "calculate_politeness_v2", "get_certainty_score", "get_reddit_features"]
+    }
+    # The feature methods that read each kind of tokens from the TokenStore (the tokens are freed once none of them remain)
+    token_consumers = {
+        "words": ["text_based_features", "get_dale_chall_score_and_classfication", "calculate_word_mimicry", "get_reddit_features"],
+        "alphanumeric_words": ["get_dale_chall_score_and_classfication", "other_lexical_features"],
+        "sentences": ["other_lexical_features"],
+        "sentence_first_words": ["other_lexical_features"]
+    }
+    # Features that hold a class label, which are stored as categoricals in memory-optimized mode
+    categorical_columns = ["dale_chall_classification"]
+    # Feature methods whose outputs depend only on the text of each message (and on fixed lexicons), with the text columns
+    # that they read ("message" and "message_original" stand for the message column and its original version), any other
+    # columns that they require, and the version of their outputs. Bump the version of a method whenever its outputs change,
+    # so that the outputs stored in a feature cache by earlier versions are no longer used.
+    text_pure_methods = {
+        "text_based_features": {"inputs": ["message"], "version": "1"},
+        "lexical_features": {"inputs": ["message_original"], "version": "1"},
+        "calculate_textblob_sentiment": {"inputs": ["message"], "version": "1"},
+        "get_dale_chall_score_and_classfication": {"inputs": ["message"], "version": "1"},
+        "other_lexical_features": {"inputs": ["message", "message_lower_with_punc"], "requires": ["num_words"], "version": "1"},
+        "calculate_politeness_sentiment": {"inputs": ["message_lower_with_punc"], "version": "1"},
+        "calculate_politeness_v2": {"inputs": ["message_lower_with_punc"], "version": "1"},
+        "get_certainty_score": {"inputs": ["message_lower_with_punc"], "version": "1"},
+        "get_reddit_features": {"inputs": ["message_original", "message_lower_with_punc"], "version": "1"}
+    }
+
     def __init__(
             self, 
             chat_data: pd.DataFrame, 
@@ -50,7 +99,13 @@ class ChatLevelFeaturesCalculator:
             ner_cutoff: int,
             conversation_id_col: str,
             message_col: str,
-            timestamp_col: str | tuple[str, str]
+            timestamp_col: str | tuple[str, str],
+            global_statistics: dict = None,
+            memory_optimized: bool = False,
+            num_workers: int = 1,
+            ner_model_directory: str = None,
+            feature_cache = None,
+            profiler: FeatureProfiler = None
             ) -> None:
 
         self.chat_data = chat_data
@@ -61,10 +116,20 @@ class ChatLevelFeaturesCalculator:
         self.conversation_id_col = conversation_id_col
         self.timestamp_col = timestamp_col
         self.message_col = message_col
+        self.global_statistics = global_statistics if global_statistics is not None else {}
+        self.memory_optimized = memory_optimized
+        self.num_workers = num_workers
+        self.ner_model_directory = ner_model_directory
+        self.feature_cache = feature_cache
+        self.profiler = profiler if profiler is not None else FeatureProfiler()
         self.easy_dale_chall_words = get_dale_chall_easy_words() # load easy Dale-Chall words exactly once.
         self.function_words = get_function_words() # load function words exactly once
         self.question_words = get_question_words() # load question words exactly once
         self.first_person = get_first_person_words() # load first person words exactly once
+        self.feature_columns = {} # the columns generated by each feature method, in the order in which they were added
+        self.tokens = TokenStore() # tokenize each message once, and share the tokens among the features
+        self.message_factors = {} # the distinct texts of each text column, and the position of each row's text among them
+        self.deduplication_stats = {} # the number of rows and of distinct messages on which each text-pure feature method ran
         
     def calculate_chat_level_features(self, feature_methods: list) -> pd.DataFrame:
         """
@@ -77,23 +142,216 @@ class ChatLevelFeaturesCalculator:
         :rtype: pd.DataFrame
         """
 
-        for method in tqdm(feature_methods):
-            method(self)
+        if self.memory_optimized:
+            self.drop_derived_text_columns(feature_methods)
+        self.message_factors = {}
+
+        for position, method in enumerate(tqdm(feature_methods)):
+            columns_before = set(self.chat_data.columns)
+            with self.profiler.profile("chat", method.__name__, len(self.chat_data)):
+                if method.__name__ in self.text_pure_methods and len(self.chat_data) > 0:
+                    self.calculate_text_pure_features(method)
+                else:
+                    method(self)
+            self.feature_columns[method] = [column for column in self.chat_data.columns if column not in columns_before]
+            self.clear_unused_tokens(feature_methods[position + 1:])
+
+            if self.memory_optimized:
+                self.compact_columns(self.feature_columns[method])
+                self.drop_derived_text_columns(feature_methods[position + 1:])
 
         # Return the input dataset with the chat level features appended (as columns)
         return self.chat_data
         
+    def get_text_column(self, column: str) -> str:
+        """
+        Get the name of a text column read by a text-pure feature method (see `text_pure_methods`).
+
+        :param column: The text column, where "message" and "message_original" stand for the message column and its original version.
+        :type column: str
+        :return: The name of the column in the chat data.
+        :rtype: str
+        """
+        if column == "message":
+            return self.message_col
+        if column == "message_original":
+            return self.message_col + "_original"
+        return column
+
+    def calculate_on_rows(self, method, rows, columns: list) -> pd.DataFrame:
+        """
+        Run a feature method on a subset of the rows of the chat data, which contains only the columns that the method reads.
+
+        :param method: The feature method.
+        :type method: function
+        :param rows: The positions of the rows on which to run the method.
+        :type rows: np.ndarray
+        :param columns: The columns that the method reads.
+        :type columns: list
+        :return: The columns generated by the method, for each of the rows (in the order of `rows`).
+        :rtype: pd.DataFrame
+        """
+        chat_data = self.chat_data
+        self.chat_data = chat_data[columns].iloc[rows].reset_index(drop=True)
+        try:
+            method(self)
+            return self.chat_data.drop(columns=columns)
+        finally:
+            self.chat_data = chat_data
+
+    def get_message_codes(self, text_columns: list) -> np.ndarray:
+        """
+        Factorize the messages of the chat data into their distinct values, where a message is the combination of its texts in
+        one or more text columns.
+
+        Each text column is factorized once (and reused by every text-pure feature method that reads it); the codes of several
+        columns are then combined into the codes of their distinct combinations.
+
+        :param text_columns: The text columns.
+        :type text_columns: list
+        :return: The position of each row's message among the distinct messages, which are numbered in order of first appearance.
+        :rtype: np.ndarray
+        """
+        message_codes = np.zeros(len(self.chat_data), dtype=np.int64)
+        for column in text_columns:
+            if column not in self.message_factors:
+                self.message_factors[column] = pd.factorize(self.chat_data[column], use_na_sentinel=False)
+            column_codes, column_uniques = self.message_factors[column]
+            # re-factorize after adding each column, so that the combined codes stay below the number of rows
+            message_codes, _ = pd.factorize(message_codes * len(column_uniques) + column_codes)
+        return message_codes
+
+    def calculate_text_pure_features(self, method) -> None:
+        """
+        Compute the outputs of a text-pure feature method (see `text_pure_methods`) on the distinct messages only.
+
+        Chat data often repeats the same message (e.g., common short replies such as "yes" or "ok", or the rows of a cumulative
+        conversation view), and a text-pure feature has the same outputs for every copy. The method is therefore run once on each
+        distinct message (that is, each distinct combination of the texts that it reads), and its outputs are then copied to every
+        row of the chat data. If there is a feature cache, the outputs of the distinct messages are first looked up in the cache;
+        the method is only run on the distinct messages that are missing, and their outputs are added to the cache.
+
+        :param method: The feature method.
+        :type method: function
+        :return: None
+        :rtype: None
+        """
+        feature = method.__name__
+        version = self.text_pure_methods[feature]["version"]
+        text_columns = [self.get_text_column(column) for column in self.text_pure_methods[feature]["inputs"]]
+        required_columns = text_columns + [column for column in self.text_pure_methods[feature].get("requires", []) if column in self.chat_data.columns]
+
+        # identify the distinct messages, and the first row in which each of them appears
+        message_codes = self.get_message_codes(text_columns)
+        num_messages = message_codes.max() + 1
+        first_rows = np.empty(num_messages, dtype=np.int64)
+        first_rows[message_codes[::-1]] = np.arange(len(message_codes))[::-1]
+        self.deduplication_stats[feature] = {"rows": len(message_codes), "unique_messages": int(num_messages)}
+
+        if self.feature_cache is None:
+            unique_outputs = self.calculate_on_rows(method, first_rows, required_columns)
+            self.chat_data = pd.concat([self.chat_data, unique_outputs.iloc[message_codes].set_axis(self.chat_data.index)], axis=1)
+            return
+
+        unique_messages = zip(*[self.chat_data[column].iloc[first_rows].tolist() for column in text_columns])
+        message_hashes = get_message_hashes(unique_messages)
+
+        outputs = self.feature_cache.get(feature, version, message_hashes)
+        columns = self.feature_cache.get_columns(feature, version) if outputs else None
+        missing_messages = [position for position, message_hash in enumerate(message_hashes) if message_hash not in outputs]
+
+        if missing_messages:
+            computed = self.calculate_on_rows(method, first_rows[missing_messages], required_columns)
+            computed_columns = [(column, str(computed[column].dtype)) for column in computed.columns]
+            if columns is not None and computed_columns != columns:
+                # the method's outputs have changed since they were cached (e.g., a lexicon is now available); recompute all messages
+                missing_messages = list(range(len(message_hashes)))
+                computed = self.calculate_on_rows(method, first_rows, required_columns)
+            columns = computed_columns
+
+            computed_outputs = [list(row) for row in zip(*[computed[column].tolist() for column in computed.columns])] if columns else [[] for _ in missing_messages]
+            missing_hashes = [message_hashes[position] for position in missing_messages]
+            self.feature_cache.put(feature, version, columns, missing_hashes, computed_outputs)
+            outputs.update(zip(missing_hashes, computed_outputs))
+        self.feature_cache.commit()
+
+        unique_outputs = pd.DataFrame.from_records([outputs[message_hash] for message_hash in message_hashes], columns=[column for column, _ in columns]).astype(dict(columns))
+        self.chat_data = pd.concat([self.chat_data, unique_outputs.iloc[message_codes].set_axis(self.chat_data.index)], axis=1)
+
+    def get_deduplication_summary(self) -> pd.DataFrame:
+        """
+        Summarize how many distinct messages each text-pure feature method ran on, relative to the number of rows.
+
+        :return: For each text-pure feature method that ran, the number of rows, the number of distinct messages, and their ratio.
+        :rtype: pd.DataFrame
+        """
+        summary = pd.DataFrame.from_dict(self.deduplication_stats, orient="index", columns=["rows", "unique_messages"])
+        summary["unique_ratio"] = summary["unique_messages"] / summary["rows"]
+        return summary
+
+    def compact_columns(self, columns: list) -> None:
+        """
+        Store features in compact types (used in memory-optimized mode).
+
+        Integer counts are stored as the smallest integer type that fits their values, other numeric features as float32,
+        and classifications as categoricals; boolean and text features are left as they are.
+
+        :param columns: The names of the features to store in compact types.
+        :type columns: list
+        :return: None
+        :rtype: None
+        """
+        for column in columns:
+            values = self.chat_data[column]
+            if column in self.categorical_columns:
+                self.chat_data[column] = values.astype("category")
+            elif pd.api.types.is_bool_dtype(values):
+                continue
+            elif pd.api.types.is_integer_dtype(values):
+                self.chat_data[column] = pd.to_numeric(values, downcast="integer")
+            elif pd.api.types.is_float_dtype(values):
+                self.chat_data[column] = values.astype(np.float32)
+
+    def drop_derived_text_columns(self, remaining_methods: list) -> None:
+        """
+        Drop the derived text columns that none of the remaining feature methods read (used in memory-optimized mode).
+
+        :param remaining_methods: The feature methods that have yet to run.
+        :type remaining_methods: list
+        :return: None
+        :rtype: None
+        """
+        remaining_method_names = {method.__name__ for method in remaining_methods}
+        unused_columns = [column for column, consumers in self.derived_text_column_consumers.items()
+                          if column in self.chat_data.columns and remaining_method_names.isdisjoint(consumers)]
+        if unused_columns:
+            self.chat_data = self.chat_data.drop(columns=unused_columns)
+
+    def clear_unused_tokens(self, remaining_methods: list) -> None:
+        """
+        Free the stored tokens that none of the remaining feature methods read.
+
+        :param remaining_methods: The feature methods that have yet to run.
+        :type remaining_methods: list
+        :return: None
+        :rtype: None
+        """
+        remaining_method_names = {method.__name__ for method in remaining_methods}
+        self.tokens.clear([tokenization for tokenization, consumers in self.token_consumers.items()
+                           if remaining_method_names.isdisjoint(consumers)])
+
     def concat_bert_features(self) -> None:
         """
         Concatenate RoBERTa sentiment features to the chat data.
 
         This function appends RoBERTa sentiment data (which are pre-processed beforehand to save computation)
-        as new columns to the existing chat data.
+        as new columns to the existing chat data. The sentiment data have already been looked up for each chat
+        by its message key (see `align_embeddings`), so they are appended row by row, regardless of the index of the chat data.
 
         :return: None
         :rtype: None
         """
-        self.chat_data = pd.concat([self.chat_data, self.bert_sentiment_data], axis = 1)
+        self.chat_data = pd.concat([self.chat_data, self.bert_sentiment_data.set_axis(self.chat_data.index)], axis = 1)
 
     def text_based_features(self) -> None:
         """
@@ -108,7 +366,8 @@ class ChatLevelFeaturesCalculator:
         :rtype: None
         """
         # Count Words
-        self.chat_data["num_words"] = self.chat_data[self.message_col].apply(count_words)
+        messages = self.chat_data[self.message_col]
+        self.chat_data["num_words"] = [count_words(text, words) for text, words in zip(messages, self.tokens.get_words(messages))]
         
         # Count Characters
         self.chat_data["num_chars"] = self.chat_data[self.message_col].apply(count_characters)
@@ -135,7 +394,7 @@ class ChatLevelFeaturesCalculator:
         self.chat_data["info_exchange_wordcount"] = get_info_exchange_wordcount(self.chat_data, self.first_person, self.message_col)
         
         # Get the z-score of each message across all chats
-        self.chat_data["info_exchange_zscore_chats"] = get_zscore_across_all_chats(self.chat_data, "info_exchange_wordcount")
+        self.chat_data["info_exchange_zscore_chats"] = get_zscore_across_all_chats(self.chat_data, "info_exchange_wordcount", self.global_statistics.get("info_exchange_wordcount"))
 
         # Get the z-score within each conversation
         self.chat_data["info_exchange_zscore_conversation"] = get_zscore_across_all_conversations(self.chat_data, "info_exchange_wordcount", self.conversation_id_col)
@@ -155,7 +414,7 @@ class ChatLevelFeaturesCalculator:
         :rtype: None
         """
         # Get the z-score of each message across all chats
-        self.chat_data["positivity_zscore_chats"] = get_zscore_across_all_chats(self.chat_data, "positive_bert")
+        self.chat_data["positivity_zscore_chats"] = get_zscore_across_all_chats(self.chat_data, "positive_bert", self.global_statistics.get("positive_bert"))
 
         # Get the z-score within each conversation
         self.chat_data["positivity_zscore_conversation"] = get_zscore_across_all_conversations(self.chat_data, "positive_bert", self.conversation_id_col)
@@ -195,8 +454,9 @@ class ChatLevelFeaturesCalculator:
         :return: None
         :rtype: None
         """
-        self.chat_data["textblob_subjectivity"] = self.chat_data[self.message_col].apply(get_subjectivity_score)
-        self.chat_data["textblob_polarity"] = self.chat_data[self.message_col].apply(get_polarity_score)
+        textblob_sentiment = get_textblob_sentiment(self.chat_data[self.message_col], num_workers = self.num_workers)
+        self.chat_data["textblob_subjectivity"] = textblob_sentiment["textblob_subjectivity"]
+        self.chat_data["textblob_polarity"] = textblob_sentiment["textblob_polarity"]
 
     def get_dale_chall_score_and_classfication(self) -> None:
         """
@@ -209,8 +469,10 @@ class ChatLevelFeaturesCalculator:
         :return: None
         :rtype: None
         """
-        self.chat_data['dale_chall_score'] = self.chat_data[self.message_col].apply(lambda x: dale_chall_helper(x, easy_words = self.easy_dale_chall_words))
-        self.chat_data['dale_chall_classification'] = self.chat_data['dale_chall_score'].apply(classify_text_dalechall)
+        messages = self.chat_data[self.message_col]
+        dale_chall = get_dale_chall_scores(messages, self.easy_dale_chall_words, self.tokens.get_words(messages), self.tokens.get_alphanumeric_words(messages))
+        self.chat_data['dale_chall_score'] = dale_chall['dale_chall_score']
+        self.chat_data['dale_chall_classification'] = dale_chall['dale_chall_classification']
 
     def other_lexical_features(self) -> None:
         """
@@ -230,15 +492,22 @@ class ChatLevelFeaturesCalculator:
 
         # Get the number of questions in each message
         # naive: Number of Question Marks + Sentences that start with question words
-        self.chat_data["num_question_naive"] = self.chat_data["message_lower_with_punc"].apply(lambda x: calculate_num_question_naive(x, question_words = self.question_words))
+        messages_with_punc = self.chat_data["message_lower_with_punc"]
+        self.chat_data["num_question_naive"] = [
+            calculate_num_question_naive(text, question_words = self.question_words, sentences = sentences, sentence_first_words = first_words)
+            for text, sentences, first_words in zip(messages_with_punc, self.tokens.get_sentences(messages_with_punc),
+                                                    self.tokens.get_sentence_first_words(messages_with_punc))
+        ]
         
         # Classify whether the message contains clarification questions
         self.chat_data["NTRI"] = self.chat_data["message_lower_with_punc"].apply(classify_NTRI)
         
         # Calculate the word type-to-token ratio
-        self.chat_data["word_TTR"] = self.chat_data[self.message_col].apply(get_word_TTR)
+        messages = self.chat_data[self.message_col]
+        self.chat_data["word_TTR"] = [get_word_TTR(text, words) for text, words in zip(messages, self.tokens.get_alphanumeric_words(messages))]
         
         # Calculate the proportion of first person pronouns from the chats
+        self.chat_data["first_person_raw"] = count_first_person_words(self.chat_data, self.first_person, self.message_col)
         self.chat_data["first_pronouns_proportion"] = get_proportion_first_pronouns(self.chat_data)
 
         # drop the raw number of first pronouns -- unnecessary given this is proportional to other first-pronoun columns
@@ -264,8 +533,10 @@ class ChatLevelFeaturesCalculator:
         """
 
         # Extract function words / content words from a message
-        self.chat_data["function_words"] = self.chat_data[self.message_col].apply(lambda x: get_function_words_in_message(x, function_word_reference = self.function_words))
-        self.chat_data["content_words"] = self.chat_data[self.message_col].apply(lambda x: get_content_words_in_message(x, function_word_reference = self.function_words))
+        messages = self.chat_data[self.message_col]
+        message_words = self.tokens.get_words(messages)
+        self.chat_data["function_words"] = [get_function_words_in_message(text, function_word_reference = self.function_words, words = words) for text, words in zip(messages, message_words)]
+        self.chat_data["content_words"] = [get_content_words_in_message(text, function_word_reference = self.function_words, words = words) for text, words in zip(messages, message_words)]
         
         # Extract the function words / content words that also appears in the immediate previous turn
         self.chat_data["function_word_mimicry"] = mimic_words(self.chat_data, "function_words", self.conversation_id_col)
@@ -275,7 +546,7 @@ class ChatLevelFeaturesCalculator:
         self.chat_data["function_word_accommodation"] = self.chat_data["function_word_mimicry"].apply(function_mimicry_score)
         
         # Compute the sum of inverse frequency of each content word that also occurred in the other’s immediately prior turn.
-        self.chat_data["content_word_accommodation"] = Content_mimicry_score(self.chat_data, "content_words","content_word_mimicry")
+        self.chat_data["content_word_accommodation"] = Content_mimicry_score(self.chat_data, "content_words","content_word_mimicry", self.global_statistics.get("content_words"))
 
         # Drop the function / content word columns -- we don't need them in the output
         self.chat_data = self.chat_data.drop(columns=['function_words', 'content_words', 'function_word_mimicry', 'content_word_mimicry'])
@@ -321,8 +592,7 @@ class ChatLevelFeaturesCalculator:
         :return: None
         :rtype: None
         """
-        transformed_df = self.chat_data['message_lower_with_punc'].apply(get_politeness_strategies).apply(pd.Series)
-        transformed_df = transformed_df.rename(columns=lambda x: re.sub('^feature_politeness_==()','', x)[:-2].lower() + "_politeness_convokit")
+        transformed_df = get_politeness_strategies_batch(self.chat_data['message_lower_with_punc'], num_workers = self.num_workers)
 
         # Concatenate the transformed dataframe with the original dataframe
         self.chat_data = pd.concat([self.chat_data, transformed_df], axis=1)
@@ -394,18 +664,10 @@ class ChatLevelFeaturesCalculator:
         :return: None
         :rtype: None
         """
-        self.chat_data["num_all_caps"] = self.chat_data[self.message_col + "_original"].apply(count_all_caps)
-        self.chat_data["num_links"] = self.chat_data["message_lower_with_punc"].apply(count_links)
-        self.chat_data["num_reddit_users"] = self.chat_data["message_lower_with_punc"].apply(count_user_references)
-        self.chat_data["num_emphasis"] = self.chat_data["message_lower_with_punc"].apply(count_emphasis)
-        self.chat_data["num_bullet_points"] = self.chat_data["message_lower_with_punc"].apply(count_bullet_points)
-        self.chat_data["num_numbered_points"] = self.chat_data["message_lower_with_punc"].apply(count_numbering)
-        self.chat_data["num_line_breaks"] = self.chat_data["message_lower_with_punc"].apply(count_line_breaks)
-        self.chat_data["num_quotes"] = self.chat_data["message_lower_with_punc"].apply(count_quotes)
-        self.chat_data["num_block_quote_responses"] = self.chat_data["message_lower_with_punc"].apply(count_responding_to_someone)
-        self.chat_data["num_ellipses"] = self.chat_data["message_lower_with_punc"].apply(count_ellipses)
-        self.chat_data["num_parentheses"] = self.chat_data["message_lower_with_punc"].apply(count_parentheses)
-        self.chat_data["num_emoji"] = self.chat_data["message_lower_with_punc"].apply(count_emojis)
+        original_messages = self.chat_data[self.message_col + "_original"]
+        reddit_tags = get_reddit_tag_counts(self.chat_data["message_lower_with_punc"], original_messages, self.tokens.get_words(original_messages))
+        for column in reddit_tag_columns:
+            self.chat_data[column] = reddit_tags[column]
     
     def get_named_entity(self) -> None:
         """
@@ -416,6 +678,7 @@ class ChatLevelFeaturesCalculator:
         """
 
         if self.ner_training is not None:
-            train_spacy_ner(self.ner_training)
-            self.chat_data["num_named_entity"] = self.chat_data[self.message_col].apply(num_named_entity, cutoff=self.ner_cutoff)
-            self.chat_data["named_entities"] = self.chat_data[self.message_col].apply(named_entities, cutoff=self.ner_cutoff)
+            ner_model = get_ner_model(self.ner_training, self.ner_model_directory)
+            entities = get_named_entities(self.chat_data[self.message_col], ner_model, self.ner_cutoff, num_workers = self.num_workers)
+            self.chat_data["num_named_entity"] = entities.apply(len)
+            self.chat_data["named_entities"] = entities
@@ -7,6 +7,7 @@ from team_comm_tools.features.information_diversity import *
 from team_comm_tools.utils.summarize_features import *
 from team_comm_tools.utils.gini_coefficient import *
 from team_comm_tools.utils.preprocess import *
+from team_comm_tools.utils.profiler import FeatureProfiler
 
 class ConversationLevelFeaturesCalculator:
     """
@@ -27,6 +28,8 @@ class ConversationLevelFeaturesCalculator:
     :type vector_directory: str
     :param input_columns: List of columns in the chat-level features dataframe that should not be summarized
     :type input_columns: list
+    :param profiler: A FeatureProfiler, which records the time and memory of each feature method. Defaults to None, in which case nothing is recorded.
+    :type profiler: FeatureProfiler, optional
         """
     def __init__(self, chat_data: pd.DataFrame, 
                         user_data: pd.DataFrame, 
@@ -37,7 +40,8 @@ class ConversationLevelFeaturesCalculator:
                         speaker_id_col: str,
                         message_col: str,
                         timestamp_col: str,
-                        input_columns:list) -> None:
+                        input_columns:list,
+                        profiler: FeatureProfiler = None) -> None:
     
         # Initializing variables
         self.chat_data = chat_data
@@ -49,6 +53,7 @@ class ConversationLevelFeaturesCalculator:
         self.speaker_id_col = speaker_id_col
         self.message_col = message_col
         self.timestamp_col = timestamp_col
+        self.profiler = profiler if profiler is not None else FeatureProfiler()
         # Denotes the columns that can be summarized from the chat level, onto the conversation level.
         self.input_columns = list(input_columns)
         if 'conversation_num' not in self.input_columns:
@@ -69,7 +74,8 @@ class ConversationLevelFeaturesCalculator:
         """
 
         for method in feature_methods:
-            method(self)
+            with self.profiler.profile("conversation", method.__name__, len(self.chat_data)):
+                method(self)
 
         return self.conv_data
 
@@ -85,7 +91,7 @@ class ConversationLevelFeaturesCalculator:
 
         self.conv_data = pd.merge(
             left=self.conv_data,
-            right=get_turn(self.chat_data.copy(), self.conversation_id_col, self.speaker_id_col),
+            right=get_turn(self.chat_data, self.conversation_id_col, self.speaker_id_col),
             on=[self.conversation_id_col],
             how="inner"
         )
@@ -105,14 +111,12 @@ class ConversationLevelFeaturesCalculator:
         :return: None
         :rtype: None
         """
-        for column in self.summable_columns:
-            
-            self.conv_data = pd.merge(
-                left=self.conv_data,
-                right=get_gini(self.user_data.copy(), "sum_"+column, self.conversation_id_col), # this applies to the summed columns in user_data, which matches the above
-                on=[self.conversation_id_col],
-                how="inner"
-            )
+        self.conv_data = pd.merge(
+            left=self.conv_data,
+            right=get_gini_features(self.user_data, ["sum_"+column for column in self.summable_columns], self.conversation_id_col), # this applies to the summed columns in user_data, which matches the above
+            on=[self.conversation_id_col],
+            how="inner"
+        )
 
     def get_conversation_level_aggregates(self) -> None:
         """
@@ -136,7 +140,7 @@ class ConversationLevelFeaturesCalculator:
             # Average/Mean of feature across the Conversation
             self.conv_data = pd.merge(
                 left=self.conv_data,
-                right=get_average(self.chat_data.copy(), column, 'average_'+column, self.conversation_id_col),
+                right=get_average(self.chat_data, column, 'average_'+column, self.conversation_id_col),
                 on=[self.conversation_id_col],
                 how="inner"
             )
@@ -144,7 +148,7 @@ class ConversationLevelFeaturesCalculator:
             # Standard Deviation of feature across the Conversation
             self.conv_data = pd.merge(
                 left=self.conv_data,
-                right=get_stdev(self.chat_data.copy(), column, 'stdev_'+column, self.conversation_id_col),
+                right=get_stdev(self.chat_data, column, 'stdev_'+column, self.conversation_id_col),
                 on=[self.conversation_id_col],
                 how="inner"
             )
@@ -152,7 +156,7 @@ class ConversationLevelFeaturesCalculator:
             # Minima for the feature across the Conversation
             self.conv_data = pd.merge(
                 left=self.conv_data,
-                right=get_min(self.chat_data.copy(), column, 'min_'+column, self.conversation_id_col),
+                right=get_min(self.chat_data, column, 'min_'+column, self.conversation_id_col),
                 on=[self.conversation_id_col],
                 how="inner"
             )
@@ -160,7 +164,7 @@ class ConversationLevelFeaturesCalculator:
             # Maxima for the feature across the Conversation
             self.conv_data = pd.merge(
                 left=self.conv_data,
-                right=get_max(self.chat_data.copy(), column, 'max_'+column, self.conversation_id_col),
+                right=get_max(self.chat_data, column, 'max_'+column, self.conversation_id_col),
                 on=[self.conversation_id_col],
                 how="inner"
             )
@@ -170,7 +174,7 @@ class ConversationLevelFeaturesCalculator:
             # Sum for the feature across the Conversation
             self.conv_data = pd.merge(
                 left=self.conv_data,
-                right=get_sum(self.chat_data.copy(), column, 'sum_'+column, self.conversation_id_col),
+                right=get_sum(self.chat_data, column, 'sum_'+column, self.conversation_id_col),
                 on=[self.conversation_id_col],
                 how="inner"
             )
@@ -199,7 +203,7 @@ class ConversationLevelFeaturesCalculator:
             # Average/Mean of User-Level Feature
             self.conv_data = pd.merge(
                 left=self.conv_data,
-                right=get_average(self.user_data.copy(), "sum_"+column, 'average_user_sum_'+column, self.conversation_id_col),
+                right=get_average(self.user_data, "sum_"+column, 'average_user_sum_'+column, self.conversation_id_col),
                 on=[self.conversation_id_col],
                 how="inner"
             )
@@ -207,7 +211,7 @@ class ConversationLevelFeaturesCalculator:
             # Standard Deviation of User-Level Feature
             self.conv_data = pd.merge(
                 left=self.conv_data,
-                right=get_stdev(self.user_data.copy(), "sum_"+column, 'stdev_user_sum_'+column, self.conversation_id_col),
+                right=get_stdev(self.user_data, "sum_"+column, 'stdev_user_sum_'+column, self.conversation_id_col),
                 on=[self.conversation_id_col],
                 how="inner"
             )
@@ -215,7 +219,7 @@ class ConversationLevelFeaturesCalculator:
             # Minima of User-Level Feature
             self.conv_data = pd.merge(
                 left=self.conv_data,
-                right=get_min(self.user_data.copy(), "sum_"+column, 'min_user_sum_'+column, self.conversation_id_col),
+                right=get_min(self.user_data, "sum_"+column, 'min_user_sum_'+column, self.conversation_id_col),
                 on=[self.conversation_id_col],
                 how="inner"
             )
@@ -223,7 +227,7 @@ class ConversationLevelFeaturesCalculator:
             # Maxima of User-Level Feature
             self.conv_data = pd.merge(
                 left=self.conv_data,
-                right=get_max(self.user_data.copy(), "sum_"+column, 'max_user_sum_'+column, self.conversation_id_col),
+                right=get_max(self.user_data, "sum_"+column, 'max_user_sum_'+column, self.conversation_id_col),
                 on=[self.conversation_id_col],
                 how="inner"
             )
@@ -234,7 +238,7 @@ class ConversationLevelFeaturesCalculator:
             # Average/Mean of User-Level Feature
             self.conv_data = pd.merge(
                 left=self.conv_data,
-                right=get_average(self.user_data.copy(), "average_"+column, 'average_user_avg_'+column, self.conversation_id_col),
+                right=get_average(self.user_data, "average_"+column, 'average_user_avg_'+column, self.conversation_id_col),
                 on=[self.conversation_id_col],
                 how="inner"
             )
@@ -242,7 +246,7 @@ class ConversationLevelFeaturesCalculator:
             # Standard Deviation of User-Level Feature
             self.conv_data = pd.merge(
                 left=self.conv_data,
-                right=get_stdev(self.user_data.copy(), "average_"+column, 'stdev_user_avg_'+column, self.conversation_id_col),
+                right=get_stdev(self.user_data, "average_"+column, 'stdev_user_avg_'+column, self.conversation_id_col),
                 on=[self.conversation_id_col],
                 how="inner"
             )
@@ -250,7 +254,7 @@ class ConversationLevelFeaturesCalculator:
             # Minima of User-Level Feature
             self.conv_data = pd.merge(
                 left=self.conv_data,
-                right=get_min(self.user_data.copy(), "average_"+column, 'min_user_avg_'+column, self.conversation_id_col),
+                right=get_min(self.user_data, "average_"+column, 'min_user_avg_'+column, self.conversation_id_col),
                 on=[self.conversation_id_col],
                 how="inner"
             )
@@ -258,7 +262,7 @@ class ConversationLevelFeaturesCalculator:
             # Maxima of User-Level Feature
             self.conv_data = pd.merge(
                 left=self.conv_data,
-                right=get_max(self.user_data.copy(), "average_"+column, 'max_user_avg_'+column, self.conversation_id_col),
+                right=get_max(self.user_data, "average_"+column, 'max_user_avg_'+column, self.conversation_id_col),
                 on=[self.conversation_id_col],
                 how="inner"
             )
@@ -2,6 +2,7 @@
 from team_comm_tools.utils.summarize_features import get_user_sum_dataframe, get_user_average_dataframe
 from team_comm_tools.features.get_user_network import *
 from team_comm_tools.features.user_centroids import *
+from team_comm_tools.utils.profiler import FeatureProfiler
 
 class UserLevelFeaturesCalculator:
     """
@@ -22,8 +23,12 @@ class UserLevelFeaturesCalculator:
     :type speaker_id_col: str
     :param input_columns: List of columns in the chat-level features dataframe that should not be summarized
     :type input_columns: list
+    :param compact_user_network: If true, stores the list of other users in each conversation as a compact UserNetwork (in `user_network`), rather than as a 'user_list' column in the user-level data. Defaults to False.
+    :type compact_user_network: bool
+    :param profiler: A FeatureProfiler, which records the time and memory of each step. Defaults to None, in which case nothing is recorded.
+    :type profiler: FeatureProfiler, optional
     """
-    def __init__(self, chat_data: pd.DataFrame, user_data: pd.DataFrame, vect_data: pd.DataFrame, conversation_id_col: str, speaker_id_col: str, input_columns:list) -> None:
+    def __init__(self, chat_data: pd.DataFrame, user_data: pd.DataFrame, vect_data: pd.DataFrame, conversation_id_col: str, speaker_id_col: str, input_columns:list, compact_user_network: bool = False, profiler: FeatureProfiler = None) -> None:
 
         # Initializing variables
         self.chat_data = chat_data
@@ -31,6 +36,9 @@ class UserLevelFeaturesCalculator:
         self.vect_data = vect_data
         self.conversation_id_col = conversation_id_col
         self.speaker_id_col = speaker_id_col
+        self.compact_user_network = compact_user_network
+        self.user_network = None
+        self.profiler = profiler if profiler is not None else FeatureProfiler()
         # Denotes the columns that can be summarized from the chat level, onto the conversation level.
         self.input_columns = list(input_columns)
         self.input_columns.append('conversation_num')
@@ -49,16 +57,19 @@ class UserLevelFeaturesCalculator:
         """
 
         # Get average features for all features
-        self.get_user_level_averaged_features()
+        with self.profiler.profile("user", "get_user_level_averaged_features", len(self.chat_data)):
+            self.get_user_level_averaged_features()
         
         # Get total counts for all features
-        self.get_user_level_summed_features()
+        with self.profiler.profile("user", "get_user_level_summed_features", len(self.chat_data)):
+            self.get_user_level_summed_features()
         
         # Get 4 discursive features (discursive diversity, variance in DD, incongruent modulation, within-person discursive range)
         # self.get_centroids()
 
         # Get list of other users in a given conversation
-        self.get_user_network()
+        with self.profiler.profile("user", "get_user_network", len(self.chat_data)):
+            self.get_user_network()
 
         return self.user_data
 
@@ -137,10 +148,16 @@ class UserLevelFeaturesCalculator:
         Get the user list per user per conversation.
 
         This function calculates and appends the list of other users in a given conversation to the user-level data.
+        If `compact_user_network` is set, the lists are instead stored as a UserNetwork (integer speaker codes with
+        CSR offsets) in `self.user_network`, aligned with the rows of the user-level data.
 
         :return: None
         :rtype: None
         """
+        if self.compact_user_network:
+            self.user_network = get_compact_user_network(self.user_data, self.conversation_id_col, self.speaker_id_col)
+            return
+
         self.user_data = pd.merge(
                 left=self.user_data,
                 right=get_user_network(self.user_data, self.conversation_id_col, self.speaker_id_col),
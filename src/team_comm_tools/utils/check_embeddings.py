@@ -3,6 +3,9 @@ import numpy as np
 import re
 import os
 import pickle
+import hashlib
+import time
+import tempfile
 
 from tqdm import tqdm
 from pathlib import Path
@@ -15,22 +18,39 @@ from transformers import AutoModelForSequenceClassification
 from scipy.special import softmax
 from transformers import logging
 
+from team_comm_tools.utils.profiler import FeatureProfiler
+
 logging.set_verbosity(40) # only log errors
 
+# The wall time (in seconds) of loading each model, which happens once, when this module is imported
+model_load_times = {}
+model_load_start = time.perf_counter()
 model_vect = SentenceTransformer('all-MiniLM-L6-v2')
+model_load_times["load_sbert_model"] = time.perf_counter() - model_load_start
 MODEL  = f"cardiffnlp/twitter-roberta-base-sentiment-latest"
+model_load_start = time.perf_counter()
 tokenizer = AutoTokenizer.from_pretrained(MODEL)
 model_bert = AutoModelForSequenceClassification.from_pretrained(MODEL)
+model_load_times["load_roberta_model"] = time.perf_counter() - model_load_start
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
+# How the RoBERTa sentiment model can be run: in full precision ("fp32"), with its Linear layers dynamically quantized to
+# 8-bit integers by PyTorch ("int8"), or with ONNX Runtime, in full precision ("onnx") or with 8-bit weights ("onnx_int8").
+sentiment_inference_modes = ["fp32", "int8", "onnx", "onnx_int8"]
+sentiment_models = {} # the models of the inference modes other than "fp32", which are built on first use
+
 # Check if embeddings exist
-def check_embeddings(chat_data, vect_path, bert_path, need_sentence, need_sentiment, regenerate_vectors, message_col = "message"):
+def check_embeddings(chat_data, vect_path, bert_path, need_sentence, need_sentiment, regenerate_vectors, message_col = "message", profiler = None, sentiment_inference = "fp32", sentiment_max_length = 512):
     """
     Check if embeddings and required lexicons exist, and generate them if they don't.
 
     This function ensures the necessary vector and BERT embeddings are available. 
     It also checks for the presence of certainty and lexicon files, generating them if needed.
 
+    The cached vectors and sentiments are keyed by the text of each message (see `get_message_keys`), rather than aligned
+    by position with the chat data. Only the messages that are missing from a cache are generated (and appended to it), so
+    a cache can be reused across subsets and truncations of the same data.
+
     :param chat_data: Dataframe containing chat data
     :type chat_data: pd.DataFrame
     :param vect_path: Path to the vector embeddings file (by default, we want SBERT vectors; embeddings for each utterance.)
@@ -45,33 +65,22 @@ def check_embeddings(chat_data, vect_path, bert_path, need_sentence, need_sentim
     :type regenerate_vectors: bool, optional
     :param message_col: A string representing the column name that should be selected as the message. Defaults to "message".
     :type message_col: str, optional
+    :param profiler: A FeatureProfiler, which records the time and memory of generating the vectors and sentiments. Defaults to None.
+    :type profiler: FeatureProfiler, optional
+    :param sentiment_inference: How to run the RoBERTa sentiment model (see `get_sentiment`). Defaults to "fp32".
+    :type sentiment_inference: str, optional
+    :param sentiment_max_length: The number of tokens of each message that the RoBERTa sentiment model reads (see `get_sentiment`). Defaults to 512.
+    :type sentiment_max_length: int, optional
 
     :return: None
     :rtype: None
     """
-    if (regenerate_vectors or (not os.path.isfile(vect_path))) and need_sentence:
-        generate_vect(chat_data, vect_path, message_col)
-    if (regenerate_vectors or (not os.path.isfile(bert_path))) and need_sentiment:
-        generate_bert(chat_data, bert_path, message_col)
-
-    try:
-        vector_df = pd.read_csv(vect_path)
-        # check whether the given vector and bert data matches length of chat data 
-        if len(vector_df) != len(chat_data):
-            print("ERROR: The length of the vector data does not match the length of the chat data. Regenerating...")
-            generate_vect(chat_data, vect_path, message_col)
-    except FileNotFoundError: # It's OK if we don't have the path, if the sentence vectors are not necessary
-        if need_sentence:
-            generate_vect(chat_data, vect_path, message_col)
-
-    try:
-        bert_df = pd.read_csv(bert_path)
-        if len(bert_df) != len(chat_data):
-            print("ERROR: The length of the sentiment data does not match the length of the chat data. Regenerating...")
-            generate_bert(chat_data, bert_path, message_col)
-    except FileNotFoundError:
-        if need_sentiment: # It's OK if we don't have the path, if the sentiment features are not necessary
-            generate_bert(chat_data, bert_path, message_col)
+    message_keys = get_message_keys(chat_data[message_col])
+    if need_sentence:
+        update_embedding_cache(chat_data, message_keys, vect_path, message_col, regenerate_vectors, generate_vect, "vector", profiler)
+    if need_sentiment:
+        update_embedding_cache(chat_data, message_keys, bert_path, message_col, regenerate_vectors, generate_bert, "sentiment", profiler,
+                               generate_kwargs = {"inference": sentiment_inference, "max_length": sentiment_max_length})
     
     # Get the lexicon pickle(s) if they don't exist
     current_script_directory = Path(__file__).resolve().parent
@@ -82,6 +91,82 @@ def check_embeddings(chat_data, vect_path, bert_path, need_sentence, need_sentim
     if (not os.path.isfile(CERTAINTY_PATH_STATIC)):
         generate_certainty_pkl()
 
+def get_message_keys(messages):
+    """
+    Get a stable key for each message: the SHA-1 hash of its text.
+
+    Missing messages, and messages that are only whitespace, get the same key as the empty string, as they are all embedded
+    as missing values.
+
+    :param messages: The messages to key.
+    :type messages: pd.Series
+    :return: The key of each message, as a hexadecimal string.
+    :rtype: list
+    """
+    return [hashlib.sha1((text if isinstance(text, str) and text.strip() else "").encode("utf-8")).hexdigest() for text in messages]
+
+def update_embedding_cache(chat_data, message_keys, cache_path, message_col, regenerate_vectors, generate_function, data_name, profiler = None, generate_kwargs = None):
+    """
+    Generate the cached outputs (vectors or sentiments) of the messages that are missing from a cache.
+
+    Caches written by earlier versions have no message keys. Vector caches store the text of each message, so their keys are
+    computed from it (and added to the cache); sentiment caches do not, and can only be aligned with the chat data by position,
+    which is unreliable (e.g., if the cache was written for a different dataset of the same length), so they are regenerated.
+
+    :param chat_data: Dataframe containing chat data
+    :type chat_data: pd.DataFrame
+    :param message_keys: The key of each message in the chat data (see `get_message_keys`)
+    :type message_keys: list
+    :param cache_path: Path to the cache file
+    :type cache_path: str
+    :param message_col: A string representing the column name that should be selected as the message.
+    :type message_col: str
+    :param regenerate_vectors: If true, will regenerate the entire cache even if it already exists
+    :type regenerate_vectors: bool
+    :param generate_function: The function that generates the outputs (`generate_vect` or `generate_bert`)
+    :type generate_function: function
+    :param data_name: The name of the outputs, for printing
+    :type data_name: str
+    :param profiler: A FeatureProfiler, which records the time and memory of generating the missing outputs. Defaults to None.
+    :type profiler: FeatureProfiler, optional
+    :param generate_kwargs: Any other arguments of the generate function. Defaults to None.
+    :type generate_kwargs: dict, optional
+    :return: None
+    :rtype: None
+    """
+    cached_keys = set()
+    if not regenerate_vectors and os.path.isfile(cache_path):
+        cached_columns = pd.read_csv(cache_path, nrows=0).columns
+        if "message_key" in cached_columns:
+            cached_keys = set(pd.read_csv(cache_path, usecols=["message_key"])["message_key"])
+        elif "message" in cached_columns:
+            # messages that were not read back exactly as written simply get other keys, and are regenerated
+            cached_df = pd.read_csv(cache_path, encoding_errors="replace")
+            cached_df.insert(0, "message_key", get_message_keys(cached_df["message"]))
+            cached_df.to_csv(cache_path, index=False)
+            cached_keys = set(cached_df["message_key"])
+        else:
+            print("WARNING: The cached " + data_name + " data has no message keys, and cannot be matched to the messages. Regenerating...")
+
+    is_missing = ~pd.Series(message_keys, index=chat_data.index).isin(cached_keys)
+    if is_missing.any():
+        profiler = profiler if profiler is not None else FeatureProfiler()
+        with profiler.profile("embeddings", generate_function.__name__, int(is_missing.sum())):
+            generate_function(chat_data.loc[is_missing], cache_path, message_col, append = len(cached_keys) > 0, **(generate_kwargs or {}))
+
+def align_embeddings(cached_df, message_keys):
+    """
+    Look up the cached outputs (vectors or sentiments) of each message by its key.
+
+    :param cached_df: The cached outputs, with a "message_key" column
+    :type cached_df: pd.DataFrame
+    :param message_keys: The key of each message (see `get_message_keys`)
+    :type message_keys: list
+    :return: The cached outputs of each message (without the key), aligned by position with `message_keys`
+    :rtype: pd.DataFrame
+    """
+    return cached_df.drop_duplicates("message_key").set_index("message_key").reindex(message_keys).reset_index(drop=True)
+
 # Read in the lexicons (helper function for generating the pickle file)
 def read_in_lexicons(directory, lexicons_dict):
     for filename in os.listdir(directory):
@@ -163,16 +248,20 @@ def generate_certainty_pkl():
         print("WARNING: Certainty lexicon not found. Skipping pickle generation...")
 
 
-def generate_vect(chat_data, output_path, message_col):
+def generate_vect(chat_data, output_path, message_col, append = False):
     """
     Generates sentence vectors for the given chat data and saves them to a CSV file.
 
+    Each distinct message is encoded once, and saved with its key (see `get_message_keys`).
+
     :param chat_data: Contains message data to be vectorized.
     :type chat_data: pd.DataFrame
     :param output_path: Path to save the CSV file containing message embeddings.
     :type output_path: str
     :param message_col: A string representing the column name that should be selected as the message. Defaults to "message".
     :type message_col: str, optional
+    :param append: If true, appends the vectors to an existing file (of other messages). Defaults to False.
+    :type append: bool, optional
     :raises FileNotFoundError: If the output path is invalid.
     :return: None
     :rtype: None
@@ -180,20 +269,26 @@ def generate_vect(chat_data, output_path, message_col):
 
     print(f"Generating SBERT sentence vectors...")
 
+    message_keys = pd.Series(get_message_keys(chat_data[message_col]))
+    is_first_occurrence = ~message_keys.duplicated()
+    messages = chat_data[message_col][is_first_occurrence.values]
+
     # Ensure empty strings are encoded as NaN
-    empty_to_nan = [text if text and text.strip() else np.nan for text in chat_data[message_col].tolist()]
+    empty_to_nan = [text if isinstance(text, str) and text.strip() else np.nan for text in messages.tolist()]
     embeddings = model_vect.encode(empty_to_nan)
-    embedding_arr = [row.tolist() for row in tqdm(embeddings, total=len(chat_data[message_col]))]
-    embedding_df = pd.DataFrame({'message': chat_data[message_col], 'message_embedding': embedding_arr})
+    embedding_arr = [row.tolist() for row in tqdm(embeddings, total=len(messages))]
+    embedding_df = pd.DataFrame({'message_key': message_keys[is_first_occurrence].tolist(), 'message': messages.tolist(), 'message_embedding': embedding_arr})
 
     # Create directories along the path if they don't exist
     Path(output_path).parent.mkdir(parents=True, exist_ok=True)
-    embedding_df.to_csv(output_path, index=False)
+    embedding_df.to_csv(output_path, index=False, mode="a" if append else "w", header=not append)
 
-def generate_bert(chat_data, output_path, message_col, batch_size=64):
+def generate_bert(chat_data, output_path, message_col, batch_size=64, append = False, inference = "fp32", max_length = 512):
     """
     Generates RoBERTa sentiment scores for the given chat data and saves them to a CSV file.
 
+    Each distinct message is analyzed once, and saved with its key (see `get_message_keys`).
+
     :param chat_data: Contains message data to be analyzed for sentiments.
     :type chat_data: pd.DataFrame
     :param output_path: Path to save the CSV file containing sentiment scores.
@@ -202,34 +297,59 @@ def generate_bert(chat_data, output_path, message_col, batch_size=64):
     :type message_col: str, optional
     :param batch_size: The size of each batch for processing sentiment analysis. Defaults to 64.
     :type batch_size: int
+    :param append: If true, appends the sentiments to an existing file (of other messages). Defaults to False.
+    :type append: bool, optional
+    :param inference: How to run the RoBERTa sentiment model (see `get_sentiment`). Defaults to "fp32".
+    :type inference: str, optional
+    :param max_length: The number of tokens of each message that the model reads (see `get_sentiment`). Defaults to 512.
+    :type max_length: int, optional
     :raises FileNotFoundError: If the output path is invalid.
     :return: None
     :rtype: None
     """
     print(f"Generating RoBERTa sentiments...")
 
-    messages = chat_data[message_col].tolist()
+    message_keys = pd.Series(get_message_keys(chat_data[message_col]))
+    is_first_occurrence = ~message_keys.duplicated()
+    messages = chat_data[message_col][is_first_occurrence.values].tolist()
     batch_sentiments_df = pd.DataFrame()
 
     for i in tqdm(range(0, len(messages), batch_size)):
         batch = messages[i:i + batch_size]
-        batch_df = get_sentiment(batch)
+        batch_df = get_sentiment(batch, inference, max_length)
         batch_sentiments_df = pd.concat([batch_sentiments_df, batch_df], ignore_index=True)
 
+    batch_sentiments_df.insert(0, 'message_key', message_keys[is_first_occurrence].tolist())
+
     # Create directories along the path if they don't exist
     Path(output_path).parent.mkdir(parents=True, exist_ok=True)
-    batch_sentiments_df.to_csv(output_path, index=False)
+    batch_sentiments_df.to_csv(output_path, index=False, mode="a" if append else "w", header=not append)
 
-def get_sentiment(texts):
+def get_sentiment(texts, inference = "fp32", max_length = 512):
     """
     Analyzes the sentiment of the given list of texts using a BERT model and returns a DataFrame with scores for positive, negative, and neutral sentiments.
 
+    The model runs in full precision by default. On CPUs, the quantized and ONNX Runtime inference modes are faster, and
+    a shorter `max_length` (e.g., 128, which covers almost all chat messages) saves time on long messages; their scores differ
+    slightly from those of the default model (see `compare_sentiment_inference`).
+
     :param texts: The list of input texts to analyze.
     :type texts: list of str
+    :param inference: How to run the model: "fp32" (full precision), "int8" (PyTorch dynamic quantization of the Linear layers to
+        8-bit integers), "onnx" (ONNX Runtime, full precision), or "onnx_int8" (ONNX Runtime, with 8-bit weights). The ONNX
+        modes require onnx and onnxruntime. Defaults to "fp32".
+    :type inference: str, optional
+    :param max_length: The number of tokens of each message that the model reads; longer messages are truncated. At most 512. Defaults to 512.
+    :type max_length: int, optional
+    :raises ValueError: If the inference mode or the maximum length is not supported.
     :return: A DataFrame with sentiment scores.
     :rtype: pd.DataFrame
     """
 
+    if not 1 <= max_length <= 512:
+        raise ValueError("The `max_length` of the RoBERTa sentiment model must be between 1 and 512 tokens.")
+    model = get_sentiment_model(inference)
+
     # Handle and tokenize non-null and non-empty texts
     texts_series = pd.Series(texts)
     non_null_non_empty_texts = texts_series[texts_series.apply(lambda x: pd.notnull(x) and x.strip() != '')].tolist()
@@ -238,10 +358,15 @@ def get_sentiment(texts):
         # Return a DataFrame with NaN if there are no valid texts to process
         return pd.DataFrame(np.nan, index=texts_series.index, columns=['positive_bert', 'negative_bert', 'neutral_bert'])
 
-    encoded = tokenizer(non_null_non_empty_texts, padding=True, truncation=True, max_length=512, return_tensors='pt')
-    output = model_bert(**encoded)
+    if inference in ["onnx", "onnx_int8"]:
+        encoded = tokenizer(non_null_non_empty_texts, padding=True, truncation=True, max_length=max_length, return_tensors='np')
+        scores = model.run(["logits"], {"input_ids": encoded["input_ids"].astype(np.int64), "attention_mask": encoded["attention_mask"].astype(np.int64)})[0]
+    else:
+        encoded = tokenizer(non_null_non_empty_texts, padding=True, truncation=True, max_length=max_length, return_tensors='pt')
+        with torch.no_grad():
+            output = model(**encoded)
+        scores = output[0].detach().numpy()
 
-    scores = output[0].detach().numpy()
     scores = softmax(scores, axis=1)
 
     sent_dict = {
@@ -256,4 +381,111 @@ def get_sentiment(texts):
     sent_df = pd.DataFrame(np.nan, index=texts_series.index, columns=['positive_bert', 'negative_bert', 'neutral_bert'])
     sent_df.loc[texts_series.apply(lambda x: pd.notnull(x) and x.strip() != ''), ['positive_bert', 'negative_bert', 'neutral_bert']] = non_null_sent_df.values
 
-    return sent_df
\ No newline at end of file
+    return sent_df
+
+def get_sentiment_model(inference = "fp32"):
+    """
+    Get the RoBERTa sentiment model of an inference mode (see `get_sentiment`), building it on first use.
+
+    :param inference: The inference mode: "fp32", "int8", "onnx", or "onnx_int8". Defaults to "fp32".
+    :type inference: str, optional
+    :raises ValueError: If the inference mode is not supported.
+    :return: The PyTorch model (for "fp32" and "int8"), or the ONNX Runtime inference session (for "onnx" and "onnx_int8").
+    :rtype: torch.nn.Module or onnxruntime.InferenceSession
+    """
+    if inference not in sentiment_inference_modes:
+        raise ValueError("Unsupported sentiment inference mode: " + str(inference) + ". Please use one of: " + ", ".join(sentiment_inference_modes) + ".")
+    if inference == "fp32":
+        return model_bert
+    if inference not in sentiment_models:
+        if inference == "int8":
+            sentiment_models[inference] = torch.quantization.quantize_dynamic(model_bert, {torch.nn.Linear}, dtype=torch.qint8)
+        else:
+            sentiment_models[inference] = get_onnx_sentiment_session(quantize = inference == "onnx_int8")
+    return sentiment_models[inference]
+
+def get_onnx_sentiment_session(quantize = False):
+    """
+    Export the RoBERTa sentiment model to ONNX, and load it into an ONNX Runtime inference session.
+
+    :param quantize: If true, the weights of the exported model are dynamically quantized to 8-bit integers. Defaults to False.
+    :type quantize: bool, optional
+    :raises ImportError: If onnx or onnxruntime is not installed.
+    :return: The inference session, which maps "input_ids" and "attention_mask" to the "logits" of each message.
+    :rtype: onnxruntime.InferenceSession
+    """
+    try:
+        import onnx # needed to export (and quantize) the model
+        import onnxruntime
+    except ImportError:
+        raise ImportError("ONNX Runtime inference requires onnx and onnxruntime. Please install them with `pip install onnx onnxruntime`.")
+
+    class SentimentLogits(torch.nn.Module):
+        # the sentiment model, returning only its logits (which ONNX can export)
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask)[0]
+
+    example = tokenizer(["an example message"], return_tensors='pt')
+    with tempfile.TemporaryDirectory() as model_directory:
+        model_path = os.path.join(model_directory, "sentiment.onnx")
+        torch.onnx.export(
+            SentimentLogits(model_bert).eval(),
+            (example["input_ids"], example["attention_mask"]),
+            model_path,
+            input_names = ["input_ids", "attention_mask"],
+            output_names = ["logits"],
+            dynamic_axes = {"input_ids": {0: "batch", 1: "sequence"}, "attention_mask": {0: "batch", 1: "sequence"}, "logits": {0: "batch"}},
+            opset_version = 14
+        )
+        if quantize:
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            quantized_model_path = os.path.join(model_directory, "sentiment_int8.onnx")
+            quantize_dynamic(model_path, quantized_model_path, weight_type=QuantType.QInt8)
+            model_path = quantized_model_path
+        # the session holds the model in memory, so the temporary files can be removed
+        return onnxruntime.InferenceSession(model_path, providers=["CPUExecutionProvider"])
+
+def compare_sentiment_inference(texts, inference, max_length = 512, batch_size = 64):
+    """
+    Compare the RoBERTa sentiments of an inference mode (and maximum length) to those of the default: the full-precision model,
+    reading up to 512 tokens of each message.
+
+    :param texts: The messages to compare the sentiments of.
+    :type texts: list of str
+    :param inference: The inference mode (see `get_sentiment`).
+    :type inference: str
+    :param max_length: The maximum length, in tokens (see `get_sentiment`). Defaults to 512.
+    :type max_length: int, optional
+    :param batch_size: The number of messages that are analyzed at a time. Defaults to 64.
+    :type batch_size: int, optional
+    :return: The mean and maximum absolute difference from the default scores (of each of `positive_bert`, `negative_bert`,
+        and `neutral_bert`), the proportion of messages whose most likely sentiment is the same, and the time taken by each
+        (in seconds, after building the model), with the resulting speedup.
+    :rtype: dict
+    """
+    get_sentiment_model(inference) # build the model before timing it
+
+    sentiments = {}
+    seconds = {}
+    for key, key_inference, key_max_length in [("default", "fp32", 512), ("compared", inference, max_length)]:
+        start_time = time.perf_counter()
+        sentiments[key] = pd.concat([get_sentiment(texts[i:i + batch_size], key_inference, key_max_length) for i in range(0, len(texts), batch_size)], ignore_index=True)
+        seconds[key] = time.perf_counter() - start_time
+
+    differences = (sentiments["compared"] - sentiments["default"]).abs()
+    is_scored = sentiments["default"].notna().all(axis=1)
+    same_sentiment = sentiments["default"][is_scored].idxmax(axis=1) == sentiments["compared"][is_scored].idxmax(axis=1)
+    return {
+        "inference": inference,
+        "max_length": max_length,
+        "mean_absolute_difference": differences.mean().to_dict(),
+        "max_absolute_difference": differences.max().to_dict(),
+        "sentiment_agreement": same_sentiment.mean() if len(same_sentiment) > 0 else np.nan,
+        "default_seconds": seconds["default"],
+        "seconds": seconds["compared"],
+        "speedup": seconds["default"] / seconds["compared"] if seconds["compared"] > 0 else np.nan
+    }
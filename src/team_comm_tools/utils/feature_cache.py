@@ -0,0 +1,200 @@
+import os
+import pickle
+import sqlite3
+import time
+import hashlib
+
+class FeatureCache:
+    """
+    A persistent, local cache of the chat-level features of each message, stored in a SQLite database.
+
+    Many chat-level features are a pure function of the text of a message. When overlapping datasets are featurized
+    repeatedly (e.g., with different groupings or truncations), the ChatLevelFeaturesCalculator looks up the outputs of
+    these features in the cache, and only computes them for the messages that are missing.
+
+    Entries are keyed by (feature name, feature version, message hash), where the message hash identifies the text(s) that
+    the feature reads (see `get_message_hashes`); changing the version of a feature therefore invalidates its old entries.
+    The cache is bounded in size: once the stored outputs exceed `max_size` bytes, the least recently used entries are evicted.
+
+    Lookups (`get`) and new entries (`put`) are batched: they are written to the database, and the cache is trimmed to
+    `max_size`, in a single transaction when `commit` is called (the ChatLevelFeaturesCalculator commits once per feature).
+
+    :param path: The path of the SQLite database file; it is created if it does not exist.
+    :type path: str
+    :param max_size: The maximum total size (in bytes) of the stored outputs. Defaults to 1 GB.
+    :type max_size: int, optional
+    :raises ValueError: If `max_size` is not positive.
+    """
+    # The maximum number of parameters in a single SQLite query
+    query_batch_size = 500
+
+    def __init__(self, path: str, max_size: int = 1024 ** 3) -> None:
+        if max_size <= 0:
+            raise ValueError("The `max_size` of the feature cache must be a positive number of bytes.")
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_size = max_size
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS features (feature TEXT, version TEXT, message_hash TEXT, outputs BLOB, size INTEGER, last_used REAL, "
+            "PRIMARY KEY (feature, version, message_hash))"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS features_last_used ON features (last_used)")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS feature_columns (feature TEXT, version TEXT, columns BLOB, PRIMARY KEY (feature, version))")
+        self.connection.commit()
+        self.size = self.get_size() # the total size of the stored outputs, kept up to date as entries are added
+        self.pending_uses = [] # the entries that were looked up since the last commit, to be marked as recently used
+
+    def get_columns(self, feature: str, version: str):
+        """
+        Get the output columns (and their types) of a feature, as stored with its cached outputs.
+
+        :param feature: The name of the feature.
+        :type feature: str
+        :param version: The version of the feature.
+        :type version: str
+        :return: A list of (column name, dtype) pairs, or None if the feature has no cached outputs.
+        :rtype: list
+        """
+        row = self.connection.execute("SELECT columns FROM feature_columns WHERE feature = ? AND version = ?", (feature, version)).fetchone()
+        return pickle.loads(row[0]) if row is not None else None
+
+    def get(self, feature: str, version: str, message_hashes: list) -> dict:
+        """
+        Look up the cached outputs of a feature for a list of messages. The entries that are found are marked as recently used
+        when the cache is next committed.
+
+        :param feature: The name of the feature.
+        :type feature: str
+        :param version: The version of the feature.
+        :type version: str
+        :param message_hashes: The hashes of the messages.
+        :type message_hashes: list
+        :return: A dictionary mapping the hash of each message that is in the cache to its outputs (a list, in the order of `get_columns`).
+        :rtype: dict
+        """
+        outputs = {}
+        for start in range(0, len(message_hashes), self.query_batch_size):
+            batch = message_hashes[start:start + self.query_batch_size]
+            rows = self.connection.execute(
+                "SELECT message_hash, outputs FROM features WHERE feature = ? AND version = ? AND message_hash IN (" + ",".join("?" * len(batch)) + ")",
+                [feature, version] + list(batch)
+            ).fetchall()
+            outputs.update((message_hash, pickle.loads(message_outputs)) for message_hash, message_outputs in rows)
+
+        now = time.time()
+        self.pending_uses.extend((now, feature, version, message_hash) for message_hash in outputs)
+        return outputs
+
+    def put(self, feature: str, version: str, columns: list, message_hashes: list, outputs: list) -> None:
+        """
+        Store the outputs of a feature for a list of messages. The entries are saved (and the least recently used entries evicted,
+        if the cache is too large) when the cache is next committed.
+
+        :param feature: The name of the feature.
+        :type feature: str
+        :param version: The version of the feature.
+        :type version: str
+        :param columns: The output columns of the feature, as (column name, dtype) pairs.
+        :type columns: list
+        :param message_hashes: The hashes of the messages.
+        :type message_hashes: list
+        :param outputs: The outputs of each message (a list, in the order of `columns`).
+        :type outputs: list
+        :return: None
+        :rtype: None
+        """
+        now = time.time()
+        self.connection.execute("INSERT OR REPLACE INTO feature_columns VALUES (?, ?, ?)", (feature, version, pickle.dumps(columns)))
+        entries = []
+        for message_hash, message_outputs in zip(message_hashes, outputs):
+            serialized_outputs = pickle.dumps(message_outputs)
+            entries.append((feature, version, message_hash, serialized_outputs, len(serialized_outputs), now))
+        self.connection.executemany("INSERT OR REPLACE INTO features VALUES (?, ?, ?, ?, ?, ?)", entries)
+        self.size += sum(entry[4] for entry in entries) # replaced entries are counted twice, until the size is next checked in `evict`
+
+    def commit(self) -> None:
+        """
+        Save the pending lookups and new entries to the database, evicting the least recently used entries if the cache is too large.
+
+        :return: None
+        :rtype: None
+        """
+        if self.pending_uses:
+            self.connection.executemany("UPDATE features SET last_used = ? WHERE feature = ? AND version = ? AND message_hash = ?", self.pending_uses)
+            self.pending_uses = []
+        if self.size > self.max_size:
+            self.evict()
+        self.connection.commit()
+
+    def get_size(self) -> int:
+        """
+        Get the total size (in bytes) of the stored outputs.
+
+        :return: The total size of the stored outputs.
+        :rtype: int
+        """
+        return self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM features").fetchone()[0]
+
+    def evict(self) -> None:
+        """
+        Evict the least recently used entries until the stored outputs fit within `max_size`.
+
+        :return: None
+        :rtype: None
+        """
+        self.size = self.get_size()
+        excess_size = self.size - self.max_size
+        if excess_size <= 0:
+            return
+
+        evicted_rows = []
+        for rowid, size in self.connection.execute("SELECT rowid, size FROM features ORDER BY last_used"):
+            evicted_rows.append((rowid,))
+            excess_size -= size
+            self.size -= size
+            if excess_size <= 0:
+                break
+        self.connection.executemany("DELETE FROM features WHERE rowid = ?", evicted_rows)
+
+    def close(self) -> None:
+        """
+        Commit any pending changes, and close the connection to the database.
+
+        :return: None
+        :rtype: None
+        """
+        self.commit()
+        self.connection.close()
+
+def get_message_hashes(messages: list) -> list:
+    """
+    Hash the text(s) of each message, to identify it in the feature cache.
+
+    :param messages: For each message, the tuple of texts that a feature reads (e.g., the preprocessed and the original message).
+    :type messages: list
+    :return: The sha1 hex digest of the texts of each message.
+    :rtype: list
+    """
+    return [
+        hashlib.sha1("\x1f".join(text if isinstance(text, str) else "\x00" + repr(text) for text in texts).encode("utf-8")).hexdigest()
+        for texts in messages
+    ]
+
+def get_feature_cache(feature_cache):
+    """
+    Get the feature cache for the FeatureBuilder.
+
+    :param feature_cache: Either the path of a SQLite database file, or a FeatureCache (e.g., one with a custom `max_size`).
+    :type feature_cache: str or FeatureCache
+    :raises ValueError: If the feature cache is neither a path nor a FeatureCache.
+    :return: The feature cache.
+    :rtype: FeatureCache
+    """
+    if isinstance(feature_cache, str):
+        return FeatureCache(feature_cache)
+    if not isinstance(feature_cache, FeatureCache):
+        raise ValueError("Unsupported feature cache. Please use the path of a SQLite database file, or a FeatureCache.")
+    return feature_cache
@@ -1,11 +1,15 @@
 import numpy as np
 import csv
 import pandas as pd
- 
+
 def gini_coefficient(x):
     """
     Calculates the Gini coefficient for an array of values, which is a measure of statistical dispersion.
 
+    Rather than summing the absolute differences between every pair of values (which is O(n^2)), we sort the values
+    and weight each one by its rank: for sorted values x_0 <= ... <= x_{n-1}, the sum of pairwise differences is
+    sum_k (2k - n + 1) * x_k. This runs in O(n log n) and gives the same result.
+
     Source code: https://stackoverflow.com/questions/39512260/calculating-gini-coefficient-in-python-numpy
 
     :param x: List or array of values to calculate the Gini coefficient for.
@@ -13,12 +17,48 @@ def gini_coefficient(x):
     :return: Gini coefficient value.
     :rtype: float
     """
-    diffsum = 0
-    for i, xi in enumerate(x[:-1], 1):
-        diffsum += np.sum(np.abs(xi - x[i:]))
-    if ((len(x)**2 * np.mean(x)) == 0):
+    x = np.sort(np.asarray(x, dtype=float))
+    n = len(x)
+    if ((n**2 * np.mean(x)) == 0):
         return np.nan
-    return diffsum / (len(x)**2 * np.mean(x))
+    diffsum = np.sum((2 * np.arange(n) - n + 1) * x)
+    return diffsum / (n**2 * np.mean(x))
+
+def get_gini_features(input_data, on_columns, conversation_id_col):
+    """
+    Calculates the Gini coefficient for several numeric columns within grouped conversation data, in a single grouped pass.
+
+    The values of all requested columns are ranked within each conversation at once, and each value is weighted by
+    (2 * rank - n + 1), so that the sum of pairwise differences for every column and conversation comes out of one
+    grouped sum. Conversations with a mean of zero get a Gini coefficient of NaN, as in `gini_coefficient`.
+
+    :param input_data: A DataFrame of conversations, where each row represents one chat (or one user).
+    :type input_data: pd.DataFrame
+    :param on_columns: The names of the numeric columns on which the Gini coefficient is to be calculated.
+    :type on_columns: list
+    :param conversation_id_col: A string representing the column name that should be selected as the conversation ID.
+    :type conversation_id_col: str
+    :return: A DataFrame with a Gini coefficient column ("gini_coefficient_" + column) for each requested column, per conversation.
+    :rtype: pd.DataFrame
+    """
+    conversation_ids = input_data[conversation_id_col]
+    values = input_data[on_columns].astype(float)
+
+    grouped_values = values.groupby(conversation_ids)
+    group_sizes = grouped_values[on_columns[0]].transform("size")
+    ranks = grouped_values.rank(method="first") - 1 # ties contribute the same amount regardless of their order
+    weights = ranks.mul(2).sub(group_sizes - 1, axis=0)
+
+    diffsum = (weights * values).groupby(conversation_ids).sum()
+    num_values = grouped_values.size()
+    denominator = grouped_values.mean().mul(num_values**2, axis=0)
+
+    gini_calculated = diffsum / denominator.where(denominator != 0)
+    # any missing value makes the coefficient undefined for that conversation
+    gini_calculated = gini_calculated.where(~values.isna().groupby(conversation_ids).any())
+
+    gini_calculated.columns = ["gini_coefficient_" + column for column in on_columns]
+    return gini_calculated.reset_index()
 
 def get_gini(input_data, on_column, conversation_id_col):
 	"""
@@ -34,5 +74,5 @@ def get_gini(input_data, on_column, conversation_id_col):
     :rtype: pd.DataFrame
     """
 
-	gini_calculated = input_data.groupby([conversation_id_col]).apply(lambda df : gini_coefficient(np.asarray(df[on_column]))).reset_index().rename(columns={0: "gini_coefficient_" + on_column})
-	return(gini_calculated)
\ No newline at end of file
+	gini_calculated = get_gini_features(input_data, [on_column], conversation_id_col)
+	return(gini_calculated)
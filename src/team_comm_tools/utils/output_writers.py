@@ -0,0 +1,284 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+class CSVWriter:
+    """
+    Writes the feature dataframes to CSV files. This is the default output writer.
+
+    Within a session (that is, until `close` is called), the first write to a path creates the file, and any later
+    writes to the same path (e.g., for later chunks of a StreamingFeatureBuilder) append their rows to it, with their
+    columns arranged to match the header of the first write.
+    """
+    extension = "csv"
+
+    def __init__(self):
+        self.columns = {}
+
+    def write(self, data, path, preserve_columns = None) -> None:
+        """
+        Write a feature dataframe to a CSV file.
+
+        :param data: The feature dataframe to write.
+        :type data: pd.DataFrame
+        :param path: The path of the output file.
+        :type path: str
+        :param preserve_columns: Columns whose types should be kept as-is; this is unused, as CSV files are untyped.
+        :type preserve_columns: list, optional
+        :return: None
+        :rtype: None
+        """
+        if path in self.columns:
+            data.reindex(columns=self.columns[path]).to_csv(path, index=False, mode="a", header=False)
+        else:
+            data.to_csv(path, index=False)
+            self.columns[path] = data.columns
+
+    def close(self) -> None:
+        """
+        End the session; the next write to any path will overwrite it.
+
+        :return: None
+        :rtype: None
+        """
+        self.columns = {}
+
+class ParquetWriter:
+    """
+    Writes the feature dataframes to Parquet files (using pyarrow), with compact types.
+
+    Unless `compact_dtypes` is False, feature columns are stored as float32 (rather than float64) and int32 (rather than
+    int64, where the values fit); classification columns are stored as categoricals. List-valued columns are stored as
+    native Parquet lists, rather than as stringified Python objects: `user_list` as a list of speaker identifiers (as
+    strings), and `named_entities` as a list of (entity, confidence) structs. The types of these columns are declared rather
+    than inferred, as a write in which every list is empty (e.g., a chunk without any named entities) would otherwise fix
+    them as lists of nulls. Columns from the input data keep their original types.
+
+    Within a session (that is, until `close` is called), any later writes to the same path (e.g., for later chunks of a
+    StreamingFeatureBuilder) are added to the file, with their columns arranged to match the first write. As the type of a
+    column may differ between writes (e.g., an optional text column that is empty in the first chunk, and so was read as
+    float), each write is saved as a separate part, and the file is only assembled once the session is closed: the type
+    of each column is then unified across the parts (a column that is empty in some parts takes the type of the others,
+    integers are widened, integers and floats become floats, and numbers and text become text), and every part is
+    converted to it. Files are therefore only complete (readable) once the session is closed.
+
+    :param compact_dtypes: If true, stores features with compact types. Defaults to True.
+    :type compact_dtypes: bool, optional
+    :param categorical_columns: The classification columns to store as categoricals. Defaults to ["dale_chall_classification"].
+    :type categorical_columns: list, optional
+    :raises ImportError: If pyarrow is not installed.
+    :raises ValueError: When closing, if the types of a column cannot be unified across the writes to a file.
+    """
+    extension = "parquet"
+
+    def __init__(self, compact_dtypes: bool = True, categorical_columns: list = ["dale_chall_classification"]):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("Writing Parquet output requires pyarrow. Please install it with `pip install pyarrow`.")
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.compact_dtypes = compact_dtypes
+        self.categorical_columns = categorical_columns
+        self.list_column_types = {
+            "named_entities": pyarrow.list_(pyarrow.struct([("entity", pyarrow.string()), ("confidence", pyarrow.float64())])),
+            "user_list": pyarrow.list_(pyarrow.string())
+        }
+        self.parts = {} # the parts written to each path so far, in order
+        self.columns = {} # the columns of the first write to each path
+
+    def get_compact_data(self, data, preserve_columns = None) -> pd.DataFrame:
+        """
+        Convert a feature dataframe to compact types, and its list-valued columns to plain lists.
+
+        :param data: The feature dataframe.
+        :type data: pd.DataFrame
+        :param preserve_columns: Columns (e.g., from the input data) whose types should be kept as-is. Defaults to None.
+        :type preserve_columns: list, optional
+        :return: A dataframe with the same columns, in compact types.
+        :rtype: pd.DataFrame
+        """
+        preserve_columns = set(preserve_columns) if preserve_columns is not None else set()
+        compact_columns = {}
+        for column in data.columns:
+            values = data[column]
+            if column == "named_entities":
+                compact_columns[column] = values.apply(lambda entities: [{"entity": str(entity), "confidence": float(confidence)} for entity, confidence in entities] if isinstance(entities, (list, tuple)) else None)
+            elif column == "user_list":
+                compact_columns[column] = values.apply(lambda users: [str(user) for user in users] if users is not None else None)
+            elif not self.compact_dtypes or column in preserve_columns:
+                compact_columns[column] = values
+            elif column in self.categorical_columns:
+                compact_columns[column] = values.astype("category")
+            elif pd.api.types.is_float_dtype(values):
+                compact_columns[column] = values.astype(np.float32)
+            elif pd.api.types.is_integer_dtype(values) and not pd.api.types.is_bool_dtype(values) and len(values) > 0 \
+                    and values.min() >= np.iinfo(np.int32).min and values.max() <= np.iinfo(np.int32).max:
+                compact_columns[column] = values.astype(np.int32)
+            else:
+                compact_columns[column] = values
+        return pd.DataFrame(compact_columns, index=data.index)
+
+    def to_table(self, data, preserve_columns = None, schema = None):
+        """
+        Convert a feature dataframe into an Arrow table, with compact types.
+
+        :param data: The feature dataframe.
+        :type data: pd.DataFrame
+        :param preserve_columns: Columns (e.g., from the input data) whose types should be kept as-is. Defaults to None.
+        :type preserve_columns: list, optional
+        :param schema: The schema of the table (e.g., that of earlier writes to the same file). Defaults to None, in which case it is
+            inferred (except for the types of the list-valued columns, which are declared).
+        :type schema: pyarrow.Schema, optional
+        :return: The features as an Arrow table.
+        :rtype: pyarrow.Table
+        """
+        compact_data = self.get_compact_data(data, preserve_columns)
+        if schema is not None:
+            compact_data = compact_data.reindex(columns=schema.names)
+        else:
+            schema = self.pa.Schema.from_pandas(compact_data, preserve_index=False)
+            for column, column_type in self.list_column_types.items():
+                if column in schema.names:
+                    schema = schema.set(schema.get_field_index(column), self.pa.field(column, column_type))
+        return self.pa.Table.from_pandas(compact_data, schema=schema, preserve_index=False)
+
+    def write(self, data, path, preserve_columns = None) -> None:
+        """
+        Write a feature dataframe to a Parquet file.
+
+        :param data: The feature dataframe to write.
+        :type data: pd.DataFrame
+        :param path: The path of the output file.
+        :type path: str
+        :param preserve_columns: Columns (e.g., from the input data) whose types should be kept as-is. Defaults to None.
+        :type preserve_columns: list, optional
+        :return: None
+        :rtype: None
+        """
+        if path in self.parts:
+            data = data.reindex(columns=self.columns[path])
+        else:
+            self.parts[path] = []
+            self.columns[path] = data.columns
+            os.makedirs(self.get_parts_directory(path), exist_ok=True)
+        part_path = os.path.join(self.get_parts_directory(path), str(len(self.parts[path])) + ".parquet")
+        self.pq.write_table(self.to_table(data, preserve_columns), part_path)
+        self.parts[path].append(part_path)
+
+    def get_parts_directory(self, path) -> str:
+        """
+        Get the directory in which the parts of a file are written until the session is closed.
+
+        :param path: The path of the output file.
+        :type path: str
+        :return: The path of a hidden directory next to the output file.
+        :rtype: str
+        """
+        directory, file_name = os.path.split(path)
+        return os.path.join(directory, "." + file_name + ".parts")
+
+    def unify_schemas(self, schemas, path):
+        """
+        Unify the schemas of the parts of a file into the schema of the complete file.
+
+        A column that is empty (of null type) in some parts takes the type of the others; numeric types are promoted (e.g.,
+        int32 to int64, and integers to floats); and a column that holds numbers (or booleans) in some parts and text in
+        others is stored as text.
+
+        :param schemas: The schema of each part.
+        :type schemas: list
+        :param path: The path of the output file (for error messages).
+        :type path: str
+        :raises ValueError: If the types of a column cannot be unified.
+        :return: The unified schema.
+        :rtype: pyarrow.Schema
+        """
+        fields = []
+        for field in schemas[0]:
+            column_types = [schema.field(field.name).type for schema in schemas]
+            try:
+                column_type = self.pa.unify_schemas([self.pa.schema([self.pa.field(field.name, column_type)]) for column_type in column_types], promote_options="permissive").field(field.name).type
+            except (self.pa.ArrowInvalid, self.pa.ArrowTypeError):
+                types = self.pa.types
+                if all(types.is_null(t) or types.is_string(t) or types.is_integer(t) or types.is_floating(t) or types.is_boolean(t) for t in column_types):
+                    column_type = self.pa.string()
+                else:
+                    raise ValueError("The column `" + field.name + "` has incompatible types in different writes to " + path + " (" + ", ".join(sorted(set(str(t) for t in column_types))) + "), which cannot be stored in a single Parquet file.")
+            fields.append(self.pa.field(field.name, column_type))
+        unchanged = all(schema.equals(schemas[0]) for schema in schemas)
+        # the pandas metadata records the original type of each column, which no longer applies once the types were unified
+        return self.pa.schema(fields, metadata=schemas[0].metadata if unchanged else None)
+
+    def cast_table(self, table, schema, path):
+        """
+        Convert a part of a file to the unified schema of the file.
+
+        :param table: The part.
+        :type table: pyarrow.Table
+        :param schema: The unified schema (see `unify_schemas`).
+        :type schema: pyarrow.Schema
+        :param path: The path of the output file (for error messages).
+        :type path: str
+        :raises ValueError: If a column cannot be converted to its unified type.
+        :return: The part, in the unified schema.
+        :rtype: pyarrow.Table
+        """
+        columns = []
+        for field in schema:
+            column = table.column(field.name)
+            if column.type.equals(field.type):
+                columns.append(column)
+            elif column.null_count == len(column):
+                columns.append(self.pa.nulls(len(column), field.type))
+            else:
+                try:
+                    columns.append(column.cast(field.type))
+                except (self.pa.ArrowInvalid, self.pa.ArrowNotImplementedError) as error:
+                    raise ValueError("The column `" + field.name + "` of a write to " + path + " cannot be converted from " + str(column.type) + " to " + str(field.type) + ": " + str(error))
+        return self.pa.Table.from_arrays(columns, schema=schema)
+
+    def close(self) -> None:
+        """
+        End the session, assembling all files written so far from their parts; the next write to any path will overwrite it.
+
+        :raises ValueError: If the types of a column cannot be unified across the writes to a file.
+        :return: None
+        :rtype: None
+        """
+        try:
+            for path, part_paths in self.parts.items():
+                if len(part_paths) == 1:
+                    os.replace(part_paths[0], path)
+                    continue
+                schema = self.unify_schemas([self.pq.read_schema(part_path) for part_path in part_paths], path)
+                with self.pq.ParquetWriter(path, schema) as writer:
+                    for part_path in part_paths: # one part at a time, so that the file never needs to fit in memory
+                        writer.write_table(self.cast_table(self.pq.read_table(part_path), schema, path))
+        finally:
+            for path in self.parts:
+                shutil.rmtree(self.get_parts_directory(path), ignore_errors=True)
+            self.parts = {}
+            self.columns = {}
+
+def get_output_writer(output_writer):
+    """
+    Get the output writer for the FeatureBuilder.
+
+    :param output_writer: Either the name of a supported format ("csv" or "parquet"), or an object with the same interface as
+        the CSVWriter (an `extension` attribute, and `write(data, path, preserve_columns)` and `close()` methods).
+    :type output_writer: str or object
+    :raises ValueError: If the output writer is not supported.
+    :return: The output writer.
+    :rtype: object
+    """
+    if output_writer == "csv":
+        return CSVWriter()
+    if output_writer == "parquet":
+        return ParquetWriter()
+    if isinstance(output_writer, str) or not all(hasattr(output_writer, attribute) for attribute in ["extension", "write", "close"]):
+        raise ValueError("Unsupported output writer. Please use 'csv', 'parquet', or an object with an `extension`, and `write` and `close` methods.")
+    return output_writer
@@ -6,20 +6,20 @@ In order to prevent repeated re-loading of the lexicon, we pre-load them here.
 
 def get_dale_chall_easy_words():
     """
-    Returns the list of easy words according to the Dale-Chall readability formula.
+    Returns the set of easy words according to the Dale-Chall readability formula.
 
     Reference: https://en.wikipedia.org/wiki/Dale%E2%80%93Chall_readability_formula
 
-    :return: A list of easy words as defined by the Dale-Chall readability formula.
-    :rtype: list
+    :return: A set of easy words as defined by the Dale-Chall readability formula.
+    :rtype: set
     """
     current_dir = os.path.dirname(__file__)
     dale_chall_file_path = os.path.join(current_dir, '../features/lexicons/dale_chall.txt')
     dale_chall_file_path = os.path.abspath(dale_chall_file_path)
 
     with open(dale_chall_file_path, 'r') as file:
-        easy_word_list = [line.strip() for line in file]
-    return easy_word_list
+        easy_words = {line.strip() for line in file}
+    return easy_words
 
 def get_function_words():
     """
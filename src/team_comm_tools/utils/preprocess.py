@@ -1,4 +1,5 @@
 import re
+import numpy as np
 import pandas as pd
 
 def preprocess_conversation_columns(df, conversation_id, timestamp_col, grouping_keys, cumulative_grouping = False, within_task = False):
@@ -107,6 +108,9 @@ def preprocess_naive_turns(chat_data, column_names):
     indicating turns taken by the active speaker. It then combines messages with the same 'turn_id' 
     within each conversation to compress repeated messages from the same speaker.
 
+    The compression is a single grouped aggregation keyed on (conversation, turn_id): every column keeps the
+    value of the first message of the turn, except for the message columns, whose text is joined with spaces.
+
     :param chat_data: The chat data to process.
     :type chat_data: pandas.DataFrame
 	:param column_names: Columns to preprocess.
@@ -117,58 +121,69 @@ def preprocess_naive_turns(chat_data, column_names):
 	conversation_id_col = column_names['conversation_id_col']
 	message_col = column_names['message_col']
 	speaker_id_col = column_names['speaker_id_col']
-	turn_id_per_conv = chat_data.groupby([conversation_id_col], sort=False).apply(lambda df : get_turn_id(df, speaker_id_col))
-	turn_id_per_conv = turn_id_per_conv.to_frame().reset_index().rename(columns={0:'turn_id'})
-	chat_data = pd.concat([chat_data, turn_id_per_conv["turn_id"]], axis=1)
-	
+	chat_data = chat_data.assign(turn_id = get_turn_id(chat_data, conversation_id_col, speaker_id_col)) # leave the caller's frame unchanged
+
 	# Use turn_id to compress messages with the same turn id per conversation
-	chat_data = chat_data.groupby(conversation_id_col, sort=False).apply(
-		lambda df : df.groupby('turn_id', as_index=False).apply(lambda df : compress(df, message_col))).reset_index(drop=True)
-	
+	turns = chat_data.groupby([conversation_id_col, 'turn_id'], sort=False)
+	compressed = turns.nth(0).copy() # the first message of each turn, in the order in which the turns first appear
+	for column in [message_col, 'message_lower_with_punc']:
+		compressed[column] = join_messages_by_group(chat_data[column], turns.ngroup())
+
+	# Keep all turns of a conversation together, in the order in which the conversations first appear
+	conversation_order = pd.factorize(compressed[conversation_id_col])[0]
+	chat_data = compressed.iloc[np.argsort(conversation_order, kind='stable')].reset_index(drop=True)
+
 	return chat_data
 
-def get_turn_id(df, speaker_id_col):
-	"""Generate turn IDs for a conversation to identify turns taken by speakers.
+def join_messages_by_group(messages, group_ids):
+	"""Join the messages within each group into a single message, separated by spaces.
+
+    Rather than joining the messages of each group one group at a time, this function lines up the messages of each
+    group contiguously, appends a space to every message except the last one in its group, and adds up each group's
+    strings with a single `np.add.reduceat`.
+
+    :param messages: The messages to join.
+    :type messages: pandas.Series
+	:param group_ids: The group number of each message (e.g., from `ngroup()`), numbered in order of first appearance.
+    :type group_ids: pandas.Series
+    :return: The joined message of each group, ordered by group number.
+    :rtype: numpy.ndarray
+    """
+	order = np.argsort(group_ids.to_numpy(), kind='stable')
+	sorted_group_ids = group_ids.to_numpy()[order]
+	is_group_start = np.r_[True, sorted_group_ids[1:] != sorted_group_ids[:-1]]
+	is_group_end = np.r_[is_group_start[1:], True]
+
+	sorted_messages = messages.to_numpy(dtype=object)[order]
+	sorted_messages = np.where(is_group_end, sorted_messages, sorted_messages + ' ')
+	return np.add.reduceat(sorted_messages, np.flatnonzero(is_group_start))
 
-    This function compares the current speaker with the previous one to identify when a change in speaker occurs, 
-    and then assigns a unique 'turn_id' that increments whenever the speaker changes within the conversation.
+def get_turn_id(df, conversation_id_col, speaker_id_col):
+	"""Generate turn IDs for each conversation to identify turns taken by speakers.
 
-    :param df: The DataFrame containing chat data for a single conversation.
+    This function compares the current speaker with the previous one in the same conversation to identify when a change in speaker occurs, 
+    and then assigns a 'turn_id' that increments whenever the speaker changes within the conversation (starting from 1).
+    All conversations are handled in a single grouped shift and cumulative sum.
+
+    :param df: The DataFrame containing chat data.
     :type df: pandas.DataFrame
+	:param conversation_id_col: A string representing the column name that should be selected as the conversation ID.
+    :type conversation_id_col: str
 	:param speaker_id_col: A string representing the column name that should be selected as the speaker ID.
     :type speaker_id_col: str
     :return: A Series containing the turn IDs.
     :rtype: pandas.Series
     """
-	df[f"{speaker_id_col}_x"] = df[speaker_id_col].shift()
-	return (df[speaker_id_col] != df[f"{speaker_id_col}_x"]).cumsum()
+	previous_speaker = df.groupby(conversation_id_col, sort=False)[speaker_id_col].shift()
+	return (df[speaker_id_col] != previous_speaker).groupby(df[conversation_id_col], sort=False).cumsum()
 	
-def compress(turn_df, message_col):
-	"""Combine messages in the same turn into a single message.
-
-    This function takes a DataFrame representing messages in a single turn and
-    concatenates their 'message' and 'message_lower_with_punc' columns into
-    single strings if there are multiple messages in the same turn.
-
-    :param turn_df: The DataFrame containing messages in a single turn.
-    :type turn_df: pandas.DataFrame
-	:param message_col: A string representing the column name that should be selected as the message.
-    :type message_col: str
-    :return: A Series with combined messages for the turn.
-    :rtype: pandas.Series
-    """
-	result = turn_df.iloc[0]
-	if (len(turn_df) > 1):
-		result[message_col] = turn_df[message_col].str.cat(sep=' ')
-		result['message_lower_with_punc'] = turn_df['message_lower_with_punc'].str.cat(sep=' ')
-	return result
-
 def create_cumulative_rows(input_df, conversation_id, timestamp_col, grouping_keys, within_task = False):
 	"""Generate cumulative rows for chat data to analyze conversations in context.
 
     This function takes chat-level data and duplicates rows to facilitate the analysis of conversations
     in the context of preceding chats. It enables the inclusion of chats from previous stages or tasks within
-    the same conversation.
+    the same conversation. The rows of each cumulative conversation are found by `get_cumulative_row_positions`,
+    which sorts the data once rather than scanning it at every change of the low-level identifier.
 
     NOTE: This function was created in the context of a multi-stage Empirica game (see: https://github.com/Watts-Lab/multi-task-empirica).
     
@@ -209,41 +224,158 @@ def create_cumulative_rows(input_df, conversation_id, timestamp_col, grouping_ke
 	if(conversation_id == level_mid and within_task):
 		print("WARNING: Cumulative grouping with the mid-level identifier is incompatible with the `within_task` parameter. Ignoring `within_task` parameter.")
 
-	result_df = pd.DataFrame(columns=input_df.columns)
-
-	# prev stageId
-	prev_low_level_id = None
-
-	# Iterate through rows
-	for _, current_row in input_df.iterrows():
-			
-		# current stageId
-		if current_row[level_low] != prev_low_level_id: # we have transitioned to a new low-level identifier (subactivity)
-
-			prev_low_level_id = current_row[level_low]
-
-			if(conversation_id == level_low):
-				# Duplicate rows from all previous stageId's with the same high-level identifier
-				if(within_task): # ensure the mid-level identifier is the same
-					previous_rows = input_df.loc[(input_df[level_low] != current_row[level_low]) & (input_df[timestamp_col] < current_row[timestamp_col]) & (input_df[level_high] == current_row[level_high]) & (input_df[level_mid] == current_row[level_mid])].copy()
-				else:
-					previous_rows = input_df.loc[(input_df[level_low] != current_row[level_low]) & (input_df[timestamp_col] < current_row[timestamp_col]) & (input_df[level_high] == current_row[level_high])].copy()
-				if(not previous_rows.empty):
-					previous_rows['conversation_num'] = current_row[level_low]
-					result_df = pd.concat([result_df, previous_rows], ignore_index=True)
-			if(conversation_id == level_mid):
-				# Duplicate rows from all previous mid-level identifiers with the same high-level identifier
-				previous_rows = input_df.loc[(input_df[level_mid] != current_row[level_mid]) & (input_df[timestamp_col] < current_row[timestamp_col]) & (input_df[level_high] == current_row[level_high])].copy()
-				if(not previous_rows.empty):
-					previous_rows['conversation_num'] = current_row[level_mid]
-					result_df = pd.concat([result_df, previous_rows], ignore_index=True)
-
-			cur_Id_rows = input_df.loc[(input_df[conversation_id] == current_row[conversation_id])].copy()
-			cur_Id_rows['conversation_num'] = current_row[conversation_id]
-			# Concatenate the current row to the result DataFrame
-
-			result_df = (result_df.copy() if cur_Id_rows.empty else cur_Id_rows.copy() if result_df.empty
-		       else pd.concat([result_df, cur_Id_rows], ignore_index=True).drop_duplicates() # to silence FutureWarning
-		      )
+	cumulative_rows = get_cumulative_row_positions(input_df, conversation_id, timestamp_col, grouping_keys, within_task)
+
+	return expand_cumulative_rows(input_df, cumulative_rows)
+
+def preprocess_cumulative_conversation_columns(df, conversation_id, timestamp_col, grouping_keys, within_task = False):
+	"""Preprocesses conversation data for cumulative grouping, without duplicating any rows.
+
+    This function is the counterpart of `preprocess_conversation_columns` (with `cumulative_grouping`): rather than
+    copying the chats of earlier stages into every later stage, it keeps each source chat exactly once, and returns
+    the cumulative conversations as a mapping onto the source rows (see `get_cumulative_row_positions`). Features that
+    depend only on the message can then be computed once per source chat, and copied into the cumulative conversations
+    with `expand_cumulative_rows`.
+
+    :param df: The DataFrame containing conversation data.
+    :type df: pd.DataFrame
+    :param conversation_id: The ID (e.g., stage or round) used for grouping the data.
+    :type conversation_id: str
+    :param timestamp_col: The name of the column containing the timestamp
+    :type timestamp_col: str
+    :param grouping_keys: A list of three hierarchical keys, which must be passed in the order of (highest level, mid level, lowest level).
+    :type grouping_keys: list
+    :param within_task: Flag to determine whether to restrict the analysis to the same activity or "task" (assumed to be the Mid-Level Identifier), defaults to False.
+    :type within_task: bool, optional
+    :return: A tuple of (the preprocessed DataFrame, with one row per source chat; the cumulative rows, as returned by `get_cumulative_row_positions`).
+    	The cumulative rows are None if the conversation_id is the highest-level identifier, as no rows are duplicated in this case.
+    :rtype: tuple(pd.DataFrame, pd.DataFrame)
+    """
+
+	# remove all special characters from df
+	df.columns = df.columns.str.replace('[^A-Za-z0-9_]', '', regex=True)
+
+	if not set(grouping_keys).issubset(df.columns):
+		raise ValueError("One or more grouping keys does not exist in the column set.")
+
+	level_high, level_mid = grouping_keys[0], grouping_keys[1]
+
+	# If the conversation_id is the highest level ID (gameId), return as is -- no changes requred
+	if(conversation_id == level_high): return df, None
+
+	# print a warning in case user gave incompatible instructions:
+	if(conversation_id == level_mid and within_task):
+		print("WARNING: Cumulative grouping with the mid-level identifier is incompatible with the `within_task` parameter. Ignoring `within_task` parameter.")
+
+	df = df.reset_index(drop=True)
+	return df, get_cumulative_row_positions(df, conversation_id, timestamp_col, grouping_keys, within_task)
+
+def expand_cumulative_rows(input_df, cumulative_rows):
+	"""Copy the (positional) rows of a DataFrame into the cumulative conversations that contain them.
+
+    :param input_df: A DataFrame with one row per source chat.
+    :type input_df: pandas.DataFrame
+    :param cumulative_rows: The cumulative conversations, as returned by `get_cumulative_row_positions`.
+    :type cumulative_rows: pandas.DataFrame
+    :return: A DataFrame with one row per chat in each cumulative conversation, and the cumulative conversation in a 'conversation_num' column.
+    :rtype: pandas.DataFrame
+    """
+	result_df = input_df.iloc[cumulative_rows['row_position']].reset_index(drop=True)
+	result_df['conversation_num'] = cumulative_rows['conversation_num'].to_numpy()
 
 	return result_df
+
+def expand_ranges(range_starts, range_lengths):
+	"""Expand a set of ranges [start, start + length) into one flat array of positions.
+
+    :param range_starts: The first position of each range.
+    :type range_starts: numpy.ndarray
+    :param range_lengths: The number of positions in each range.
+    :type range_lengths: numpy.ndarray
+    :return: A tuple of (the range that each position belongs to, the positions themselves).
+    :rtype: tuple(numpy.ndarray, numpy.ndarray)
+    """
+	range_ids = np.repeat(np.arange(len(range_starts)), range_lengths)
+	offsets_within_range = np.arange(range_lengths.sum()) - np.repeat(np.cumsum(range_lengths) - range_lengths, range_lengths)
+	return range_ids, range_starts[range_ids] + offsets_within_range
+
+def get_cumulative_row_positions(input_df, conversation_id, timestamp_col, grouping_keys, within_task = False):
+	"""Map each cumulative conversation onto the (positional) rows of the chat data that it contains.
+
+    This function computes the same cumulative conversations as `create_cumulative_rows`, but returns them as a
+    "view": a pair of columns naming the cumulative conversation and the position (in `input_df`) of each row that
+    belongs to it, so that rows shared by several cumulative conversations do not need to be copied.
+
+    Every time the low-level identifier changes, a cumulative conversation (named by the `conversation_id` of that row)
+    gains all earlier rows (by timestamp) with the same high-level identifier (and the same mid-level identifier, if 
+    `within_task`) but a different `conversation_id`, followed by all rows with its own `conversation_id`.
+    Rather than scanning the whole dataframe at each change, the rows are sorted once by (high-level group, timestamp),
+    so that the earlier rows of a group always form a prefix of that group, found with a binary search.
+
+    :param input_df: The DataFrame containing chat data.
+    :type input_df: pandas.DataFrame
+    :param conversation_id: The ID (e.g., stage or round) used for grouping the data; either the mid- or low-level identifier.
+    :type conversation_id: str
+    :param timestamp_col: The column containing the timestamp.
+    :type timestamp_col: str
+    :param grouping_keys: A list of three hierarchical keys, which must be passed in the order of (highest level, mid level, lowest level).
+    :type grouping_keys: list
+    :param within_task: Flag to determine whether to restrict the analysis to the same activity or "task" (assumed to be the Mid-Level Identifier), defaults to False.
+    :type within_task: bool, optional
+    :return: A DataFrame with a 'conversation_num' column (the cumulative conversation) and a 'row_position' column (the position of the row in `input_df`), in output order.
+    :rtype: pandas.DataFrame
+    """
+	level_high, level_mid, level_low = grouping_keys[0], grouping_keys[1], grouping_keys[2]
+	scope_keys = [level_high, level_mid] if (conversation_id == level_low and within_task) else [level_high]
+
+	num_rows = len(input_df)
+	scope_codes = input_df.groupby(scope_keys, sort=False, dropna=False).ngroup().to_numpy()
+	conversation_codes, _ = pd.factorize(input_df[conversation_id], use_na_sentinel=False)
+	conversation_values = input_df[conversation_id].to_numpy()
+
+	# rank the timestamps; missing timestamps are never earlier than anything
+	timestamp_ranks, timestamp_uniques = pd.factorize(input_df[timestamp_col], sort=True)
+	has_timestamp = timestamp_ranks >= 0
+	timestamp_ranks = np.where(has_timestamp, timestamp_ranks, len(timestamp_uniques))
+
+	# a new cumulative conversation starts wherever the low-level identifier changes
+	low_level_values = input_df[level_low].to_numpy()
+	starts = np.flatnonzero(np.r_[True, low_level_values[1:] != low_level_values[:-1]]) if num_rows else np.array([], dtype=int)
+
+	# sort once by (scope, timestamp); the rows in a scope before a given time are then a prefix of that scope
+	sort_keys = scope_codes.astype(np.int64) * (len(timestamp_uniques) + 1) + timestamp_ranks
+	rows_by_time = np.argsort(sort_keys, kind='stable')
+	sorted_keys = sort_keys[rows_by_time]
+	start_scope_keys = scope_codes[starts].astype(np.int64) * (len(timestamp_uniques) + 1)
+	prefix_starts = np.searchsorted(sorted_keys, start_scope_keys, side='left')
+	prefix_ends = np.searchsorted(sorted_keys, start_scope_keys + timestamp_ranks[starts], side='left')
+	prefix_ends = np.where(has_timestamp[starts], prefix_ends, prefix_starts)
+
+	# previous rows: earlier rows in the same scope that belong to a different conversation, in their original order
+	previous_block, previous_sorted_positions = expand_ranges(prefix_starts, prefix_ends - prefix_starts)
+	previous_rows = rows_by_time[previous_sorted_positions]
+	is_other_conversation = conversation_codes[previous_rows] != conversation_codes[starts][previous_block]
+	previous_block, previous_rows = previous_block[is_other_conversation], previous_rows[is_other_conversation]
+
+	# current rows: all rows with the same conversation identifier as the row that started the block
+	rows_by_conversation = np.argsort(conversation_codes, kind='stable')
+	conversation_offsets = np.concatenate([[0], np.cumsum(np.bincount(conversation_codes, minlength=conversation_codes.max() + 1 if num_rows else 0))])
+	current_block, current_sorted_positions = expand_ranges(conversation_offsets[conversation_codes[starts]], np.diff(conversation_offsets)[conversation_codes[starts]])
+	current_rows = rows_by_conversation[current_sorted_positions]
+
+	# each block lists its previous rows, then its current rows
+	blocks = np.concatenate([previous_block, current_block])
+	is_current = np.concatenate([np.zeros(len(previous_block), dtype=bool), np.ones(len(current_block), dtype=bool)])
+	rows = np.concatenate([previous_rows, current_rows])
+	output_order = np.lexsort((rows, is_current, blocks))
+	blocks, rows = blocks[output_order], rows[output_order]
+
+	# a row is only included once in each cumulative conversation (the first time it appears)
+	block_conversation_codes = conversation_codes[starts][blocks]
+	_, first_appearances = np.unique(block_conversation_codes.astype(np.int64) * num_rows + rows, return_index=True)
+	first_appearances = np.sort(first_appearances)
+
+	return pd.DataFrame({
+		'conversation_num': conversation_values[starts][blocks[first_appearances]],
+		'row_position': rows[first_appearances]
+	})
@@ -0,0 +1,138 @@
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import pandas as pd
+
+class FeatureProfiler:
+    """
+    Records how long each step of a featurization run takes, and how much memory it uses.
+
+    The FeatureBuilder and the chat-, user-, and conversation-level calculators profile each of their steps (e.g., each
+    feature method) with `profile`, which records its wall time, CPU time, the number of chat rows that it processed, and
+    its peak memory: the highest amount of memory allocated by Python (as traced by `tracemalloc`) while the step ran,
+    beyond what was allocated when it started. Memory allocated outside of Python's allocators (e.g., by PyTorch) is not
+    traced.
+
+    Each step is also tagged with the current context (see `set_context`), such as the percentage of each conversation
+    that the user- and conversation-level features were generated for, so that steps that run more than once can be told
+    apart in the report.
+
+    A disabled profiler records nothing, so the calculators can always profile their steps.
+
+    :param enabled: Whether to record the steps. Tracing memory slows Python down, so this defaults to False.
+    :type enabled: bool, optional
+    """
+    report_columns = ["level", "step", "wall_time", "cpu_time", "rows", "peak_memory"]
+
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self.records = []
+        self.contexts = [] # the context of each record
+        self.context = {}
+        self.started_tracing = False
+
+    def set_context(self, **context) -> None:
+        """
+        Set the context with which the steps that follow are tagged (e.g., `set_context(percentage = 0.5)`); a value of None
+        removes that part of the context.
+
+        :return: None
+        :rtype: None
+        """
+        self.context = {key: value for key, value in {**self.context, **context}.items() if value is not None}
+
+    def start(self) -> None:
+        """
+        Start tracing memory allocations, unless they are already being traced (e.g., by an enclosing profiler).
+
+        :return: None
+        :rtype: None
+        """
+        if self.enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+
+    def stop(self) -> None:
+        """
+        Stop tracing memory allocations, if this profiler started tracing them.
+
+        :return: None
+        :rtype: None
+        """
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    @contextmanager
+    def profile(self, level: str, step: str, rows: int = None):
+        """
+        Profile a step of the featurization run, which is run inside of the `with` block.
+
+        Steps should not be nested, as the peak memory of the enclosing step would be reset by the nested one. If the step
+        raises an error, it is still recorded, and tracing is stopped, as the error ends the featurization run.
+
+        :param level: The level of the step: "preprocessing", "embeddings", "chat", "user", "conversation", or "output".
+        :type level: str
+        :param step: The name of the step (e.g., the name of a feature method).
+        :type step: str
+        :param rows: The number of chat rows that the step processes. Defaults to None.
+        :type rows: int, optional
+        :return: A context manager that records the step once its block is done.
+        :rtype: contextmanager
+        """
+        if not self.enabled:
+            yield
+            return
+
+        self.start()
+        start_memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        start_wall_time = time.perf_counter()
+        start_cpu_time = time.process_time()
+        failed = True
+        try:
+            yield
+            failed = False
+        finally:
+            wall_time = time.perf_counter() - start_wall_time
+            cpu_time = time.process_time() - start_cpu_time
+            _, peak_memory = tracemalloc.get_traced_memory()
+            self.record(level, step, wall_time, cpu_time, rows, max(peak_memory - start_memory, 0))
+            if failed:
+                self.stop()
+
+    def record(self, level: str, step: str, wall_time: float, cpu_time: float = None, rows: int = None, peak_memory: int = None) -> None:
+        """
+        Record a step that was timed elsewhere (e.g., loading a model when its module is imported).
+
+        :param level: The level of the step (see `profile`).
+        :type level: str
+        :param step: The name of the step.
+        :type step: str
+        :param wall_time: The wall time of the step, in seconds.
+        :type wall_time: float
+        :param cpu_time: The CPU time of the step, in seconds. Defaults to None.
+        :type cpu_time: float, optional
+        :param rows: The number of chat rows that the step processed. Defaults to None.
+        :type rows: int, optional
+        :param peak_memory: The peak memory of the step, in bytes. Defaults to None.
+        :type peak_memory: int, optional
+        :return: None
+        :rtype: None
+        """
+        if self.enabled:
+            self.records.append((level, step, wall_time, cpu_time, rows, peak_memory))
+            self.contexts.append(self.context)
+
+    def get_report(self) -> pd.DataFrame:
+        """
+        Get the recorded steps, in the order in which they ran.
+
+        :return: One row per step, with its context (one column per key, which is empty for the steps that ran outside of
+            that context), level, name, wall time and CPU time (in seconds), number of chat rows, and peak memory (in bytes).
+        :rtype: pd.DataFrame
+        """
+        report = pd.DataFrame(self.records, columns=self.report_columns).astype({"rows": "Int64", "peak_memory": "Int64"})
+        contexts = pd.DataFrame(self.contexts, index=report.index)
+        return pd.concat([contexts, report], axis=1)
@@ -72,8 +72,8 @@ def get_average(input_data, column_to_summarize, new_column_name, conversation_i
     :return: A DataFrame with the conversation number and the average of the specified column.
     :rtype: pandas.DataFrame
     """
-    input_data[new_column_name] = input_data.groupby([conversation_id_col], sort=False)[column_to_summarize].transform(lambda x: np.mean(x))
-    return(input_data[[conversation_id_col, new_column_name]].drop_duplicates())
+    summary = input_data.groupby([conversation_id_col], sort=False)[column_to_summarize].transform(lambda x: np.mean(x))
+    return(input_data[[conversation_id_col]].assign(**{new_column_name: summary}).drop_duplicates())
 
 def get_max(input_data, column_to_summarize, new_column_name, conversation_id_col):
     """Generate a summary DataFrame with the maximum value of a specified column per conversation.
@@ -92,8 +92,8 @@ def get_max(input_data, column_to_summarize, new_column_name, conversation_id_co
     :return: A DataFrame with the conversation number and the maximum value of the specified column.
     :rtype: pandas.DataFrame
     """
-    input_data[new_column_name] = input_data.groupby([conversation_id_col], sort=False)[column_to_summarize].transform("max")
-    return(input_data[[conversation_id_col, new_column_name]].drop_duplicates())
+    summary = input_data.groupby([conversation_id_col], sort=False)[column_to_summarize].transform("max")
+    return(input_data[[conversation_id_col]].assign(**{new_column_name: summary}).drop_duplicates())
 
 def get_min(input_data, column_to_summarize, new_column_name, conversation_id_col):
     """Generate a summary DataFrame with the minimum value of a specified column per conversation.
@@ -112,8 +112,8 @@ def get_min(input_data, column_to_summarize, new_column_name, conversation_id_co
     :return: A DataFrame with the conversation number and the minimum value of the specified column.
     :rtype: pandas.DataFrame
     """
-    input_data[new_column_name] = input_data.groupby([conversation_id_col], sort=False)[column_to_summarize].transform("min")
-    return(input_data[[conversation_id_col, new_column_name]].drop_duplicates())
+    summary = input_data.groupby([conversation_id_col], sort=False)[column_to_summarize].transform("min")
+    return(input_data[[conversation_id_col]].assign(**{new_column_name: summary}).drop_duplicates())
 
 def get_stdev(input_data, column_to_summarize, new_column_name, conversation_id_col):
     """Generate a summary DataFrame with the standard deviation of a specified column per conversation.
@@ -132,8 +132,8 @@ def get_stdev(input_data, column_to_summarize, new_column_name, conversation_id_
     :return: A DataFrame with the conversation number and the standard deviation of the specified column.
     :rtype: pandas.DataFrame
     """
-    input_data[new_column_name] = input_data.groupby([conversation_id_col], sort=False)[column_to_summarize].transform(lambda x: np.std(x))
-    return(input_data[[conversation_id_col, new_column_name]].drop_duplicates())
+    summary = input_data.groupby([conversation_id_col], sort=False)[column_to_summarize].transform(lambda x: np.std(x))
+    return(input_data[[conversation_id_col]].assign(**{new_column_name: summary}).drop_duplicates())
 
 def get_sum(input_data, column_to_summarize, new_column_name, conversation_id_col):
     """Generate a summary DataFrame with the sum of a specified column per conversation.
@@ -152,6 +152,6 @@ def get_sum(input_data, column_to_summarize, new_column_name, conversation_id_co
     :return: A DataFrame with the conversation number and the sum of the specified column.
     :rtype: pandas.DataFrame
     """
-    input_data[new_column_name] = input_data.groupby([conversation_id_col], sort=False)[column_to_summarize].transform(lambda x: np.sum(x))
-    return(input_data[[conversation_id_col, new_column_name]].drop_duplicates())
+    summary = input_data.groupby([conversation_id_col], sort=False)[column_to_summarize].transform(lambda x: np.sum(x))
+    return(input_data[[conversation_id_col]].assign(**{new_column_name: summary}).drop_duplicates())
 
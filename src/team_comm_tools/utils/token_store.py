@@ -0,0 +1,147 @@
+import re
+import pandas as pd
+from nltk.tokenize import sent_tokenize, word_tokenize
+
+def split_words(text):
+    """
+    Split a message into words at whitespace.
+
+    :param text: The message.
+    :type text: str
+    :return: The words of the message.
+    :rtype: list
+    """
+    return text.split()
+
+def split_alphanumeric_words(text):
+    """
+    Remove every character other than letters, digits, and spaces from a message, and split the remainder into words.
+
+    :param text: The message.
+    :type text: str
+    :return: The alphanumeric words of the message.
+    :rtype: list
+    """
+    return re.sub(r"[^a-zA-Z0-9 ]+", '', text).split()
+
+def split_sentence_first_words(text):
+    """
+    Get the first word (as split by NLTK's word tokenizer) of each sentence of a message.
+
+    :param text: The message.
+    :type text: str
+    :return: The first word of each sentence, in the order of the sentences (an empty string for a sentence without words).
+    :rtype: list
+    """
+    first_words = []
+    for sentence in sent_tokenize(text):
+        words = word_tokenize(sentence)
+        first_words.append(words[0] if words else "")
+    return first_words
+
+class TokenStore:
+    """
+    Tokenizes the messages of a featurization run once, and shares the tokens among all features that need them.
+
+    Features such as the word count, type-token ratio, function/content words, Dale-Chall score, number of questions, and
+    number of all-caps words all split the same messages into words (or sentences). Rather than having each feature
+    tokenize every message again, the ChatLevelFeaturesCalculator holds a single TokenStore, which tokenizes each distinct
+    message the first time that a feature asks for its tokens, and returns the stored tokens afterwards.
+
+    Tokens are stored by message, so messages that are identical across text columns share their tokens. (The text-pure
+    feature methods already run on the distinct messages only; features that run on every row, such as word mimicry, also
+    skip repeated messages.) The calculator clears each kind of tokens once no remaining feature method uses it.
+    """
+    tokenizers = {
+        "words": split_words,
+        "alphanumeric_words": split_alphanumeric_words,
+        "sentences": sent_tokenize,
+        "sentence_first_words": split_sentence_first_words
+    }
+
+    def __init__(self) -> None:
+        self.tokens = {tokenization: {} for tokenization in self.tokenizers}
+
+    def get_tokens(self, messages: pd.Series, tokenization: str) -> list:
+        """
+        Get the tokens of every message in a column, tokenizing the messages that have not been tokenized before.
+
+        :param messages: The text column.
+        :type messages: pd.Series
+        :param tokenization: The kind of tokens: "words" (split at whitespace), "alphanumeric_words" (punctuation removed,
+            then split at whitespace), "sentences" (NLTK's sentence tokenizer), or "sentence_first_words" (the first
+            word of each sentence).
+        :type tokenization: str
+        :raises ValueError: If the kind of tokens is not supported.
+        :return: The tokens of each message, in the order of the rows.
+        :rtype: list
+        """
+        if tokenization not in self.tokenizers:
+            raise ValueError("Unsupported tokenization: " + str(tokenization) + ". Please use one of: " + ", ".join(self.tokenizers) + ".")
+        stored_tokens = self.tokens[tokenization]
+        tokenizer = self.tokenizers[tokenization]
+
+        # tokenize each distinct message once, and look up the tokens of every row by its message code
+        message_codes, unique_messages = pd.factorize(messages, use_na_sentinel=False)
+        for message in unique_messages:
+            if message not in stored_tokens:
+                stored_tokens[message] = tokenizer(message)
+        unique_tokens = [stored_tokens[message] for message in unique_messages]
+        return [unique_tokens[code] for code in message_codes]
+
+    def clear(self, tokenizations: list) -> None:
+        """
+        Free the stored tokens of one or more kinds.
+
+        :param tokenizations: The kinds of tokens to free (see `get_tokens`).
+        :type tokenizations: list
+        :return: None
+        :rtype: None
+        """
+        for tokenization in tokenizations:
+            self.tokens[tokenization] = {}
+
+    def get_words(self, messages: pd.Series) -> list:
+        """
+        Get the words (split at whitespace) of every message in a column.
+
+        :param messages: The text column.
+        :type messages: pd.Series
+        :return: The words of each message.
+        :rtype: list
+        """
+        return self.get_tokens(messages, "words")
+
+    def get_alphanumeric_words(self, messages: pd.Series) -> list:
+        """
+        Get the alphanumeric words (punctuation removed, then split at whitespace) of every message in a column.
+
+        :param messages: The text column.
+        :type messages: pd.Series
+        :return: The alphanumeric words of each message.
+        :rtype: list
+        """
+        return self.get_tokens(messages, "alphanumeric_words")
+
+    def get_sentences(self, messages: pd.Series) -> list:
+        """
+        Get the sentences of every message in a column.
+
+        :param messages: The text column.
+        :type messages: pd.Series
+        :return: The sentences of each message.
+        :rtype: list
+        """
+        return self.get_tokens(messages, "sentences")
+
+    def get_sentence_first_words(self, messages: pd.Series) -> list:
+        """
+        Get the first word of each sentence of every message in a column.
+
+        :param messages: The text column.
+        :type messages: pd.Series
+        :return: The first words of the sentences of each message, in the same order as `get_sentences`.
+        :rtype: list
+        """
+        return self.get_tokens(messages, "sentence_first_words")
+
@@ -2,20 +2,107 @@ import numpy as np
 import pandas as pd
 import scipy.stats as stats
 
-def get_zscore_across_all_chats(chats_data, on_column):
+class RunningMeanVariance:
+  """Accumulate the mean and (population) variance of a numeric column, without holding all of its values in memory.
+
+  Values are added in batches with `update`, using Welford's online algorithm: the mean and the sum of squared
+  deviations (M2) of each batch are computed, and then combined with the running totals using the pairwise update
+  of Chan et al. (1979). Accumulators built over separate shards, processes or streaming chunks can be combined
+  in the same way with `merge`, which gives the same result as accumulating all of the values in one place.
+
+  As in `stats.zscore`, a single missing value makes the statistics (and hence the z-scores) undefined.
+  """
+  def __init__(self):
+    self.count = 0
+    self.mean = 0.0
+    self.m2 = 0.0
+    self.has_nan = False
+
+  def combine(self, count, mean, m2):
+    """Combine the running totals with the count, mean and M2 of another set of values.
+
+    :param count: The number of values in the other set.
+    :type count: int
+    :param mean: The mean of the other set.
+    :type mean: float
+    :param m2: The sum of squared deviations from the mean of the other set.
+    :type m2: float
+    :return: None
+    :rtype: None
+    """
+    if count == 0:
+      return
+    total_count = self.count + count
+    delta = mean - self.mean
+    self.mean += delta * count / total_count
+    self.m2 += m2 + delta ** 2 * self.count * count / total_count
+    self.count = total_count
+
+  def update(self, values):
+    """Add a batch of values to the accumulator.
+
+    :param values: The values to add (e.g., one chunk of a column).
+    :type values: pandas.Series or numpy.ndarray
+    :return: The accumulator, so that calls can be chained.
+    :rtype: RunningMeanVariance
+    """
+    values = np.asarray(values, dtype=float)
+    is_nan = np.isnan(values)
+    self.has_nan = self.has_nan or bool(is_nan.any())
+    values = values[~is_nan]
+    if len(values) > 0:
+      batch_mean = values.mean()
+      self.combine(len(values), batch_mean, ((values - batch_mean) ** 2).sum())
+    return self
+
+  def merge(self, other):
+    """Merge another accumulator (e.g., from another shard of the data) into this one.
+
+    :param other: The accumulator to merge into this one.
+    :type other: RunningMeanVariance
+    :return: The accumulator, so that calls can be chained.
+    :rtype: RunningMeanVariance
+    """
+    self.has_nan = self.has_nan or other.has_nan
+    self.combine(other.count, other.mean, other.m2)
+    return self
+
+  def get_statistics(self):
+    """Get the mean and population standard deviation of all values added so far.
+
+    :return: A tuple of (mean, standard deviation), which can be passed to `get_zscore_across_all_chats`; both are NaN if there are no values, or if any value is missing.
+    :rtype: tuple
+    """
+    if self.count == 0 or self.has_nan:
+      return (np.nan, np.nan)
+    return (self.mean, np.sqrt(self.m2 / self.count))
+
+def get_zscore_across_all_chats(chats_data, on_column, statistics = None):
   """Calculate the z-score of a specified column for each chat message across the entire dataset.
 
   This function computes the z-score for the values in the specified numeric column, comparing 
   each value to the mean and standard deviation of that column across all chat messages in the dataset.
 
+  If the dataset is processed in chunks (so that `chats_data` holds only part of it), the mean and standard deviation
+  of the entire dataset can be passed in as `statistics`, and are used instead of those of `chats_data`.
+
   :param chats_data: The DataFrame containing chat data, where each row represents one message.
   :type chats_data: pandas.DataFrame
   :param on_column: The name of the numeric column on which the z-score is to be calculated.
   :type on_column: str
+  :param statistics: A tuple of (mean, population standard deviation) of the column across the entire dataset (see `RunningMeanVariance`).
+    Defaults to None, in which case they are computed from `chats_data`.
+  :type statistics: tuple, optional
   :return: A Series containing the z-scores for each message in the specified column.
   :rtype: pandas.Series
   """
-  return(stats.zscore(chats_data[on_column]))
+  if statistics is None:
+    return(stats.zscore(chats_data[on_column]))
+
+  mean, standard_deviation = statistics
+  if standard_deviation == 0: # as in stats.zscore, a constant column has no z-score
+    return chats_data[on_column] * np.nan
+  return (chats_data[on_column] - mean) / standard_deviation
 
 def get_zscore_across_all_conversations(chats_data, on_column, conversation_id_col):
   """Calculate the z-score of a specified column for each chat message within each conversation.
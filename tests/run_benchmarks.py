@@ -0,0 +1,376 @@
+"""
+file: run_benchmarks.py
+---
+This file benchmarks the feature builder on synthetic conversations (see synthetic_conversations.py), at increasing
+numbers of messages. It times each feature in the feature dictionary individually, as well as the full pipeline
+(FeatureBuilder.featurize()), and reports the rows per second, the peak memory, and how each benchmark scales with the
+number of messages (the exponent b of a fit of time ~ messages^b; 1 is linear).
+
+Each measurement runs in a fresh process, so that caches and memory from one measurement do not affect the next. The
+SBERT vectors and RoBERTa sentiments of each dataset are generated once (the "embeddings" benchmark) and cached in the
+vector directory; the other benchmarks read them from the cache.
+
+The results are saved as JSON, and can be used as the baseline of a later run: regressions beyond the tolerance are
+reported, and the script then exits with status 1.
+
+Examples:
+	python3 run_benchmarks.py --sizes 1000 10000 --output benchmark_results.json
+	python3 run_benchmarks.py --sizes 1000 10000 --baseline benchmark_results.json --output new_results.json
+	python3 run_benchmarks.py --stub-models --mode featurize
+
+The benchmarks run offline: with --offline, the RoBERTa and SBERT models are loaded from the local Hugging Face cache
+only; with --stub-models, they are replaced by a fast, deterministic stub (so the "embeddings" benchmark and the
+RoBERTa/SBERT-based features measure the pipeline around the models, rather than the models themselves). The NLTK and
+spaCy resources must be installed locally.
+
+Named Entity Recognition is fine-tuned on our NER training data (data/cleaned_data/train_named_entity.csv, or the file
+given with --ner-training). The fine-tuned model is cached in the vector directory, and is trained before the NER benchmark
+is timed, so the benchmark measures recognizing the entities rather than training the model.
+
+Baselines depend on the machine, so compare against a baseline that was run on the same machine, with the same settings:
+	python3 run_benchmarks.py --stub-models --sizes 1000 10000 --output benchmark_baseline.json
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from synthetic_conversations import generate_conversations, timestamp_columns
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+
+class StubSentenceTransformer:
+	"""
+	Stands in for the SBERT model: encodes each text as a deterministic pseudo-random unit vector.
+	"""
+	def __init__(self, *args, **kwargs):
+		pass
+
+	def encode(self, texts, *args, **kwargs):
+		vectors = np.array([np.random.default_rng(int(hashlib.sha1(str(text).encode("utf-8")).hexdigest()[:15], 16)).standard_normal(384) for text in texts])
+		return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+class StubLogits:
+	"""
+	Stands in for the logits tensor of the RoBERTa model.
+	"""
+	def __init__(self, logits):
+		self.logits = logits
+
+	def detach(self):
+		return self
+
+	def numpy(self):
+		return self.logits
+
+class StubSentimentTokenizer:
+	"""
+	Stands in for the RoBERTa tokenizer: passes the texts on to the stub model.
+	"""
+	def __call__(self, texts, *args, **kwargs):
+		return {"texts": texts}
+
+class StubSentimentModel:
+	"""
+	Stands in for the RoBERTa model: scores each text with deterministic pseudo-random (negative, neutral, positive) logits.
+	"""
+	def __call__(self, texts):
+		logits = np.array([np.frombuffer(hashlib.sha1(text.encode("utf-8")).digest()[:3], dtype=np.uint8) / 64.0 for text in texts])
+		return (StubLogits(logits),)
+
+def use_stub_models():
+	"""
+	Replace the SBERT and RoBERTa models with stubs. This must be called before team_comm_tools is imported, as the models
+	are loaded when the package is imported.
+	"""
+	import sentence_transformers
+	import transformers
+	sentence_transformers.SentenceTransformer = StubSentenceTransformer
+	transformers.AutoTokenizer.from_pretrained = lambda *args, **kwargs: StubSentimentTokenizer()
+	transformers.AutoModelForSequenceClassification.from_pretrained = lambda *args, **kwargs: StubSentimentModel()
+
+def get_rss():
+	"""
+	Get the current resident set size of this process, in bytes (or its peak, where the current size is not available).
+	"""
+	try:
+		with open("/proc/self/statm") as statm:
+			return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+	except (OSError, ValueError):
+		peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+		return peak_rss if sys.platform == "darwin" else peak_rss * 1024 # kilobytes on Linux, bytes on macOS
+
+class PeakMemorySampler:
+	"""
+	Samples the resident set size of this process in a background thread, to find its peak while a benchmark runs.
+
+	Unlike tracing allocations (e.g., with tracemalloc), sampling does not slow the benchmark down, and it also captures
+	memory allocated outside of Python (e.g., by PyTorch); it may miss short spikes between samples.
+	"""
+	def __init__(self, interval=0.01):
+		self.interval = interval
+		self.start_rss = None
+		self.peak_rss = None
+		self.stopped = threading.Event()
+		self.thread = threading.Thread(target=self.sample, daemon=True)
+
+	def sample(self):
+		while not self.stopped.wait(self.interval):
+			self.peak_rss = max(self.peak_rss, get_rss())
+
+	def __enter__(self):
+		self.start_rss = self.peak_rss = get_rss()
+		self.thread.start()
+		return self
+
+	def __exit__(self, *exc_info):
+		self.stopped.set()
+		self.thread.join()
+		self.peak_rss = max(self.peak_rss, get_rss())
+
+def get_chat_data(num_messages, settings):
+	"""
+	Generate the synthetic conversations of a benchmark.
+	"""
+	return generate_conversations(
+		num_messages,
+		num_conversations = max(1, num_messages // settings["messages_per_conversation"]),
+		speakers_per_conversation = tuple(settings["speakers_per_conversation"]),
+		words_per_message = tuple(settings["words_per_message"]),
+		timestamp_style = settings["timestamp_style"],
+		repeated_message_rate = settings["repeated_message_rate"],
+		seed = settings["seed"]
+	)
+
+def get_feature_builder(chat_data, settings, custom_features, regenerate_vectors = False):
+	"""
+	Preprocess the synthetic conversations of a benchmark (and generate or load their embeddings) with a FeatureBuilder.
+	"""
+	from team_comm_tools import FeatureBuilder
+
+	# the embeddings of each dataset are cached under its own name, so that every benchmark of the dataset reuses them
+	dataset_name = "synthetic_" + str(len(chat_data)) + "_seed" + str(settings["seed"]) + ("_stub" if settings["stub_models"] else "")
+	return FeatureBuilder(
+		input_df = chat_data,
+		vector_directory = settings["vector_directory"],
+		output_file_base = dataset_name,
+		output_writer = None,
+		timestamp_col = timestamp_columns[settings["timestamp_style"]],
+		custom_features = custom_features,
+		regenerate_vectors = regenerate_vectors,
+		ner_training_df = pd.read_csv(settings["ner_training"])
+	)
+
+def run_benchmark(benchmark, num_messages, settings):
+	"""
+	Run a single benchmark, and measure its time and peak memory (this runs in a fresh process).
+
+	The benchmark is either "embeddings" (generating the SBERT vectors and RoBERTa sentiments), "featurize" (the full
+	pipeline, including preprocessing), or the name of a feature in the feature dictionary. A feature is timed on its own:
+	the features that it depends on (for a conversation-level feature, all chat- and user-level features) are computed first.
+	"""
+	if settings["offline"]:
+		os.environ["HF_HUB_OFFLINE"] = "1"
+		os.environ["TRANSFORMERS_OFFLINE"] = "1"
+	if settings["stub_models"]:
+		use_stub_models()
+	from team_comm_tools.feature_dict import feature_dict
+	vector_features = [feature for feature in feature_dict if feature_dict[feature]["vect_data"]]
+
+	chat_data = get_chat_data(num_messages, settings)
+	if benchmark in ["embeddings", "featurize"]:
+		# both include preprocessing; "embeddings" generates the embeddings of every message, while "featurize" reads them from the cache
+		start_time = time.perf_counter()
+		with PeakMemorySampler() as memory:
+			feature_builder = get_feature_builder(chat_data, settings, vector_features, regenerate_vectors = benchmark == "embeddings")
+			if benchmark == "featurize":
+				feature_builder.featurize()
+		seconds = time.perf_counter() - start_time
+	else:
+		feature = feature_dict[benchmark]
+		feature_builder = get_feature_builder(chat_data, settings, [benchmark] if feature["vect_data"] else [])
+		if benchmark == "Named Entity Recognition":
+			# fine-tune (or load) the model first, so that only recognizing the entities is timed
+			from team_comm_tools.features.named_entity_recognition_features import get_ner_model
+			get_ner_model(feature_builder.ner_training, feature_builder.ner_model_directory)
+		if feature["level"] == "Chat":
+			feature_builder.feature_methods_chat = [method for method in feature["dependencies"] if method != feature["function"]]
+			feature_builder.chat_level_features()
+			feature_builder.feature_methods_chat = [feature["function"]]
+			start_time = time.perf_counter()
+			with PeakMemorySampler() as memory:
+				feature_builder.chat_level_features()
+			seconds = time.perf_counter() - start_time
+		else:
+			feature_builder.chat_level_features()
+			feature_builder.user_data = feature_builder.chat_data[[feature_builder.conversation_id_col, feature_builder.speaker_id_col]].drop_duplicates()
+			feature_builder.set_self_conv_data()
+			feature_builder.user_level_features()
+			feature_builder.feature_methods_conv = [feature["function"]]
+			start_time = time.perf_counter()
+			with PeakMemorySampler() as memory:
+				feature_builder.conv_level_features()
+			seconds = time.perf_counter() - start_time
+
+	return {
+		"benchmark": benchmark,
+		"messages": num_messages,
+		"seconds": seconds,
+		"rows_per_second": num_messages / seconds if seconds > 0 else float("inf"),
+		"peak_memory": memory.peak_rss - memory.start_rss,
+		"peak_rss": memory.peak_rss
+	}
+
+def list_features(settings):
+	"""
+	List the features in the feature dictionary.
+	"""
+	if settings["stub_models"]:
+		use_stub_models()
+	from team_comm_tools.feature_dict import feature_dict
+	return list(feature_dict)
+
+def run_in_fresh_process(function, *args):
+	"""
+	Run a function in a new process; returns its result, or None (after printing the error) if it failed.
+	"""
+	with multiprocessing.get_context("spawn").Pool(1) as pool:
+		try:
+			return pool.apply(function, args)
+		except Exception as error:
+			print("ERROR: `" + function.__name__ + str(args[:2]) + "` failed: " + repr(error))
+			return None
+
+def get_scaling_exponents(results):
+	"""
+	Fit time ~ messages^b for each benchmark that ran at two or more sizes, and return the exponent b of each.
+	"""
+	exponents = {}
+	for benchmark, benchmark_results in results.groupby("benchmark"):
+		benchmark_results = benchmark_results[benchmark_results["seconds"] > 0]
+		if benchmark_results["messages"].nunique() >= 2:
+			exponents[benchmark] = float(np.polyfit(np.log(benchmark_results["messages"]), np.log(benchmark_results["seconds"]), 1)[0])
+	return exponents
+
+def compare_to_baseline(results, baseline, tolerance):
+	"""
+	Compare the results to those of a baseline run, and return the regressions: the benchmarks (at each size) whose rows
+	per second dropped, or whose peak memory grew, by more than the tolerance (a fraction).
+	"""
+	# the datasets (and models) must match; where the embeddings are cached does not matter
+	dataset_settings = [setting for setting in results["settings"] if setting not in ["vector_directory", "offline"]]
+	if any(baseline["settings"].get(setting) != results["settings"][setting] for setting in dataset_settings):
+		print("WARNING: The baseline was run on different synthetic data (or models); its results may not be comparable.")
+	baseline_results = pd.DataFrame(baseline["results"]).set_index(["benchmark", "messages"])
+	regressions = []
+	for result in results["results"]:
+		key = (result["benchmark"], result["messages"])
+		if key not in baseline_results.index:
+			continue
+		baseline_result = baseline_results.loc[key]
+		speed_ratio = result["rows_per_second"] / baseline_result["rows_per_second"]
+		if speed_ratio < 1 - tolerance:
+			regressions.append(f"{key[0]} ({key[1]} messages): {speed_ratio:.2f}x the rows per second of the baseline")
+		# ignore small absolute changes in memory, which are mostly noise
+		if result["peak_memory"] > (1 + tolerance) * baseline_result["peak_memory"] + 32 * 1024 ** 2:
+			regressions.append(f"{key[0]} ({key[1]} messages): peak memory grew from {baseline_result['peak_memory'] / 1024 ** 2:.0f} MB to {result['peak_memory'] / 1024 ** 2:.0f} MB")
+	return regressions
+
+def parse_args():
+	parser = argparse.ArgumentParser(description = "Benchmark the feature builder on synthetic conversations.")
+	parser.add_argument("--sizes", type = int, nargs = "+", default = DEFAULT_SIZES, help = "The numbers of messages to benchmark.")
+	parser.add_argument("--mode", choices = ["features", "featurize", "all"], default = "all", help = "Benchmark each feature, the full pipeline, or both.")
+	parser.add_argument("--features", nargs = "+", default = None, help = "The features to benchmark (names in the feature dictionary); defaults to all.")
+	parser.add_argument("--messages-per-conversation", type = int, default = 50)
+	parser.add_argument("--speakers-per-conversation", type = int, nargs = 2, default = [2, 6], metavar = ("MIN", "MAX"))
+	parser.add_argument("--words-per-message", type = int, nargs = 2, default = [1, 30], metavar = ("MIN", "MAX"))
+	parser.add_argument("--timestamp-style", choices = list(timestamp_columns), default = "datetime")
+	parser.add_argument("--repeated-message-rate", type = float, default = 0.1)
+	parser.add_argument("--seed", type = int, default = 0)
+	parser.add_argument("--vector-directory", default = "./benchmark_vector_data/", help = "Where to cache the embeddings of the synthetic datasets.")
+	parser.add_argument("--ner-training", default = "./data/cleaned_data/train_named_entity.csv", help = "The training data of the Named Entity Recognition feature.")
+	parser.add_argument("--stub-models", action = "store_true", help = "Replace the SBERT and RoBERTa models with fast, deterministic stubs.")
+	parser.add_argument("--offline", action = "store_true", help = "Only use models that are cached locally.")
+	parser.add_argument("--output", default = "./benchmark_results.json", help = "Where to save the results (which can serve as a later baseline).")
+	parser.add_argument("--baseline", default = None, help = "The results of an earlier run, to compare against.")
+	parser.add_argument("--tolerance", type = float, default = 0.25, help = "The fraction by which a benchmark may be slower (or use more memory) than the baseline.")
+	return parser.parse_args()
+
+# Main Function
+if __name__ == "__main__":
+	args = parse_args()
+	settings = {
+		"messages_per_conversation": args.messages_per_conversation,
+		"speakers_per_conversation": args.speakers_per_conversation,
+		"words_per_message": args.words_per_message,
+		"timestamp_style": args.timestamp_style,
+		"repeated_message_rate": args.repeated_message_rate,
+		"seed": args.seed,
+		"vector_directory": args.vector_directory,
+		"ner_training": args.ner_training,
+		"stub_models": args.stub_models,
+		"offline": args.offline
+	}
+
+	# the feature dictionary is listed in a separate process, as importing the package here would load the models
+	benchmarks = []
+	if args.mode in ["features", "all"]:
+		features = args.features if args.features is not None else run_in_fresh_process(list_features, settings)
+		if features is None:
+			sys.exit("Could not list the features to benchmark (see the error above).")
+		benchmarks += features
+	if args.mode in ["featurize", "all"]:
+		benchmarks.append("featurize")
+
+	results = []
+	for num_messages in args.sizes:
+		# generate (or load) the embeddings of the dataset first, so that the other benchmarks read them from the cache
+		for benchmark in ["embeddings"] + benchmarks:
+			print("Benchmarking " + benchmark + " on " + str(num_messages) + " messages ...")
+			result = run_in_fresh_process(run_benchmark, benchmark, num_messages, settings)
+			if result is not None:
+				results.append(result)
+				print(f"\t{result['seconds']:.2f} s, {result['rows_per_second']:.0f} rows/s, peak memory {result['peak_memory'] / 1024 ** 2:.0f} MB")
+
+	results_df = pd.DataFrame(results)
+	scaling_exponents = get_scaling_exponents(results_df) if len(results_df) > 0 else {}
+	if len(results_df) > 0:
+		summary = results_df.pivot(index = "benchmark", columns = "messages", values = "rows_per_second")
+		summary["scaling_exponent"] = pd.Series(scaling_exponents)
+		print("\nRows per second (and scaling exponent) of each benchmark:")
+		print(summary.to_string(float_format = lambda value: f"{value:.2f}"))
+
+	output = {
+		"environment": {
+			"python": platform.python_version(),
+			"platform": platform.platform(),
+			"processor": platform.processor(),
+			"cpu_count": os.cpu_count()
+		},
+		"settings": settings,
+		"results": results,
+		"scaling_exponents": scaling_exponents
+	}
+	with open(args.output, "w") as output_file:
+		json.dump(output, output_file, indent = 2)
+	print("Saved the results to " + args.output + ".")
+
+	if args.baseline is not None:
+		with open(args.baseline) as baseline_file:
+			regressions = compare_to_baseline(output, json.load(baseline_file), args.tolerance)
+		if regressions:
+			print("REGRESSIONS compared to " + args.baseline + ":")
+			for regression in regressions:
+				print("\t" + regression)
+			sys.exit(1)
+		print("No regressions compared to " + args.baseline + ".")
@@ -0,0 +1,97 @@
+"""
+file: run_sentiment_inference_comparison.py
+---
+This file reports how much the faster inference settings of the RoBERTa sentiment model (8-bit quantization, ONNX
+Runtime, and shorter maximum lengths; see the `sentiment_inference` and `sentiment_max_length` parameters of the
+FeatureBuilder) change the `positive_bert`, `negative_bert`, and `neutral_bert` scores on our testing datasets, compared
+to the default full-precision model, and how much faster they are.
+
+For each dataset and setting, it reports the mean and maximum absolute difference of each score, the proportion of
+messages whose most likely sentiment is unchanged, and the speedup. The ONNX settings are skipped if onnx or onnxruntime
+is not installed.
+
+Examples:
+	python3 run_sentiment_inference_comparison.py
+	python3 run_sentiment_inference_comparison.py --inference int8 --max-lengths 512 128 --output sentiment_inference_comparison.csv
+"""
+
+import argparse
+import importlib.util
+
+import chardet
+import pandas as pd
+
+from team_comm_tools.utils.check_embeddings import compare_sentiment_inference
+
+# The testing datasets, and the name of their message column
+DATASETS = {
+	"test_chat_level": "message",
+	"test_chat_level_complex": " message",
+	"test_conv_level": "message",
+	"test_conv_level_complex": "message",
+	"test_named_entity": "message",
+	"fflow": "message",
+	"multi_task_TINY_cols_renamed": "text"
+}
+
+def read_messages(dataset, message_col):
+	"""
+	Read the distinct, non-empty messages of a testing dataset.
+	"""
+	path = "data/cleaned_data/" + dataset + ".csv"
+	with open(path, 'rb') as file:
+		encoding = chardet.detect(file.read())
+	messages = pd.read_csv(path, encoding=encoding['encoding'])[message_col].dropna().astype(str)
+	return messages[messages.str.strip() != ""].drop_duplicates().tolist()
+
+def parse_args():
+	parser = argparse.ArgumentParser(description = "Compare the faster inference settings of the RoBERTa sentiment model to the default one.")
+	parser.add_argument("--inference", nargs = "+", default = ["fp32", "int8", "onnx", "onnx_int8"], help = "The inference modes to compare.")
+	parser.add_argument("--max-lengths", type = int, nargs = "+", default = [512, 128, 64], help = "The maximum lengths (in tokens) to compare.")
+	parser.add_argument("--batch-size", type = int, default = 64)
+	parser.add_argument("--output", default = "./sentiment_inference_comparison.csv", help = "Where to save the comparison.")
+	return parser.parse_args()
+
+# Main Function
+if __name__ == "__main__":
+	args = parse_args()
+
+	inference_modes = args.inference
+	if importlib.util.find_spec("onnx") is None or importlib.util.find_spec("onnxruntime") is None:
+		print("onnx or onnxruntime is not installed; skipping the ONNX inference modes.")
+		inference_modes = [inference for inference in inference_modes if not inference.startswith("onnx")]
+
+	rows = []
+	for dataset, message_col in DATASETS.items():
+		messages = read_messages(dataset, message_col)
+		for inference in inference_modes:
+			for max_length in args.max_lengths:
+				if inference == "fp32" and max_length == 512:
+					continue # this is the default setting, which the others are compared to
+				print("Comparing " + inference + " (max length " + str(max_length) + ") on " + dataset + " (" + str(len(messages)) + " messages) ...")
+				comparison = compare_sentiment_inference(messages, inference, max_length, args.batch_size)
+				row = {"dataset": dataset, "messages": len(messages), "inference": inference, "max_length": max_length}
+				for column, difference in comparison["mean_absolute_difference"].items():
+					row["mean_absolute_difference_" + column] = difference
+				for column, difference in comparison["max_absolute_difference"].items():
+					row["max_absolute_difference_" + column] = difference
+				row["sentiment_agreement"] = comparison["sentiment_agreement"]
+				row["speedup"] = comparison["speedup"]
+				rows.append(row)
+				print(f"\tmean |difference| {max(comparison['mean_absolute_difference'].values()):.4f}, max |difference| {max(comparison['max_absolute_difference'].values()):.4f}, sentiment agreement {comparison['sentiment_agreement']:.3f}, speedup {comparison['speedup']:.2f}x")
+
+	comparison_df = pd.DataFrame(rows)
+	comparison_df.to_csv(args.output, index=False)
+
+	# summarize each setting across the datasets, weighting each dataset by its number of messages
+	if len(comparison_df) > 0:
+		difference_columns = [column for column in comparison_df.columns if "difference" in column or column == "sentiment_agreement"]
+		weighted = comparison_df[difference_columns].multiply(comparison_df["messages"], axis=0)
+		weighted[["inference", "max_length", "messages"]] = comparison_df[["inference", "max_length", "messages"]]
+		summary = weighted.groupby(["inference", "max_length"]).sum()
+		summary = summary[difference_columns].divide(summary["messages"], axis=0)
+		summary[[column for column in difference_columns if column.startswith("max_")]] = comparison_df.groupby(["inference", "max_length"])[[column for column in difference_columns if column.startswith("max_")]].max()
+		summary["speedup"] = comparison_df.groupby(["inference", "max_length"])["speedup"].median()
+		print("\nAcross all datasets:")
+		print(summary.to_string())
+	print("Saved the comparison to " + args.output + ".")
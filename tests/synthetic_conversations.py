@@ -0,0 +1,106 @@
+"""
+file: synthetic_conversations.py
+---
+This file generates synthetic conversation data, for benchmarking the feature builder on datasets of any size
+(see run_benchmarks.py). The data is seeded, so that the same parameters always generate the same conversations.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Words to build messages from: function words, pronouns, question words, hedges, and content words with some sentiment
+vocabulary = np.array([
+    "the", "a", "an", "and", "but", "or", "so", "because", "if", "then", "of", "to", "in", "on", "at", "with", "for", "about",
+    "i", "me", "my", "we", "us", "our", "you", "your", "he", "she", "they", "them", "it", "this", "that", "these", "those",
+    "is", "are", "was", "were", "be", "have", "has", "had", "do", "does", "did", "can", "could", "would", "should", "will",
+    "what", "why", "how", "when", "where", "who", "which",
+    "maybe", "perhaps", "probably", "think", "guess", "seems", "possibly", "sort", "kind", "somewhat",
+    "definitely", "certainly", "sure", "absolutely", "clearly", "obviously",
+    "good", "great", "nice", "love", "happy", "agree", "thanks", "please", "sorry", "bad", "wrong", "hate", "annoying", "disagree",
+    "task", "answer", "question", "idea", "plan", "team", "time", "number", "list", "option", "choice", "reason", "point",
+    "first", "second", "next", "last", "more", "less", "all", "some", "none", "very", "really", "just", "not", "no", "yes",
+    "UPDATE", "NOW", "OK", "lol", "haha", "hmm", "@everyone", ":)", ":(", "...", "!!", "??"
+])
+
+# Short replies that recur across conversations (and are therefore repeated verbatim)
+common_replies = np.array(["ok", "yes", "no", "lol", "sounds good", "I agree", "thanks!", "what?", "sure", "haha"])
+
+# The timestamp column(s) generated by each timestamp style; pass these as the FeatureBuilder's `timestamp_col`
+timestamp_columns = {
+    "datetime": "timestamp",
+    "unix": "timestamp",
+    "start_end": ("timestamp_start", "timestamp_end"),
+    "none": "timestamp"
+}
+
+def generate_conversations(num_messages, num_conversations=None, speakers_per_conversation=(2, 6), words_per_message=(1, 30),
+                           timestamp_style="datetime", repeated_message_rate=0.1, seed=0):
+    """
+    Generate a synthetic conversation dataset, with the default column names of the FeatureBuilder.
+
+    Args:
+        num_messages (int): The total number of messages.
+        num_conversations (int): The number of conversations; defaults to one per 50 messages.
+        speakers_per_conversation (tuple): The minimum and maximum number of speakers in each conversation.
+        words_per_message (tuple): The minimum and maximum number of words in each message (other than the repeated replies).
+        timestamp_style (str): "datetime" (a string date and time), "unix" (seconds since the epoch), "start_end" (the start
+            and end of each message, in seconds since the start of the conversation), or "none" (no timestamps).
+        repeated_message_rate (float): The proportion of messages that are common short replies (e.g., "ok").
+        seed (int): The seed of the random number generator.
+
+    Returns:
+        pd.DataFrame: One row per message, with the columns "conversation_num", "speaker_nickname", "message", and the
+        timestamp column(s) of the timestamp style (see `timestamp_columns`).
+    """
+    if timestamp_style not in timestamp_columns:
+        raise ValueError("Unsupported timestamp style: " + str(timestamp_style) + ". Please use one of: " + ", ".join(timestamp_columns) + ".")
+    if num_conversations is None:
+        num_conversations = max(1, num_messages // 50)
+    if not 1 <= num_conversations <= num_messages:
+        raise ValueError("The number of conversations must be between 1 and the number of messages.")
+
+    rng = np.random.default_rng(seed)
+
+    # every conversation has at least one message; the rest are spread at random
+    conversation_sizes = 1 + rng.multinomial(num_messages - num_conversations, np.full(num_conversations, 1 / num_conversations))
+    conversation_nums = np.repeat(np.arange(num_conversations), conversation_sizes)
+
+    # each message is sent by one of the speakers of its conversation
+    num_speakers = rng.integers(speakers_per_conversation[0], speakers_per_conversation[1] + 1, num_conversations)
+    speaker_positions = (rng.random(num_messages) * num_speakers[conversation_nums]).astype(np.int64)
+    speakers = pd.Series(conversation_nums).astype(str) + "_" + pd.Series(speaker_positions).astype(str)
+
+    # messages are random sequences of words, capitalized and ending with a punctuation mark
+    message_lengths = rng.integers(words_per_message[0], words_per_message[1] + 1, num_messages)
+    words = vocabulary[rng.integers(0, len(vocabulary), message_lengths.sum())]
+    endings = np.array([".", "?", "!", ""])[rng.integers(0, 4, num_messages)]
+    messages = [
+        " ".join(message_words).capitalize() + ending
+        for message_words, ending in zip(np.split(words, np.cumsum(message_lengths)[:-1]), endings)
+    ]
+    is_reply = rng.random(num_messages) < repeated_message_rate
+    replies = common_replies[rng.integers(0, len(common_replies), num_messages)]
+    messages = np.where(is_reply, replies, np.array(messages, dtype=object))
+
+    chat_data = pd.DataFrame({
+        "conversation_num": conversation_nums,
+        "speaker_nickname": speakers,
+        "message": messages
+    })
+
+    # messages are a few seconds to a few minutes apart, starting at the beginning of each conversation
+    gaps = rng.exponential(30, num_messages)
+    conversation_starts = np.cumsum(conversation_sizes) - conversation_sizes
+    seconds = np.cumsum(gaps)
+    seconds = seconds - np.repeat(seconds[conversation_starts], conversation_sizes)
+    if timestamp_style == "datetime":
+        chat_data["timestamp"] = (pd.Timestamp("2024-01-01") + pd.to_timedelta(np.round(seconds), unit="s")).strftime("%Y-%m-%d %H:%M:%S")
+    elif timestamp_style == "unix":
+        chat_data["timestamp"] = 1704067200 + np.round(seconds).astype(np.int64)
+    elif timestamp_style == "start_end":
+        chat_data["timestamp_start"] = np.round(seconds, 1)
+        # each message ends before the next one starts
+        durations = np.minimum(np.append(gaps[1:], np.inf), 2 + message_lengths * 0.5)
+        chat_data["timestamp_end"] = np.round(seconds + durations, 1)
+
+    return chat_data
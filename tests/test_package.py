@@ -5,6 +5,9 @@ from numpy import nan
 import logging
 import itertools
 import os
+import time
+import pickle
+from io import StringIO
 from sklearn.metrics.pairwise import cosine_similarity
 
 # Import Test Outputs
@@ -209,16 +212,22 @@ def str_to_vec(str_vec):
     return np.array(vector_list).reshape(-1, 1)
 
 def test_empty_vectors_equal():
+    from team_comm_tools.utils.check_embeddings import get_message_keys, align_embeddings
+    # the cached outputs are keyed by message; look up those of the last two input messages, which are both empty
+    vector_testing_input = pd.read_csv("data/cleaned_data/test_vector_edge_cases.csv", encoding='latin-1')
+    empty_message_keys = get_message_keys(vector_testing_input["message"].iloc[-2:])
+    empty_sbert_output = align_embeddings(sbert_output, empty_message_keys)
+    empty_sentiment_output = align_embeddings(sentiment_output, empty_message_keys)
     try:
         # assert that the last two rows are equal; they're both empty
-        assert(sbert_output.iloc[-1]["message_embedding"]==sbert_output.iloc[-2]["message_embedding"])
-        assert(sentiment_output.iloc[-1].equals(sentiment_output.iloc[-2]))
+        assert(empty_sbert_output.iloc[-1]["message_embedding"]==empty_sbert_output.iloc[-2]["message_embedding"])
+        assert(empty_sentiment_output.iloc[-1].equals(empty_sentiment_output.iloc[-2]))
 
         # assert that the 'positive bert' of the last sentiment is np.nan
-        assert(np.isnan(float(sentiment_output.iloc[-1]["positive_bert"])))
+        assert(np.isnan(float(empty_sentiment_output.iloc[-1]["positive_bert"])))
 
         # compare empty vector to nan vector
-        message_embedding_str = sbert_output.iloc[-1]["message_embedding"]
+        message_embedding_str = empty_sbert_output.iloc[-1]["message_embedding"]
         message_embedding_vec = str_to_vec(message_embedding_str)
         nan_vector_str = get_nan_vector_str()
         nan_vector = str_to_vec(nan_vector_str)
@@ -234,3 +243,369 @@ def test_empty_vectors_equal():
             file.write(f"Empty message vectors / sentence scores are not equal.\n")
 
         raise
+
+"""
+Tests of the StreamingFeatureBuilder: featurizing the multi-task dataset in small chunks should give the same
+outputs as featurizing it all at once.
+"""
+multi_task_columns = {
+    "conversation_id_col": "roundId",
+    "speaker_id_col": "speakerId",
+    "message_col": "text",
+    "timestamp_col": "time",
+    "turns": False
+}
+
+def assert_frames_match(expected, actual, sort_columns):
+    # the rows of each conversation are in the same order, but the conversations may be ordered differently
+    expected = expected.sort_values(sort_columns, kind="stable").reset_index(drop=True)
+    actual = actual.sort_values(sort_columns, kind="stable").reset_index(drop=True)
+    assert list(expected.columns) == list(actual.columns)
+    assert expected.shape == actual.shape
+    for column in expected.columns:
+        if pd.api.types.is_numeric_dtype(expected[column]) and pd.api.types.is_numeric_dtype(actual[column]):
+            # dataset-wide statistics are merged across chunks, so they may differ in the last few decimal places
+            np.testing.assert_allclose(actual[column].astype(float), expected[column].astype(float), rtol=1e-5, atol=1e-8, err_msg=column)
+        else:
+            assert expected[column].astype(str).equals(actual[column].astype(str)), column
+
+def write_in_memory_features_as_csv(features):
+    # round-trip the in-memory features through CSV, so that they have the same types as the CSV outputs
+    return tuple(pd.read_csv(StringIO(data.to_csv(index=False))) for data in features)
+
+@pytest.mark.parametrize("output_format", ["csv", "parquet"])
+def test_streaming_matches_in_memory(output_format, tmp_path):
+    if output_format == "parquet":
+        pytest.importorskip("pyarrow")
+    input_path = str(tmp_path / ("multi_task." + output_format))
+    if output_format == "parquet":
+        input_data.to_parquet(input_path, index=False)
+    else:
+        input_data.to_csv(input_path, index=False)
+
+    from team_comm_tools import FeatureBuilder, StreamingFeatureBuilder
+    output_paths = {level: str(tmp_path / "output" / level / ("streaming_" + level + "." + output_format)) for level in ["chat", "user", "conv"]}
+    streaming_feature_builder = StreamingFeatureBuilder(
+        input_path = input_path,
+        chunk_size = 50,
+        vector_directory = str(tmp_path / "vector_data") + "/",
+        output_writer = output_format,
+        output_file_path_chat_level = output_paths["chat"],
+        output_file_path_user_level = output_paths["user"],
+        output_file_path_conv_level = output_paths["conv"],
+        **multi_task_columns
+    )
+    streaming_feature_builder.featurize()
+
+    in_memory_feature_builder = FeatureBuilder(
+        input_df = input_data,
+        vector_directory = str(tmp_path / "vector_data_in_memory") + "/",
+        output_file_base = "streaming_comparison",
+        output_writer = None,
+        return_arrow_tables = output_format == "parquet",
+        **multi_task_columns
+    )
+    in_memory_features = in_memory_feature_builder.featurize()
+
+    if output_format == "parquet":
+        expected = [table.to_pandas() for table in in_memory_features]
+        actual = [pd.read_parquet(output_paths[level]) for level in ["chat", "user", "conv"]]
+    else:
+        expected = write_in_memory_features_as_csv(in_memory_features)
+        actual = [pd.read_csv(output_paths[level]) for level in ["chat", "user", "conv"]]
+
+    try:
+        assert streaming_feature_builder.num_chunks > 1
+        for expected_data, actual_data, sort_columns in zip(expected, actual, [["roundId"], ["roundId", "speakerId"], ["roundId"]]):
+            assert_frames_match(expected_data, actual_data, sort_columns)
+    except AssertionError:
+        with open('test.log', 'a') as file:
+            file.write("\n")
+            file.write("------TEST FAILED------\n")
+            file.write(f"Streaming ({output_format}) outputs do not match the outputs of featurizing the data all at once.\n")
+        raise
+
+def test_streaming_parquet_output_unifies_column_types(tmp_path):
+    # a CSV is read in chunks, whose column types are inferred separately: an optional text column that is empty in the
+    # first chunk is read as float there, and as text later on, and must still be written to a single Parquet file
+    pytest.importorskip("pyarrow")
+    sparse_data = input_data.copy()
+    sparse_data["note"] = [np.nan] * (len(sparse_data) - 5) + ["see transcript"] * 5
+    input_path = str(tmp_path / "multi_task_sparse.csv")
+    sparse_data.to_csv(input_path, index=False)
+
+    from team_comm_tools import FeatureBuilder, StreamingFeatureBuilder
+    output_paths = {level: str(tmp_path / "output" / level / ("streaming_sparse_" + level + ".parquet")) for level in ["chat", "user", "conv"]}
+    streaming_feature_builder = StreamingFeatureBuilder(
+        input_path = input_path,
+        chunk_size = 50,
+        vector_directory = str(tmp_path / "vector_data") + "/",
+        output_writer = "parquet",
+        output_file_path_chat_level = output_paths["chat"],
+        output_file_path_user_level = output_paths["user"],
+        output_file_path_conv_level = output_paths["conv"],
+        **multi_task_columns
+    )
+    streaming_feature_builder.featurize()
+
+    in_memory_feature_builder = FeatureBuilder(
+        input_df = pd.read_csv(input_path),
+        vector_directory = str(tmp_path / "vector_data_in_memory") + "/",
+        output_file_base = "streaming_sparse_comparison",
+        output_writer = None,
+        return_arrow_tables = True,
+        **multi_task_columns
+    )
+    expected = [table.to_pandas() for table in in_memory_feature_builder.featurize()]
+    actual = [pd.read_parquet(output_paths[level]) for level in ["chat", "user", "conv"]]
+
+    try:
+        assert streaming_feature_builder.num_chunks > 1
+        assert actual[0]["note"].isna().sum() == len(sparse_data) - 5
+        assert (actual[0]["note"].dropna() == "see transcript").all()
+        for expected_data, actual_data, sort_columns in zip(expected, actual, [["roundId"], ["roundId", "speakerId"], ["roundId"]]):
+            assert_frames_match(expected_data, actual_data, sort_columns)
+    except AssertionError:
+        with open('test.log', 'a') as file:
+            file.write("\n")
+            file.write("------TEST FAILED------\n")
+            file.write("Streaming Parquet output does not unify column types across chunks.\n")
+        raise
+
+def test_streaming_rejects_non_contiguous_conversations(tmp_path):
+    from team_comm_tools import StreamingFeatureBuilder
+    input_path = str(tmp_path / "non_contiguous.csv")
+    pd.DataFrame({
+        "conversation_num": [1, 1, 2, 2, 1],
+        "speaker_nickname": ["A", "B", "A", "B", "A"],
+        "message": ["hi", "hello", "how are you", "good", "bye"]
+    }).to_csv(input_path, index=False)
+
+    streaming_feature_builder = StreamingFeatureBuilder(input_path = input_path, chunk_size = 2, vector_directory = str(tmp_path / "vector_data") + "/")
+    with pytest.raises(ValueError, match="contiguously"):
+        list(streaming_feature_builder.read_chunks())
+
+def test_in_memory_featurize_writes_nothing(tmp_path, monkeypatch):
+    from team_comm_tools import FeatureBuilder
+    chat_data = pd.read_csv(os.path.abspath("data/cleaned_data/test_conv_level.csv"), encoding='utf-8', encoding_errors='replace')
+    vector_directory = str(tmp_path / "vector_data") + "/"
+    working_directory = tmp_path / "working_directory"
+    working_directory.mkdir()
+    monkeypatch.chdir(working_directory)
+
+    with pytest.warns(UserWarning, match="output file paths are ignored"):
+        feature_builder = FeatureBuilder(
+            input_df = chat_data,
+            vector_directory = vector_directory,
+            output_file_base = "in_memory_test",
+            output_file_path_chat_level = "./output/chat/in_memory_test_chat_level.csv",
+            output_writer = None,
+            turns = False
+        )
+    features = feature_builder.featurize()
+
+    try:
+        assert len(features) == 3
+        chat_features, user_features, conv_features = features
+        assert all(isinstance(level_features, pd.DataFrame) for level_features in features)
+        assert len(chat_features) == len(chat_data)
+        assert len(conv_features) == chat_data["conversation_num"].nunique()
+        assert len(user_features) == len(chat_data[["conversation_num", "speaker_nickname"]].drop_duplicates())
+        assert list(working_directory.iterdir()) == []
+    except AssertionError:
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test.log'), 'a') as file:
+            file.write("\n")
+            file.write("------TEST FAILED------\n")
+            file.write(f"Featurizing in memory did not return the three levels of features, or wrote to disk.\n")
+        raise
+
+def test_profile_report_tags_percentages_and_chunks(tmp_path):
+    from team_comm_tools import StreamingFeatureBuilder
+    input_path = str(tmp_path / "conv_level.csv")
+    chat_data = pd.read_csv("data/cleaned_data/test_conv_level.csv", encoding='utf-8', encoding_errors='replace')
+    chat_data[chat_data["conversation_num"].isin(chat_data["conversation_num"].unique()[:3])].to_csv(input_path, index=False)
+    output_paths = {level: str(tmp_path / "output" / level / ("profile_test_" + level + ".csv")) for level in ["chat", "user", "conv"]}
+    streaming_feature_builder = StreamingFeatureBuilder(
+        input_path = input_path,
+        chunk_size = 10,
+        vector_directory = str(tmp_path / "vector_data") + "/",
+        output_file_path_chat_level = output_paths["chat"],
+        output_file_path_user_level = output_paths["user"],
+        output_file_path_conv_level = output_paths["conv"],
+        analyze_first_pct = [0.5, 1.0],
+        profile = True,
+        turns = False
+    )
+    streaming_feature_builder.featurize()
+
+    # the profiles of all chunks are saved once, in a single report
+    profile_report = pd.read_csv(str(tmp_path / "output" / "profile" / "profile_test_chat.csv"))
+    conversation_steps = profile_report[profile_report["level"] == "conversation"]
+    try:
+        assert len(profile_report) == len(streaming_feature_builder.profile_report)
+        assert set(profile_report["pass"]) == {"statistics", "features"}
+        assert streaming_feature_builder.num_chunks > 1
+        assert set(profile_report["chunk"]) == set(range(streaming_feature_builder.num_chunks))
+        # the conversation-level steps run once per chunk and percentage, and are told apart by those columns
+        assert set(conversation_steps["percentage"]) == {0.5, 1.0}
+        assert not conversation_steps.duplicated(["chunk", "percentage", "step"]).any()
+        assert conversation_steps.groupby(["chunk", "percentage"]).size().nunique() == 1
+    except AssertionError:
+        with open('test.log', 'a') as file:
+            file.write("\n")
+            file.write("------TEST FAILED------\n")
+            file.write(f"The profile report does not tell apart the steps of each chunk and percentage.\n")
+        raise
+
+"""
+Tests of the feature cache: featurizing with a cache (whether its entries are hits, misses, or have to be recomputed)
+should give the same outputs as featurizing without one, and the cache should evict its least recently used entries.
+"""
+def featurize_in_memory(chat_data, vector_directory, feature_cache = None):
+    from team_comm_tools import FeatureBuilder
+    feature_builder = FeatureBuilder(
+        input_df = chat_data,
+        vector_directory = vector_directory,
+        output_file_base = "feature_cache_test",
+        output_writer = None,
+        feature_cache = feature_cache,
+        turns = False
+    )
+    return feature_builder.featurize()
+
+def test_feature_cache_matches_uncached(tmp_path):
+    from team_comm_tools.utils.feature_cache import FeatureCache
+    chat_data = pd.read_csv("data/cleaned_data/test_conv_level.csv", encoding='utf-8', encoding_errors='replace')
+    first_conversations = chat_data[chat_data["conversation_num"].isin(chat_data["conversation_num"].unique()[:2])]
+    vector_directory = str(tmp_path / "vector_data") + "/"
+    cache_path = str(tmp_path / "feature_cache.sqlite")
+
+    uncached = featurize_in_memory(chat_data, vector_directory)
+
+    # the first run caches the messages of the first conversations only
+    featurize_in_memory(first_conversations, vector_directory, FeatureCache(cache_path))
+    cache = FeatureCache(cache_path)
+    num_cached_entries = cache.connection.execute("SELECT COUNT(*) FROM features").fetchone()[0]
+    assert num_cached_entries > 0
+    # pretend that the outputs of one feature had other types when they were cached, so that they are all recomputed
+    cache.connection.execute("UPDATE feature_columns SET columns = ? WHERE feature = 'text_based_features'", (pickle.dumps([("num_words", "float64")]),))
+    cache.commit()
+
+    # the second run looks up the messages of the first conversations (or recomputes them), and computes the rest
+    partially_cached = featurize_in_memory(chat_data, vector_directory, cache)
+    assert cache.connection.execute("SELECT COUNT(*) FROM features").fetchone()[0] > num_cached_entries
+    # the third run looks up every message
+    fully_cached = featurize_in_memory(chat_data, vector_directory, cache)
+
+    try:
+        for cached in [partially_cached, fully_cached]:
+            for expected_data, actual_data in zip(uncached, cached):
+                # information diversity is based on a topic model that is not seeded, and differs between any two runs
+                pd.testing.assert_frame_equal(expected_data.drop(columns=["info_diversity"], errors="ignore"), actual_data.drop(columns=["info_diversity"], errors="ignore"))
+    except AssertionError:
+        with open('test.log', 'a') as file:
+            file.write("\n")
+            file.write("------TEST FAILED------\n")
+            file.write(f"Featurizing with a feature cache gives different outputs than featurizing without one.\n")
+        raise
+
+def test_feature_cache_evicts_least_recently_used(tmp_path):
+    from team_comm_tools.utils.feature_cache import FeatureCache
+    entry_size = len(pickle.dumps([1.0]))
+    cache = FeatureCache(str(tmp_path / "feature_cache.sqlite"), max_size = 2 * entry_size)
+    columns = [("score", "float64")]
+
+    cache.put("feature", "1", columns, ["a"], [[1.0]])
+    cache.commit()
+    time.sleep(0.01)
+    cache.put("feature", "1", columns, ["b"], [[1.0]])
+    cache.commit()
+    time.sleep(0.01)
+    assert cache.get("feature", "1", ["a"]) == {"a": [1.0]} # "a" is now more recently used than "b"
+    cache.commit()
+    time.sleep(0.01)
+    cache.put("feature", "1", columns, ["c"], [[1.0]])
+    cache.commit()
+
+    assert set(cache.get("feature", "1", ["a", "b", "c"])) == {"a", "c"}
+    assert cache.get_size() <= 2 * entry_size
+    cache.close()
+
+def test_token_store_tokenizes_each_message_once(monkeypatch):
+    from team_comm_tools.utils.token_store import TokenStore, split_words
+    tokenized = []
+    def counting_split_words(text):
+        tokenized.append(text)
+        return split_words(text)
+    monkeypatch.setitem(TokenStore.tokenizers, "words", counting_split_words)
+
+    tokens = TokenStore()
+    # a repeated message within a column, and a message shared between two columns
+    first_words = tokens.get_words(pd.Series(["hi there", "ok", "hi there"]))
+    second_words = tokens.get_words(pd.Series(["ok", "bye now"]))
+
+    try:
+        assert first_words == [["hi", "there"], ["ok"], ["hi", "there"]]
+        assert second_words == [["ok"], ["bye", "now"]]
+        assert sorted(tokenized) == ["bye now", "hi there", "ok"]
+    except AssertionError:
+        with open('test.log', 'a') as file:
+            file.write("\n")
+            file.write("------TEST FAILED------\n")
+            file.write(f"The TokenStore tokenizes the same message more than once.\n")
+        raise
+
+def test_unused_tokens_are_cleared():
+    from team_comm_tools.utils.calculate_chat_level_features import ChatLevelFeaturesCalculator
+    calculator = ChatLevelFeaturesCalculator(
+        chat_data = pd.DataFrame({"conversation_num": [0], "message": ["who is there? me."]}),
+        vect_data = None,
+        bert_sentiment_data = None,
+        ner_training = None,
+        ner_cutoff = 0.9,
+        conversation_id_col = "conversation_num",
+        message_col = "message",
+        timestamp_col = "timestamp"
+    )
+    messages = calculator.chat_data["message"]
+    for tokenization in calculator.tokens.tokenizers:
+        calculator.tokens.get_tokens(messages, tokenization)
+
+    try:
+        assert calculator.tokens.get_sentence_first_words(messages) == [["who", "me"]]
+        # only the words are no longer read once just the other lexical features remain
+        calculator.clear_unused_tokens([ChatLevelFeaturesCalculator.other_lexical_features])
+        assert calculator.tokens.tokens["words"] == {}
+        assert all(calculator.tokens.tokens[tokenization] for tokenization in ["alphanumeric_words", "sentences", "sentence_first_words"])
+        calculator.clear_unused_tokens([])
+        assert all(stored_tokens == {} for stored_tokens in calculator.tokens.tokens.values())
+    except AssertionError:
+        with open('test.log', 'a') as file:
+            file.write("\n")
+            file.write("------TEST FAILED------\n")
+            file.write(f"The TokenStore keeps tokens that no remaining feature method reads.\n")
+        raise
+
+def test_turn_counts():
+    from team_comm_tools.features.turn_taking_features import get_turn_counts, get_turn
+    # speaker "a" sends two messages in a row in conversation 1, and speaker "b" ends conversation 1 and starts conversation 2
+    chat_data = pd.DataFrame({
+        "conversation_num": [1, 1, 1, 1, 1, 2, 2, 2],
+        "speaker_nickname": ["a", "b", "a", "a", "b", "b", "b", "c"]
+    })
+    turn_counts = get_turn_counts(chat_data, "conversation_num", "speaker_nickname")
+    turn_taking_index = get_turn(chat_data, "conversation_num", "speaker_nickname")
+
+    try:
+        assert turn_counts.values.tolist() == [[1, "a", 2], [1, "b", 2], [2, "b", 1], [2, "c", 1]]
+        assert list(turn_counts.columns) == ["conversation_num", "speaker_nickname", "turn_count"]
+        # the turn counts add up to the number of turns behind the turn-taking index
+        num_turns = turn_counts.groupby("conversation_num")["turn_count"].sum()
+        num_chats = chat_data.groupby("conversation_num").size()
+        assert ((num_turns - 1) / (num_chats - 1)).tolist() == turn_taking_index["turn_taking_index"].tolist() == [0.75, 0.5]
+    except AssertionError:
+        with open('test.log', 'a') as file:
+            file.write("\n")
+            file.write("------TEST FAILED------\n")
+            file.write(f"The number of turns of each speaker is incorrect.\n")
+        raise